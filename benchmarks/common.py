@@ -0,0 +1,30 @@
+import statistics
+import time
+from bot.factory import create_l10n
+from bot.locales.localization import CachedLocalization
+
+
+def make_l10n() -> CachedLocalization:
+    return create_l10n()
+
+
+def measure(func, repeat: int) -> list:
+    """Вызывает func repeat раз и возвращает задержки в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(timings: list, q: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(name: str, timings: list) -> str:
+    return (f"{name:<32} mean {statistics.fmean(timings):8.3f} ms  "
+            f"p50 {percentile(timings, 0.50):8.3f} ms  "
+            f"p95 {percentile(timings, 0.95):8.3f} ms  "
+            f"p99 {percentile(timings, 0.99):8.3f} ms")
@@ -0,0 +1,76 @@
+"""
+Задержка запросов Database: соединение на каждый вызов против долгоживущего WAL-соединения.
+
+Запуск: python -m benchmarks.connection --users 200 --repeat 200
+"""
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from bot.database.database import Database
+from benchmarks.common import make_l10n, measure, report
+
+
+class PerCallDatabase(Database):
+    """Старое поведение: новое соединение без прагм на каждый вызов get_connection."""
+
+    @contextmanager
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def fill(db: Database, chat_id: int, users: int) -> None:
+    with db.get_connection() as conn:
+        for user_id in range(1, users + 1):
+            height = random.uniform(150, 200)
+            weight = random.uniform(50, 150)
+            conn.execute(
+                """INSERT INTO measurements (user_id, chat_id, weight, height, bmi)
+                VALUES (?, ?, ?, ?, ?)""",
+                (user_id, chat_id, weight, height, weight / (height / 100) ** 2)
+            )
+            conn.execute(
+                """INSERT INTO users (user_id, chat_id, username, prefix, status)
+                VALUES (?, ?, ?, ?, ?)""",
+                (user_id, chat_id, f"user{user_id}", "", "")
+            )
+
+
+def run(db_class, l10n, users: int, repeat: int) -> None:
+    chat_id = -100
+    with tempfile.TemporaryDirectory() as tmp:
+        db = db_class(l10n, str(Path(tmp) / "bench.db"))
+        fill(db, chat_id, users)
+        print(f"{db_class.__name__} ({users} пользователей в чате)")
+        user_ids = list(range(1, users + 1))
+        print(report("get_user", measure(lambda: db.get_user(random.choice(user_ids), chat_id), repeat)))
+        print(report("get_prefix", measure(lambda: db.get_prefix(random.choice(user_ids), chat_id), repeat)))
+        print(report("get_stats", measure(lambda: db.get_stats(chat_id), repeat)))
+        print(report("update_weight", measure(
+            lambda: db.update_weight(random.choice(user_ids), random.uniform(50, 150), chat_id), repeat)))
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    l10n = make_l10n()
+    for db_class in (PerCallDatabase, Database):
+        run(db_class, l10n, args.users, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
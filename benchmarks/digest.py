@@ -0,0 +1,131 @@
+"""
+Рассылка еженедельной сводки в тысячи чатов против FakeSession с флуд-контролем.
+
+FloodSession ведёт себя как Telegram: сверх лимита на бота или на чат отвечает 429 с retry_after.
+Лимиты ускорены в --speedup раз, чтобы прогон занимал секунды. Сравниваются голые
+send_message для всех чатов сразу и SendQueue с корзинами токенов.
+
+Запуск: python -m benchmarks.digest --chats 2000 --chat-size 20
+"""
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, TelegramMethod
+
+from bot.database.database import Database
+from bot.database.repository import AsyncDatabase
+from bot.digest import DigestScheduler
+from bot.factory import create_l10n
+from bot.sender import SendQueue
+from benchmarks.fake_session import FakeSession, make_bot
+
+# Лимиты Telegram без ускорения: сообщений в секунду на бота и в минуту на группу
+TELEGRAM_RATE = 30
+TELEGRAM_CHAT_PER_MINUTE = 20
+
+
+class FloodSession(FakeSession):
+    """FakeSession со скользящими окнами лимитов и сетевой задержкой."""
+
+    def __init__(self, rate: float, chat_per_minute: float, speedup: float, latency: float):
+        super().__init__()
+        self.window = 1 / speedup
+        self.rate = rate
+        self.chat_window = 60 / speedup
+        self.chat_limit = chat_per_minute
+        self.latency = latency
+        self.flood = 0
+        self._sent = deque()
+        self._chats = {}
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            now = time.perf_counter()
+            while self._sent and self._sent[0] <= now - self.window:
+                self._sent.popleft()
+            chat = self._chats.setdefault(method.chat_id, deque())
+            while chat and chat[0] <= now - self.chat_window:
+                chat.popleft()
+            if len(self._sent) >= self.rate or len(chat) >= self.chat_limit:
+                self.flood += 1
+                raise TelegramRetryAfter(method, "Too Many Requests", retry_after=1)
+            self._sent.append(now)
+            chat.append(now)
+        return await super().make_request(bot, method, timeout)
+
+
+def fill(database: Database, chats: int, chat_size: int) -> None:
+    records = (
+        {"chat_id": -1000 - chat, "user_id": user, "username": f"user{user}",
+         "weight": random.randint(50, 150), "height": random.randint(150, 200)}
+        for chat in range(chats) for user in range(1, chat_size + 1)
+    )
+    database.import_measurements(records)
+
+
+async def naive(db: AsyncDatabase, bot: Bot) -> int:
+    # Как без очереди: рендер всех сводок и все send_message разом
+    digests = await db.get_digests(await db.get_chat_ids())
+    results = await asyncio.gather(*(bot.send_message(chat_id, text) for chat_id, text in digests),
+                                   return_exceptions=True)
+    return sum(not isinstance(result, BaseException) for result in results)
+
+
+async def queued(db: AsyncDatabase, bot: Bot, args) -> tuple:
+    queue = SendQueue(bot, rate=args.rate * args.speedup, chat_rate=TELEGRAM_CHAT_PER_MINUTE / 60 * args.speedup)
+    queue.start()
+    delivered = await DigestScheduler(db, queue, batch_size=args.batch).run_once()
+    await queue.stop()
+    return delivered, queue.retries
+
+
+async def run(args) -> None:
+    l10n = create_l10n()
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(l10n, str(Path(tmp) / "bench.db"))
+        database.init_db()
+        fill(database, args.chats, args.chat_size)
+        db = AsyncDatabase(database)
+        expected = args.chats / (args.rate * args.speedup)
+
+        for name in ("naive", "queue"):
+            session = FloodSession(TELEGRAM_RATE * args.speedup, TELEGRAM_CHAT_PER_MINUTE, args.speedup, args.latency)
+            bot = make_bot(session)
+            start = time.perf_counter()
+            if name == "naive":
+                delivered, retries = await naive(db, bot), 0
+            else:
+                delivered, retries = await queued(db, bot, args)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<6} доставлено {delivered}/{args.chats} за {elapsed:6.2f} с "
+                  f"(расчётно {expected:.2f} с), ответов 429: {session.flood}, повторов: {retries}")
+
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--chat-size", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=25, help="скорость очереди, сообщений/с до ускорения")
+    parser.add_argument("--speedup", type=float, default=10, help="во сколько раз ускорить лимиты Telegram")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа API, с")
+    parser.add_argument("--batch", type=int, default=100, help="чатов в пачке рендеринга")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import itertools
+import time
+from typing import AsyncGenerator, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.types import Chat, Message, User
+
+BOT_USER = User(id=42, is_bot=True, first_name="FatRate", username="fatrate_bot")
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота без сети: запоминает исходящие вызовы API и отвечает правдоподобными объектами.
+
+    requests - список (время вызова по perf_counter, метод) в порядке вызова.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        self.requests.append((time.perf_counter(), method))
+        if isinstance(method, GetMe):
+            return BOT_USER
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and "Message" in str(method.__returning__):
+            return Message(
+                message_id=next(self._message_ids),
+                date=int(time.time()),
+                chat=Chat(id=chat_id, type="group"),
+                from_user=BOT_USER,
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, url: str, headers: Optional[dict] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+    def sent(self, method_type: type) -> list:
+        return [method for _, method in self.requests if isinstance(method, method_type)]
+
+
+def make_bot(session: FakeSession) -> Bot:
+    return Bot(token="42:FAKE", session=session)
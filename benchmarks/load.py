@@ -0,0 +1,155 @@
+"""
+Нагрузочный прогон настоящего Dispatcher без Telegram.
+
+Роутер из setup_routers() и middleware бота собираются как в main, бот ходит в FakeSession,
+синтетические /add, /update и /rating подаются через Dispatcher.feed_update
+с заданной частотой. Для каждой команды печатаются p50/p95/p99 задержки и число
+SQL-выражений, в конце - пиковая память процесса. --engine memory гоняет ту же нагрузку
+по хранилищу в памяти с журналом (SQL у него нет, счётчик показывает 0).
+
+Запуск: python -m benchmarks.load --chats 20 --chat-size 500 --updates 2 --ratings 5
+С логами, как в main: добавить --log json (и --log-level DEBUG --log-sample 0.01 для отладочных строк)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import resource
+import tracemalloc
+from pathlib import Path
+
+from aiogram.methods import SendMessage
+from aiogram.types import Update
+
+from bot.database.repository import AsyncDatabase
+from bot.factory import STORAGES, create_dispatcher, create_locales, create_storage
+from bot.log import setup_logging
+from bot.middlewares.chat_lock import ChatLockManager
+from benchmarks.common import report
+from benchmarks.fake_session import FakeSession, make_bot
+from benchmarks.updates import message_update
+
+
+class StatementCounter:
+    """Счётчик SQL-выражений через trace callback соединения (без выражений внутри триггеров)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str) -> None:
+        if not statement.startswith("--"):
+            self.count += 1
+
+
+async def feed(dp, bot, updates: list, rate: float, concurrency: int) -> list:
+    """Подаёт обновления с частотой rate в секунду (0 - без пауз) и возвращает задержки в мс."""
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(update: Update):
+        async with semaphore:
+            start = time.perf_counter()
+            await dp.feed_update(bot, update)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    tasks = []
+    for update in updates:
+        tasks.append(asyncio.create_task(one(update)))
+        if rate:
+            await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return timings
+
+
+def phases(args) -> dict:
+    chats = [-1000 - chat for chat in range(args.chats)]
+    users = range(1, args.chat_size + 1)
+
+    add = [message_update(chat, user, f"/add {random.randint(150, 200)} {random.randint(50, 150)}")
+           for chat in chats for user in users]
+    update = [message_update(chat, user, f"/update {random.randint(50, 150)}")
+              for _ in range(args.updates) for chat in chats for user in users]
+    rating = [message_update(chat, random.choice(users), "/rating")
+              for _ in range(args.ratings) for chat in chats]
+    random.shuffle(update)
+    random.shuffle(rating)
+    return {"/add": add, "/update": update, "/rating": rating}
+
+
+async def run(args) -> None:
+    session = FakeSession()
+    bot = make_bot(session)
+    locales = create_locales()
+    l10n = locales.get()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / ("bench.db" if args.engine == "sqlite" else "bench"))
+        db = AsyncDatabase(create_storage(args.engine, path, l10n), flush_window=args.flush_window / 1000)
+        chat_locks = ChatLockManager(args.max_chats) if args.serialize else None
+        dp = create_dispatcher(db, locales, chat_locks=chat_locks)
+        counter = StatementCounter()
+        if args.engine == "sqlite":
+            with db.database.get_connection() as conn:
+                conn.set_trace_callback(counter)
+
+        print(f"{args.chats} чатов по {args.chat_size} пользователей, "
+              f"частота {args.rate or 'без ограничений'}/с, параллельно {args.concurrency}")
+        for command, payloads in phases(args).items():
+            updates = [Update.model_validate(payload, context={"bot": bot}) for payload in payloads]
+            statements, replies = counter.count, len(session.sent(SendMessage))
+            start = time.perf_counter()
+            timings = await feed(dp, bot, updates, args.rate, args.concurrency)
+            elapsed = time.perf_counter() - start
+            print(report(f"{command} x{len(updates)}", timings))
+            print(f"{'':<32} {len(updates) / elapsed:8.0f} обн/с, "
+                  f"SQL {(counter.count - statements) / len(updates):6.1f} на команду, "
+                  f"ответов {len(session.sent(SendMessage)) - replies}")
+
+        await db.close()
+
+    # ru_maxrss на Linux в килобайтах
+    print(f"Пиковый RSS процесса: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} МБ")
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Пик памяти Python (tracemalloc): {peak / 1024 / 1024:.1f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=20, help="количество чатов")
+    parser.add_argument("--chat-size", type=int, default=200, help="пользователей в чате")
+    parser.add_argument("--updates", type=int, default=2, help="/update на пользователя")
+    parser.add_argument("--ratings", type=int, default=5, help="/rating на чат")
+    parser.add_argument("--rate", type=float, default=0, help="обновлений в секунду, 0 - без пауз")
+    parser.add_argument("--concurrency", type=int, default=64, help="одновременно обрабатываемых обновлений")
+    parser.add_argument("--flush-window", type=float, default=0, help="окно буфера записи, мс")
+    parser.add_argument("--serialize", action="store_true", help="команды одного чата по очереди")
+    parser.add_argument("--max-chats", type=int, default=256, help="чатов одновременно при --serialize")
+    parser.add_argument("--engine", choices=STORAGES, default="sqlite", help="движок хранилища")
+    parser.add_argument("--trace-memory", action="store_true", help="пик памяти через tracemalloc (замедляет прогон)")
+    parser.add_argument("--log", choices=("json", "text"), help="писать логи, как в main, в /dev/null")
+    parser.add_argument("--log-level", default="INFO", help="уровень логов при --log")
+    parser.add_argument("--log-sample", type=float, default=0.01, help="доля записей DEBUG при --log")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.WARNING)
+        asyncio.run(run(args))
+        return
+    # Логи через очередь, как в main: замер того, сколько логирование добавляет к задержке
+    with open(os.devnull, "w") as devnull:
+        listener = setup_logging(args.log_level, args.log, args.log_sample, stream=devnull)
+        try:
+            asyncio.run(run(args))
+        finally:
+            listener.stop()
+
+
+if __name__ == "__main__":
+    main()
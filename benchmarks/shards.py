@@ -0,0 +1,77 @@
+"""
+Режим шардов: приёмник раздаёт синтетические обновления процессам-обработчикам через ShardPool.
+
+Каждый обработчик - отдельный процесс со своим Dispatcher, файлом SQLite и FakeSession;
+время считается от первого отправленного обновления до выхода всех обработчиков,
+то есть до конца обработки. Прирост от числа шардов ограничен числом ядер.
+Роутеры бота подключаются к диспетчеру один раз на процесс, поэтому одно число шардов на запуск:
+
+    for n in 1 2 4; do python -m benchmarks.shards --updates 5000 --chats 200 --shards $n; done
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from pathlib import Path
+
+from aiogram.methods import SendMessage
+from aiogram.types import Update
+
+from bot.database.database import Database
+from bot.database.repository import AsyncDatabase
+from bot.factory import create_dispatcher, create_locales, create_shard_dispatcher
+from bot.middlewares.chat_lock import ChatLockManager
+from bot.shards import ShardPool, ignore_interrupt, serve_shard
+from benchmarks.fake_session import FakeSession, make_bot
+from benchmarks.webhook import workload
+
+
+async def worker(shard: int, path: str) -> None:
+    session = FakeSession()
+    bot = make_bot(session)
+    locales = create_locales()
+    # Файл базы - рядом с сокетом, во временной папке пула
+    db = AsyncDatabase(Database(locales.get(), str(Path(path).with_name(f"bench{shard}.db"))))
+    # Очередь по чатам, как в боте по умолчанию: иначе /update мог бы обогнать /add того же чата
+    await serve_shard(create_dispatcher(db, locales, chat_locks=ChatLockManager()), bot, path)
+    await db.close()
+    print(f"  обработчик {shard}: ответов {len(session.sent(SendMessage))}")
+
+
+def run_worker(shard: int, shards: int, path: str) -> None:
+    ignore_interrupt()
+    logging.disable(logging.WARNING)
+    asyncio.run(worker(shard, path))
+
+
+async def run(shards: int, payloads: list) -> None:
+    bot = make_bot(FakeSession())
+    async with ShardPool(shards, run_worker) as pool:
+        dp = create_shard_dispatcher(pool)
+        updates = [Update.model_validate(payload, context={"bot": bot}) for payload in payloads]
+        start = time.perf_counter()
+        for update in updates:
+            await dp.feed_update(bot, update)
+        sent = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    print(f"шардов {shards}: {len(payloads)} обновлений за {elapsed:.2f} с, {len(payloads) / elapsed:.0f} обновлений/с "
+          f"(приёмник разослал за {sent:.2f} с)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    random.seed(1)
+    payloads = workload(args.updates, args.chats, args.users)
+    asyncio.run(run(args.shards, payloads))
+
+
+if __name__ == "__main__":
+    main()
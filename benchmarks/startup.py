@@ -0,0 +1,115 @@
+"""
+Холодный запуск бота: от старта интерпретатора до готовности принимать обновления.
+
+Каждый замер - новый процесс Python, который импортирует bot.main и проходит running_bot()
+на заполненном хранилище, без сети; этапы берутся из StartupTimer. Отдельно - запуск
+без кэша байткода (как в контейнере с PYTHONDONTWRITEBYTECODE без предкомпиляции)
+и повторная отправка списка команд, которую отсекает хэш.
+
+Запуск: python -m benchmarks.startup --repeat 5 --chats 20 --chat-size 200 --days 30
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bot.commandsworker import set_bot_commands
+from bot.factory import STORAGES, create_locales, create_storage
+from benchmarks.common import make_l10n, report
+from benchmarks.fake_session import FakeSession, make_bot
+from benchmarks.storage import fill
+
+# Процесс-замер: тот же путь, что и main() до receive_updates
+CHILD = """
+from bot.startup import startup
+import asyncio, json
+from bot.main import running_bot
+
+async def run():
+    startup.mark("imports")
+    async with running_bot():
+        pass
+
+asyncio.run(run())
+print(json.dumps(startup.stages))
+"""
+
+
+def run_child(env: dict, extra_args: list) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *extra_args, "-c", CHILD], env=env,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    return wall, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def cold_start(name: str, env: dict, extra_args: list, repeat: int) -> None:
+    walls, stages = [], {}
+    for _ in range(repeat):
+        wall, child_stages = run_child(env, extra_args)
+        walls.append(wall * 1000)
+        for stage, seconds in child_stages.items():
+            stages.setdefault(stage, []).append(seconds * 1000)
+    print(report(f"{name}: до готовности", walls))
+    for stage, timings in stages.items():
+        print(f"  {stage:<30} mean {statistics.fmean(timings):8.1f} ms")
+
+
+async def commands(tmp: str) -> None:
+    session = FakeSession()
+    bot = make_bot(session)
+    locales = create_locales()
+    hash_path = str(Path(tmp) / "commands.sha256")
+    for attempt in ("первый запуск", "повторный запуск"):
+        before = len(session.requests)
+        start = time.perf_counter()
+        await set_bot_commands(bot, locales, hash_path)
+        print(f"set_bot_commands, {attempt}: {(time.perf_counter() - start) * 1000:.2f} мс, "
+              f"запросов к API {len(session.requests) - before}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--chat-size", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--engine", choices=STORAGES, default="sqlite")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / args.engine)
+        db = create_storage(args.engine, path, make_l10n())
+        fill(db, args.chats, args.chat_size, args.days)
+        db.close()
+
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])),
+            "BOT_TOKEN": os.environ.get("BOT_TOKEN", "42:FAKE"),
+            "STORAGE": args.engine,
+            "DB_PATH": path,
+            "MEMORY_PATH": path,
+            "NICKNAME_PROVIDER": "",
+            "METRICS_PORT": "0",
+            "DIGEST_ENABLED": "false",
+            "LOG_LEVEL": "WARNING",
+        }
+        cold_start("с кэшем байткода", env, [], args.repeat)
+        # Пустой pycache_prefix: весь код компилируется заново, как без предкомпиляции в образе
+        no_cache = {**env, "PYTHONDONTWRITEBYTECODE": "1"}
+        cold_start("без кэша байткода", no_cache, ["-X", f"pycache_prefix={Path(tmp) / 'pycache'}"], args.repeat)
+
+        asyncio.run(commands(tmp))
+
+
+if __name__ == "__main__":
+    main()
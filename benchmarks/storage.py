@@ -0,0 +1,92 @@
+"""
+Движки хранилища под одной нагрузкой, напрямую через интерфейс Storage, без Dispatcher.
+
+Оба движка заполняются одинаковой историей через import_measurements, затем замеряются
+отдельные вызовы: чтения /rating, /history, /trend и записи /add и /update. В конце - время
+открытия заполненного хранилища: миграции SQLite против чтения снимка и журнала.
+
+Запуск: python -m benchmarks.storage --chats 20 --chat-size 200 --days 30 --repeat 300
+"""
+import argparse
+import logging
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from bot.database.storage import Storage
+from bot.factory import STORAGES, create_storage
+from benchmarks.common import make_l10n, measure, report
+
+
+def fill(db: Storage, chats: int, chat_size: int, days: int) -> None:
+    today = date.today()
+    db.import_measurements(
+        {"chat_id": -1000 - chat, "user_id": user, "username": f"user{user}",
+         "weight": random.randint(50, 150), "height": random.randint(150, 200),
+         "measurement_date": (today - timedelta(days=day)).isoformat()}
+        for chat in range(chats) for user in range(1, chat_size + 1) for day in range(days)
+    )
+
+
+def run(engine: str, path: str, args) -> None:
+    l10n = make_l10n()
+    db = create_storage(engine, path, l10n)
+    start = time.perf_counter()
+    fill(db, args.chats, args.chat_size, args.days)
+    print(f"{engine}: заполнение {args.chats * args.chat_size * args.days} замеров за "
+          f"{time.perf_counter() - start:.2f} с")
+
+    chats = [-1000 - chat for chat in range(args.chats)]
+    users = range(1, args.chat_size + 1)
+    since = date.today() - timedelta(weeks=4)
+
+    def rating():
+        # Без кэша готового текста - замеряется сам движок
+        chat_id = random.choice(chats)
+        db._rating_cache.pop(chat_id, None)
+        db.get_rating(chat_id, random.randrange(args.chat_size // 10))
+
+    calls = {
+        "get_rating": rating,
+        "get_stats_page": lambda: db.get_stats_page(random.choice(chats), 0, 10),
+        "load_user_row": lambda: db.load_user_row(random.choice(users), random.choice(chats)),
+        "get_history": lambda: db.get_history(random.choice(users), random.choice(chats)),
+        "get_losers": lambda: db.get_losers(random.choice(chats), since),
+        "get_chat_trend": lambda: db.get_chat_trend(random.choice(chats)),
+        "update_weight": lambda: db.update_weight(random.choice(users), random.randint(50, 150), random.choice(chats)),
+    }
+    for name, call in calls.items():
+        print(report(f"  {name}", measure(call, args.repeat)))
+
+    new_users = iter(range(args.chat_size + 1, args.chat_size + 1 + args.repeat))
+    print(report("  add_measurement", measure(
+        lambda: db.add_measurement(next(new_users), "new", 180, random.randint(50, 150), random.choice(chats)),
+        args.repeat
+    )))
+    db.close()
+
+    start = time.perf_counter()
+    create_storage(engine, path, l10n).close()
+    print(f"  открытие заполненного хранилища: {(time.perf_counter() - start) * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--chat-size", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30, help="замеров на пользователя")
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--engine", choices=STORAGES, action="append", help="по умолчанию все")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in args.engine or STORAGES:
+            random.seed(1)
+            run(engine, str(Path(tmp) / engine), args)
+
+
+if __name__ == "__main__":
+    main()
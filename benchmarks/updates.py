@@ -0,0 +1,23 @@
+import itertools
+import time
+
+_update_ids = itertools.count(1)
+
+
+def message_update(chat_id: int, user_id: int, text: str) -> dict:
+    """JSON обновления Telegram с текстовым сообщением в группе."""
+    update_id = next(_update_ids)
+    entities = []
+    if text.startswith("/"):
+        entities.append({"type": "bot_command", "offset": 0, "length": len(text.split()[0])})
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"chat {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"},
+            "text": text,
+            "entities": entities,
+        },
+    }
@@ -0,0 +1,113 @@
+"""
+Локальная проверка webhook-режима: синтетические Update в JSON отправляются POST-запросами
+на WebhookServer, бот отвечает в FakeSession. Telegram API не используется.
+
+Запуск: python -m benchmarks.webhook --updates 2000 --chats 50 --concurrency 64
+"""
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import ClientSession, web
+from aiogram.methods import SendMessage
+
+from bot.database.database import Database
+from bot.database.repository import AsyncDatabase
+from bot.factory import create_dispatcher, create_locales
+from bot.webhook import SECRET_HEADER, WebhookServer
+from benchmarks.common import report
+from benchmarks.fake_session import FakeSession, make_bot
+from benchmarks.updates import message_update
+
+SECRET = "bench-secret"
+
+
+class TimedWebhookServer(WebhookServer):
+    """WebhookServer, который замеряет время обработки каждого обновления."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = []
+
+    async def _process(self, update):
+        start = time.perf_counter()
+        await super()._process(update)
+        self.timings.append((time.perf_counter() - start) * 1000)
+
+
+def workload(updates: int, chats: int, users: int) -> list:
+    # Сначала каждый добавляет замер, дальше вперемешку /update и /rating
+    payloads = []
+    for chat in range(chats):
+        for user in range(1, users + 1):
+            payloads.append(message_update(-1000 - chat, user, f"/add {random.randint(150, 200)} {random.randint(50, 150)}"))
+    while len(payloads) < updates:
+        chat, user = -1000 - random.randrange(chats), random.randint(1, users)
+        text = random.choice([f"/update {random.randint(50, 150)}", "/rating"])
+        payloads.append(message_update(chat, user, text))
+    return payloads[:max(updates, chats * users)]
+
+
+async def run(args) -> None:
+    session = FakeSession()
+    bot = make_bot(session)
+    locales = create_locales()
+    l10n = locales.get()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AsyncDatabase(Database(l10n, str(Path(tmp) / "bench.db")))
+        dp = create_dispatcher(db, locales)
+        server = TimedWebhookServer(dp, bot, "/webhook", SECRET, args.concurrency)
+        runner = web.AppRunner(server.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/webhook"
+
+        payloads = workload(args.updates, args.chats, args.users)
+        ack_timings = []
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async with ClientSession() as http:
+            async with http.post(url, json=payloads[0], headers={SECRET_HEADER: "wrong"}) as response:
+                assert response.status == 401, response.status
+
+            async def post(payload):
+                async with semaphore:
+                    start = time.perf_counter()
+                    async with http.post(url, json=payload, headers={SECRET_HEADER: SECRET}) as response:
+                        assert response.status == 200, response.status
+                    ack_timings.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(post(payload) for payload in payloads))
+            await runner.cleanup()
+            await server.drain()
+            elapsed = time.perf_counter() - start
+
+        await db.close()
+
+    print(f"{len(payloads)} обновлений за {elapsed:.2f} с: {len(payloads) / elapsed:.0f} обновлений/с, "
+          f"ответов бота: {len(session.sent(SendMessage))}")
+    print(report("HTTP-подтверждение", ack_timings))
+    print(report("обработка обновления", server.timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,72 @@
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
 from aiogram import Bot
 from aiogram.types import BotCommand, BotCommandScopeDefault
 from fluent.runtime import FluentLocalization
 
-async def set_bot_commands(bot: Bot, l10n: FluentLocalization):
-    commands = [
+from bot.locales.localization import LocaleRegistry
+
+
+def bot_commands(l10n: FluentLocalization) -> list:
+    return [
         BotCommand(command="start", description=l10n.format_value("intro-description")),
         BotCommand(command="help", description=l10n.format_value("help-description")),
         BotCommand(command="add", description=l10n.format_value("add-description")),
         BotCommand(command="update", description=l10n.format_value("update-description")),
         BotCommand(command="rating", description=l10n.format_value("rating-description")),
+        BotCommand(command="history", description=l10n.format_value("history-description")),
+        BotCommand(command="trend", description=l10n.format_value("trend-description")),
+        BotCommand(command="lang", description=l10n.format_value("lang-description")),
+        BotCommand(command="export", description=l10n.format_value("export-description")),
+        BotCommand(command="import", description=l10n.format_value("import-description")),
     ]
-    await bot.set_my_commands(commands, scope=BotCommandScopeDefault())
\ No newline at end of file
+
+
+def commands_hash(bot: Bot, locales: LocaleRegistry) -> str:
+    # Всё, что уходит в setMyCommands: бот, язык по умолчанию, команды и описания по языкам
+    commands = {
+        locale: [(command.command, command.description) for command in bot_commands(locales.get(locale))]
+        for locale in sorted(locales.available)
+    }
+    payload = json.dumps([bot.id, locales.default, commands], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def set_bot_commands(bot: Bot, locales: LocaleRegistry, hash_path: Optional[str] = None) -> bool:
+    """
+    Отправляет список команд по всем языкам
+
+    :param hash_path: файл с хэшем уже отправленного списка; если список не менялся,
+        запросов нет. Чтобы отправить заново, файл достаточно удалить
+    :return: отправлялся ли список
+    """
+    digest = None
+    if hash_path:
+        digest = commands_hash(bot, locales)
+        path = Path(hash_path)
+        if path.exists() and path.read_text(encoding="utf-8").strip() == digest:
+            return False
+
+    # Язык по умолчанию - для всех, остальные - для пользователей с этим языком Telegram.
+    # Запросы по языкам идут параллельно, чтобы новые локали не удлиняли запуск
+    await asyncio.gather(*(
+        bot.set_my_commands(
+            bot_commands(locales.get(locale)),
+            scope=BotCommandScopeDefault(),
+            language_code=None if locale == locales.default else locale,
+        )
+        for locale in sorted(locales.available)
+    ))
+
+    if digest:
+        # Хэш пишем только после успешной отправки и целиком: оборванный файл не совпадёт и список уйдёт снова
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(digest, encoding="utf-8")
+        os.replace(tmp, path)
+    return True
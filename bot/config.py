@@ -1,9 +1,63 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal, Optional
 from pydantic import SecretStr
 
 class Settings(BaseSettings):
     bot_token: SecretStr
     prompt: str = "Придумай обидное прозвище толстому человеку для рейтинга жирдяев."
+    # Хранилище: sqlite - файл db_path, memory - данные в памяти с журналом и снимками в папке memory_path
+    storage: Literal["sqlite", "memory"] = "sqlite"
+    db_path: str = "bot/database/data/fatrate.db"
+    memory_path: str = "bot/database/data/memory"
+    # Записей журнала между снимками хранилища memory
+    memory_snapshot_every: int = 10000
+    # Окно буферизации записей замеров, мс; 0 - писать сразу
+    db_flush_window_ms: int = 0
+    # Строк users в памяти (LRU): проверки пользователя, префиксы и статусы без запросов к SQLite
+    user_cache_size: int = 10000
+    # Чатов с готовым текстом страниц /rating в памяти (LRU)
+    rating_cache_size: int = 1000
+    # Хэш списка команд, отправленного в Telegram: при совпадении setMyCommands при запуске не вызывается.
+    # "" - отправлять при каждом запуске
+    commands_hash_path: str = "bot/database/data/commands.sha256"
+    # Команды одного чата по очереди, разных чатов - параллельно, не больше max_active_chats сразу.
+    # С буфером записи (db_flush_window_ms > 0) порядок записей в чате держит сам буфер,
+    # и очередь не включается - иначе пачке не из чего было бы собраться
+    chat_serialization: bool = True
+    max_active_chats: int = 256
+    # Прозвища от нейросети: "" - выключены, "stub" - локальная заглушка, "g4f" - нейросеть
+    nickname_provider: str = ""
+    nickname_pool_size: int = 5
+    nickname_concurrency: int = 2
+    nickname_timeout: float = 15.0
+    # Получение обновлений: long polling или webhook. Webhook принимает только запросы с webhook_secret;
+    # без него бот при каждом запуске регистрирует webhook_url со случайным секретом,
+    # а без webhook_url (webhook зарегистрирован снаружи) не запускается
+    mode: Literal["polling", "webhook"] = "polling"
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8000
+    webhook_secret: Optional[SecretStr] = None
+    webhook_max_concurrency: int = 100
+    # Процессов-обработчиков: приёмник раздаёт им обновления по chat_id, у каждого свой файл
+    # базы (db_path или memory_path с суффиксом .shardIofN, см. bot.database.reshard). 1 - всё в одном процессе
+    shards: int = 1
+    # Локальный эндпоинт /metrics в формате Prometheus; 0 - выключен.
+    # В режиме шардов метрики отдают обработчики, i-й - на порту metrics_port + i
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    # Логи: уровень, формат (json - строка JSON с chat_id, user_id, command, duration_ms) и доля записей DEBUG
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_debug_sample_rate: float = 0.01
+    # Еженедельная сводка рейтинга во все чаты: день недели (0 - понедельник) и час
+    digest_enabled: bool = True
+    digest_weekday: int = 6
+    digest_hour: int = 20
+    # Исходящая очередь: сообщений в секунду на бота (в режиме шардов делится между обработчиками) и в минуту на чат
+    send_rate: float = 25
+    send_chat_per_minute: float = 20
     
     model_config = SettingsConfigDict(
         env_file="../.env",
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class WriteCoalescer:
+    """
+    Буфер записи для всплесков /add и /update.
+
+    Записи одного чата копятся в течение окна window, затем применяются одной
+    транзакцией через apply_batch. Каждый вызов submit получает свой результат
+    только после того, как пачка закоммичена.
+    """
+
+    def __init__(self, apply_batch: Callable[[int, list], Awaitable[list]], window: float):
+        self.apply_batch = apply_batch
+        self.window = window
+        self._pending = {}
+        self._flushes = set()
+
+    async def submit(self, chat_id: int, kind: str, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(chat_id)
+        if batch is None:
+            batch = self._pending[chat_id] = []
+            loop.call_later(self.window, self._schedule_flush, chat_id)
+        batch.append(((kind, kwargs), future))
+        return await future
+
+    def _schedule_flush(self, chat_id: int) -> None:
+        task = asyncio.create_task(self._flush(chat_id))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, chat_id: int) -> None:
+        batch = self._pending.pop(chat_id, None)
+        if not batch:
+            return
+        try:
+            results = await self.apply_batch(chat_id, [write for write, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Сбрасывает все накопленные записи, не дожидаясь окончания окна."""
+        await asyncio.gather(*(self._flush(chat_id) for chat_id in list(self._pending)))
+        await asyncio.gather(*self._flushes, return_exceptions=True)
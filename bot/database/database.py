@@ -1,265 +1,451 @@
 import sqlite3
-from pathlib import Path
+import time
 from datetime import date
+from typing import Iterator, Optional
 from fluent.runtime import FluentLocalization
 from contextlib import contextmanager
-from logging import info
-from bot.handlers.prefix import get_fat_prefix, get_bmi_status
+from logging import debug
+from bot.database.migrate import migrate
+from bot.database.rank_index import ChatRankIndex
+from bot.database.storage import RATING_CACHE_SIZE, TRANSFER_BATCH_SIZE, Storage, UserExistsError, UserNotFoundError
+from bot.database.user_cache import MISSING, USER_CACHE_SIZE
+from bot.handlers.trend import HISTORY_LIMIT, MOVING_AVERAGE, TREND_TOP
+from bot.locales.localization import LocaleRegistry
+from bot.nicknames.pool import NicknamePool
 
-class Database:
-    def __init__(self, l10n: FluentLocalization, db_path: str = "bot/database/data/fatrate.db"):
-        self.l10n = l10n
+# Настройки соединения: WAL, чтобы читатели не блокировали единственного писателя,
+# и кэш страниц/mmap, чтобы горячие данные не читались с диска на каждый запрос
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# Размер кэша подготовленных выражений sqlite3
+CACHED_STATEMENTS = 256
+
+
+class Database(Storage):
+    """Хранилище в SQLite: данные в файле db_path, схема - миграции из migrations."""
+
+    def __init__(self,
+                 l10n: FluentLocalization,
+                 db_path: str = "bot/database/data/fatrate.db",
+                 nicknames: NicknamePool = None,
+                 user_cache_size: int = USER_CACHE_SIZE,
+                 locales: LocaleRegistry = None,
+                 rating_cache_size: int = RATING_CACHE_SIZE
+                 ):
+        super().__init__(l10n, nicknames, user_cache_size, locales, rating_cache_size)
         self.db_path = db_path
+        self._conn = None
+        # Глубина вложенных блоков get_connection; поток один - под self._lock
+        self._depth = 0
+        self._ranks = {}
         self.init_db()
         
     
     def init_db(self):
-        schema_path = Path(__file__).parent / "schema.sql"
         with self.get_connection() as conn:
-            with open(schema_path, encoding="utf-8") as f:
-                conn.executescript(f.read())
-                info(self.l10n.format_value("info-database-created"))
+            applied = migrate(conn)
+            if applied:
+                self.log.info("info-database-migrated", {"versions": ", ".join(map(str, applied))})
+            self.log.info("info-database-created")
         
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for pragma, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        # Одно долгоживущее соединение на всё время работы бота.
+        # Блок with - это транзакция: коммит при успехе, откат при ошибке.
+        # Вложенный блок входит во внешний: коммитит и откатывает только внешний
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self._conn
+                finally:
+                    self._depth -= 1
+                return
+            self._depth = 1
+            try:
+                yield self._conn
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            finally:
+                self._depth = 0
+
+    @contextmanager
+    def _savepoint(self, conn: sqlite3.Connection):
+        # Точки сохранения вкладываются в одну транзакцию пачки
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT write")
         try:
-            yield conn
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK TO write")
+            raise
         finally:
-            conn.close()
+            conn.execute("RELEASE write")
+
+    def _timed(self, name: str, run, rows):
+        # Выполняет запрос и сообщает query_hook имя, длительность и число строк
+        if self.query_hook is None:
+            return run()
+        start = time.perf_counter()
+        result = run()
+        self.query_hook(name, time.perf_counter() - start, rows(result))
+        return result
+
+    def _execute(self, conn: sqlite3.Connection, name: str, sql: str, params=()) -> sqlite3.Cursor:
+        return self._timed(name, lambda: conn.execute(sql, params), lambda cursor: max(cursor.rowcount, 0))
 
-    def user_exists(self, user_id: int, chat_id: int) -> bool:
+    def _executemany(self, conn: sqlite3.Connection, name: str, sql: str, seq) -> sqlite3.Cursor:
+        return self._timed(name, lambda: conn.executemany(sql, seq), lambda cursor: max(cursor.rowcount, 0))
+
+    def _fetchone(self, conn: sqlite3.Connection, name: str, sql: str, params=()):
+        return self._timed(name, lambda: conn.execute(sql, params).fetchone(), lambda row: int(row is not None))
+
+    def _fetchall(self, conn: sqlite3.Connection, name: str, sql: str, params=()) -> list:
+        return self._timed(name, lambda: conn.execute(sql, params).fetchall(), len)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def load_user_row(self, user_id: int, chat_id: int):
         with self.get_connection() as conn:
-            result = conn.execute(
-                """SELECT user_id FROM users
+            # Чтение и запись в кэш под блокировкой БД: запись в users между ними не вклинится
+            row = self._fetchone(
+                conn, "get_user_row",
+                """SELECT username, prefix, status FROM users
                 WHERE user_id = ? AND chat_id = ?""",
                 (user_id, chat_id)
-            ).fetchone()
-            return result is not None
-           
-    def add_measurement(self, 
-                    user_id: int, 
-                    username: str,
-                    height: float,
-                    weight: float, 
-                    chat_id: int
-                    ) -> None:
-        
-        with self.get_connection() as conn:
-
-            # Если пользователь не существует, добавляем новое измерение
-            total = conn.execute("SELECT COUNT(*) FROM users WHERE chat_id = ?", (chat_id,)).fetchone()[0] + 1
-            
-            bmi = weight / (height/100) ** 2
-            
-            # Добавляем измерение
-            conn.execute(
-                    """INSERT INTO measurements (user_id, chat_id, weight, height, bmi) 
-                    VALUES (?, ?, ?, ?, ?)""",
-                    (user_id, chat_id, weight, height, bmi)
             )
-            info(self.l10n.format_value("info-database-data-added"))
-            
-            # Получаем список всех по убыванию BMI
-            all_users = conn.execute(
-                """SELECT user_id, bmi FROM measurements
-                WHERE chat_id = ?
-                ORDER BY bmi DESC""",
+            self.users.put(chat_id, user_id, row)
+        return row or MISSING
+           
+    def _rank_index(self, conn: sqlite3.Connection, chat_id: int) -> ChatRankIndex:
+        # Индекс чата загружается из БД при первом обращении и дальше обновляется инкрементально
+        ranks = self._ranks.get(chat_id)
+        if ranks is None:
+            rows = self._fetchall(
+                conn, "load_rank_index",
+                """SELECT user_id, bmi FROM latest_measurement
+                WHERE chat_id = ?""",
                 (chat_id,)
-            ).fetchall()
-
-            # Ищем позицию нового жиробаса
-            position = next((index + 1 for index, (curr_user_id, _) in enumerate(all_users) 
-                if curr_user_id == user_id), None)
-            
-            # Генерим его титул и статус
-            prefix = get_fat_prefix(self.l10n, position, total, bmi)
-            status_key = get_bmi_status(bmi)
-            status = self.l10n.format_value(status_key)
-            
-            # Добавляем/обновляем жирок
-            conn.execute(
-                    """INSERT OR REPLACE INTO users (user_id, chat_id, username, prefix, status) 
-                    VALUES (?, ?, ?, ?, ?)""",
-                    (user_id, chat_id, username, prefix, status)
-            )   
-            info(self.l10n.format_value("info-database-user-added"))
-            
-            # Обновляем только статус и префикс нового пользователя
-            current_status = self._get_status(conn, user_id, chat_id)
-            if current_status != status:
-                self.update_prefix(conn, user_id, prefix, chat_id)
-                self.update_status(conn, ser_id, status, chat_id)
-
-            # Проверяем, смещает ли новый пользователь кого-то с первого или последнего места
-            if position == 1 or position == total:
-                affected_user_id = all_users[0][0] if position == 1 else all_users[-1][0]
-                affected_bmi = all_users[0][1] if position == 1 else all_users[-1][1]
-                affected_prefix = get_fat_prefix(self.l10n, 1 if position == 1 else total, total, affected_bmi)
-                affected_status_key = get_bmi_status(affected_bmi)
-                affected_status = self.l10n.format_value(affected_status_key)
-
-                # Обновляем только если префикс или статус изменились
-                current_prefix = self._get_prefix(conn, affected_user_id, chat_id)
-                current_status = self._get_status(conn, affected_user_id, chat_id)
-                if current_prefix != affected_prefix or current_status != affected_status:
-                    self.update_prefix(conn, affected_user_id, affected_prefix, chat_id)
-                    self.update_status(conn, affected_user_id, affected_status, chat_id)
-                    conn.commit()
-                    info("Transaction committed")
-                    return self.l10n.format_value("add-success", {"height": height, "weight": weight})
-            
-
-            
-    def update_weight(self,
-                      user_id: int, 
+            )
+            ranks = ChatRankIndex(rows)
+            self._ranks[chat_id] = ranks
+        return ranks
+
+    def _invalidate_chat(self, chat_id: int):
+        # После отката транзакции индекс мог разойтись с БД - перечитаем его при следующем обращении
+        self._ranks.pop(chat_id, None)
+
+    def _write_add(self,
+                   conn: sqlite3.Connection,
+                   user_id: int,
+                   username: str,
+                   height: float,
+                   weight: float,
+                   chat_id: int
+                   ) -> tuple:
+        bmi = weight / (height/100) ** 2
+
+        # Проверка и вставка в одной транзакции: два /add подряд не проскочат оба
+        if self._fetchone(
+            conn, "user_exists",
+            """SELECT user_id FROM users
+            WHERE user_id = ? AND chat_id = ?""",
+            (user_id, chat_id)
+        ):
+            self.log.debug("info-database-user-exists")
+            raise UserExistsError(user_id, chat_id)
+
+        # Добавляем измерение. Дата - местная, как у /update и движка memory, а не CURRENT_DATE SQLite в UTC
+        self._execute(
+                conn, "insert_measurement",
+                """INSERT INTO measurements (user_id, chat_id, weight, height, bmi, measurement_date)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (user_id, chat_id, weight, height, bmi, date.today().isoformat())
+        )
+        self.log.debug("info-database-data-added")
+
+        # Добавляем/обновляем жирок, титул и статус выставит пересчёт
+        self._execute(
+                conn, "upsert_user",
+                """INSERT INTO users (user_id, chat_id, username) 
+                VALUES (?, ?, ?)
+                ON CONFLICT (user_id, chat_id) DO UPDATE SET username = excluded.username""",
+                (user_id, chat_id, username)
+        )   
+        self.users.invalidate(chat_id, (user_id,))
+        self.log.debug("info-database-user-added")
+
+        # Ищем позицию нового жиробаса и тех, кого он смещает с первого или последнего места
+        affected = self._place(conn, chat_id, user_id, bmi)
+        return None, affected
+
+    def _write_update(self,
+                      conn: sqlite3.Connection,
+                      user_id: int,
                       weight: float,
                       chat_id: int,
-                      measurement_date: date = date.today()
-                      ) -> None:
-        with self.get_connection() as conn:
-            info(f"(БД) Пользователь {user_id} обновляет вес: {weight}")
-            # Получаем последний рост
-            cursor = conn.execute(
-                """SELECT height FROM measurements
-                WHERE user_id = ? AND chat_id = ? AND height IS NOT NULL
-                ORDER BY measurement_date DESC LIMIT 1""",
-                (user_id, chat_id)
+                      measurement_date: date = None
+                      ) -> tuple:
+        measurement_date = measurement_date or date.today()
+        debug("(БД) Пользователь %s обновляет вес: %s", user_id, weight)
+        # Получаем последний рост
+        height_row = self._fetchone(
+            conn, "get_height",
+            """SELECT height FROM latest_measurement
+            WHERE chat_id = ? AND user_id = ? AND height IS NOT NULL""",
+            (chat_id, user_id)
+        )
+        debug("(БД) Пользователь %s получил последний рост: %s", user_id, height_row)
+        if not height_row:
+            raise UserNotFoundError(user_id, chat_id)
+
+        # Считаем новый BMI
+        height = height_row[0]
+        bmi = weight / (height/100) ** 2
+
+        # Записываем замер за день: обновляем сегодняшний или добавляем новый
+        self._execute(
+            conn, "upsert_measurement",
+            """INSERT INTO measurements (user_id, chat_id, weight, height, bmi, measurement_date)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (user_id, chat_id, measurement_date)
+               DO UPDATE SET weight = excluded.weight, bmi = excluded.bmi""",
+            (user_id, chat_id, weight, height, bmi, measurement_date.isoformat())
+        )
+        debug("(БД) Пользователь %s обновил вес и BMI", user_id)
+
+        # Рейтинг идёт по последнему замеру - задним числом он мог и не измениться
+        bmi = self._fetchone(
+            conn, "get_latest_bmi",
+            """SELECT bmi FROM latest_measurement WHERE chat_id = ? AND user_id = ?""",
+            (chat_id, user_id)
+        )[0]
+
+        affected = self._place(conn, chat_id, user_id, bmi)
+        self.log.debug("info-database-data-updated")
+        return None, affected
+
+    def _prefix_rows(self, conn: sqlite3.Connection, chat_id: int, user_ids: Optional[list]) -> list:
+        if user_ids is None:
+            return self._fetchall(
+                conn, "get_chat_prefixes",
+                """SELECT user_id, prefix, prefix_key, status_key FROM users WHERE chat_id = ?""",
+                (chat_id,)
             )
+        return self._fetchall(
+            conn, "get_prefixes",
+            f"""SELECT user_id, prefix, prefix_key, status_key FROM users
+            WHERE chat_id = ? AND user_id IN ({", ".join("?" * len(user_ids))})""",
+            (chat_id, *user_ids)
+        )
 
-            height_row = cursor.fetchone()
-            info(f"(БД) Пользователь {user_id} получил последний рост: {height_row}")
-            if height_row:
-                
-                # Считаем новый BMI
-                bmi = weight / (height_row[0]/100) ** 2
-                
-                # Получаем текущий статус тушки
-                current_status = self._get_status(conn, user_id, chat_id)
-            
-                # Вычисляем новый статус на основе нового BMI
-                new_status_key = get_bmi_status(bmi)
-                new_status = self.l10n.format_value(new_status_key)
-                # Обновляем вес и BMI
-                conn.execute(
-                    """UPDATE measurements 
-                       SET weight = ?, bmi = ?
-                       WHERE user_id = ? AND chat_id = ? AND measurement_date = ?""",
-                    (weight, bmi, user_id, chat_id, measurement_date)
-                )
-                conn.commit() 
-                info(f"(БД) Пользователь {user_id} обновил вес и BMI")
-
-                # Проверяем, изменился ли статус
-                if current_status != new_status:
-                # Обновляем префикс только если статус изменился
-                    prefix = get_fat_prefix(self.l10n, None, None, bmi)  # Позиция и общее количество не нужны здесь
-                    self.update_prefix(conn, user_id, prefix, chat_id)
-                    self.update_status(conn,user_id, new_status, chat_id)
-
-                # Получаем общее количество юзеров
-                total = conn.execute("SELECT COUNT(*) FROM users WHERE chat_id = ?", (chat_id,)).fetchone()[0]
-            
-                # Получаем всех по убыванию BMI
-                all_users = conn.execute(
-                    """SELECT user_id, bmi FROM measurements
-                    WHERE chat_id = ?
-                    ORDER BY bmi DESC""",
-                    (chat_id,)
-                ).fetchall()
-            
-                # Находим новую позицию пользователя
-                new_position = next((index + 1 for index, (curr_user_id, _) in enumerate(all_users) if curr_user_id == user_id), None)
-
-                # Проверяем, изменилось ли положение пользователя
-                if new_position is not None and (new_position == 1 or new_position == total):
-                    # Обновляем префиксы и статусы только для тех, кто смещается
-                    self.update_prefixes_and_statuses(conn, all_users, chat_id)
-
-                conn.commit()
-                info(self.l10n.format_value("info-database-data-updated"))
-    
-    def update_prefixes_and_statuses(self, conn: sqlite3.Connection, all_users: list, chat_id: int): 
-        # Обновляем префиксы и статусы - используется только в update_weight
-        total = len(all_users)
-        for position, (curr_user_id, curr_bmi) in enumerate(all_users, 1):
-            curr_prefix = get_fat_prefix(self.l10n, position, total, curr_bmi)
-            status_key = get_bmi_status(curr_bmi)
-            curr_status = self.l10n.format_value(status_key)
-
-            # Проверяем, изменился ли префикс или статус
-            current_prefix = self._get_prefix(conn, curr_user_id, chat_id)
-            current_status = self._get_status(conn, curr_user_id, chat_id)
-
-            if current_prefix != curr_prefix or current_status != curr_status:
-                self.update_prefix(conn, curr_user_id, curr_prefix, chat_id)
-                self.update_status(conn, curr_user_id, curr_status, chat_id)
+    def _save_prefixes(self, conn: sqlite3.Connection, changes: list) -> None:
+        self._executemany(
+            conn, "update_prefixes_and_statuses",
+            """UPDATE users SET prefix = ?, prefix_key = ?, status = ?, status_key = ?
+            WHERE user_id = ? AND chat_id = ?""",
+            changes
+        )
 
     def update_prefix(self, conn: sqlite3.Connection, user_id: int, prefix: str, chat_id: int):
-        conn.execute(
+        self._execute(
+            conn, "update_prefix",
             """UPDATE users SET prefix = ? WHERE user_id = ? AND chat_id = ?""",
             (prefix, user_id, chat_id)
         )
-
-    def _get_prefix(self, conn: sqlite3.Connection, user_id: int, chat_id: int) -> str:
-        result = conn.execute(
-            """SELECT prefix FROM users WHERE user_id = ? AND chat_id = ?""",
-            (user_id, chat_id)
-        ).fetchone()
-        return result[0] if result else None
-
-    def get_prefix(self, user_id: int, chat_id: int) -> str:
-        with self.get_connection() as conn:
-            result = conn.execute(
-                """SELECT prefix FROM users WHERE user_id = ? AND chat_id = ?""",
-                (user_id, chat_id)
-            ).fetchone()
-            return result[0] if result else None
+        self.users.invalidate(chat_id, (user_id,))
 
     def update_status(self, conn: sqlite3.Connection, user_id: int, status: str, chat_id: int):
-        conn.execute(
+        self._execute(
+            conn, "update_status",
             """UPDATE users SET status = ? WHERE user_id = ? AND chat_id = ?""",
             (status, user_id, chat_id)
         )
+        self.users.invalidate(chat_id, (user_id,))
+        
+    def get_stats(self, chat_id: int):
+        # Последний замер каждого пользователя вместе с префиксом и статусом - одним запросом
+        with self.get_connection() as conn:
+            rows = self._fetchall(
+                    conn, "get_stats",
+                    """SELECT u.user_id, u.username, m.weight, m.bmi, m.measurement_date, u.prefix, u.status
+                    FROM latest_measurement m
+                    JOIN users u ON u.user_id = m.user_id AND u.chat_id = m.chat_id
+                    WHERE m.chat_id = ?
+                    ORDER BY m.bmi DESC, m.user_id""",
+                    (chat_id,)
+                    )
+            self.log.debug("info-database-stats-gotten")
+            return rows
+
+    def _stats_rows(self, conn: sqlite3.Connection, chat_id: int, offset: int, limit: int) -> list:
+        # Первую строку страницы даёт индекс рейтинга, дальше диапазон
+        # по индексу (chat_id, bmi DESC, user_id) - без OFFSET, одинаково для любой страницы
+        start = self._rank_index(conn, chat_id).at(offset + 1)
+        if start is None:
+            return []
+        user_id, bmi = start
+        return self._fetchall(
+                conn, "get_stats_page",
+                """SELECT u.user_id, u.username, m.weight, m.bmi, m.measurement_date, u.prefix, u.status,
+                    u.prefix_key, u.status_key
+                FROM latest_measurement m
+                JOIN users u ON u.user_id = m.user_id AND u.chat_id = m.chat_id
+                WHERE m.chat_id = ? AND m.bmi <= ? AND NOT (m.bmi = ? AND m.user_id < ?)
+                ORDER BY m.bmi DESC, m.user_id
+                LIMIT ?""",
+                (chat_id, bmi, bmi, user_id, limit)
+                )
+
+    def _load_chat_locale(self, conn: sqlite3.Connection, chat_id: int) -> Optional[str]:
+        row = self._fetchone(
+            conn, "get_chat_locale",
+            """SELECT locale FROM chat_settings WHERE chat_id = ?""",
+            (chat_id,)
+        )
+        return row[0] if row else None
 
-    def _get_status(self, conn: sqlite3.Connection, user_id: int, chat_id: int) -> str:
-        result = conn.execute(
-            """SELECT status FROM users WHERE user_id = ? AND chat_id = ?""",
-            (user_id, chat_id)
-        ).fetchone()
-        return result[0] if result else None
+    def _save_chat_locale(self, conn: sqlite3.Connection, chat_id: int, locale: Optional[str]) -> None:
+        self._execute(
+            conn, "set_chat_locale",
+            """INSERT INTO chat_settings (chat_id, locale) VALUES (?, ?)
+            ON CONFLICT (chat_id) DO UPDATE SET locale = excluded.locale""",
+            (chat_id, locale)
+        )
 
-    def get_status(self, user_id: int, chat_id: int) -> str:
+    def get_chat_ids(self) -> list:
         with self.get_connection() as conn:
-            result = conn.execute(
-                """SELECT status FROM users WHERE user_id = ? AND chat_id = ?""",
-                (user_id, chat_id)
-            ).fetchone()
-            return result[0] if result else None
+            return [row[0] for row in self._fetchall(
+                conn, "get_chat_ids",
+                """SELECT DISTINCT chat_id FROM latest_measurement""",
+                ()
+            )]
 
-    def get_user(self, user_id: int, chat_id: int):
+    def get_history(self, user_id: int, chat_id: int, limit: int = HISTORY_LIMIT):
+        # Оконные функции считаются по всей истории пользователя одним запросом
         with self.get_connection() as conn:
-            cursor = conn.execute(
-                """SELECT username FROM users
-                   WHERE user_id = ? AND chat_id = ?""",
-                (user_id, chat_id)
+            return self._fetchall(
+                conn, "get_history",
+                f"""SELECT measurement_date, weight, bmi,
+                    weight - LAG(weight) OVER w,
+                    bmi - LAG(bmi) OVER w,
+                    AVG(weight) OVER (w ROWS BETWEEN {MOVING_AVERAGE - 1} PRECEDING AND CURRENT ROW),
+                    weight - FIRST_VALUE(weight) OVER w
+                FROM measurements
+                WHERE user_id = ? AND chat_id = ?
+                WINDOW w AS (ORDER BY measurement_date)
+                ORDER BY measurement_date DESC
+                LIMIT ?""",
+                (user_id, chat_id, limit)
             )
-            info(self.l10n.format_value("info-database-user-found"))
-            return cursor.fetchone()
-        
-    def get_stats(self, chat_id: int):
+
+    def get_losers(self, chat_id: int, since: date, limit: int = TREND_TOP):
+        # Считается по недельным сводкам чата
         with self.get_connection() as conn:
+            return self._fetchall(
+                conn, "get_losers",
+                """WITH weeks AS (
+                    SELECT user_id, week, last_weight,
+                        COALESCE(LAG(last_weight) OVER (PARTITION BY user_id ORDER BY week), first_weight) AS start_weight
+                    FROM weekly_user_rollup
+                    WHERE chat_id = ?
+                ), period AS (
+                    SELECT user_id, start_weight, last_weight,
+                        ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY week) AS first_rank,
+                        ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY week DESC) AS last_rank
+                    FROM weeks
+                    WHERE week >= date(?, 'weekday 0', '-6 days')
+                )
+                SELECT u.username, s.start_weight - e.last_weight AS lost
+                FROM period s
+                JOIN period e ON e.user_id = s.user_id AND e.last_rank = 1
+                JOIN users u ON u.user_id = s.user_id AND u.chat_id = ?
+                WHERE s.first_rank = 1 AND s.start_weight > e.last_weight
+                ORDER BY lost DESC
+                LIMIT ?""",
+                (chat_id, since.isoformat(), chat_id, limit)
+            )
+
+    def get_chat_trend(self, chat_id: int, today: date = None):
+        # Считается по дневным сводкам чата
+        today = today or date.today()
+        with self.get_connection() as conn:
+            return self._fetchone(
+                conn, "get_chat_trend",
+                f"""WITH days AS (
+                    SELECT measurement_date,
+                        SUM(total_weight) OVER w / SUM(users) OVER w AS average
+                    FROM daily_chat_rollup
+                    WHERE chat_id = ? AND measurement_date > date(?, '-{2 * MOVING_AVERAGE} days')
+                    WINDOW w AS (ORDER BY julianday(measurement_date)
+                                 RANGE BETWEEN {MOVING_AVERAGE - 1} PRECEDING AND CURRENT ROW)
+                )
+                SELECT
+                    (SELECT average FROM days
+                     WHERE measurement_date > date(?, '-{MOVING_AVERAGE} days')
+                     ORDER BY measurement_date DESC LIMIT 1),
+                    (SELECT average FROM days
+                     WHERE measurement_date <= date(?, '-{MOVING_AVERAGE} days')
+                     ORDER BY measurement_date DESC LIMIT 1)""",
+                (chat_id, today.isoformat(), today.isoformat(), today.isoformat())
+            )
+
+    def _import_chunk(self, conn: sqlite3.Connection, measurements: list, users: list) -> None:
+        self._executemany(
+            conn, "import_measurements",
+            """INSERT INTO measurements (user_id, chat_id, weight, height, bmi, measurement_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, chat_id, measurement_date)
+            DO UPDATE SET weight = excluded.weight, height = excluded.height, bmi = excluded.bmi""",
+            measurements
+        )
+        self._executemany(
+            conn, "import_users",
+            """INSERT INTO users (user_id, chat_id, username)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id, chat_id)
+            DO UPDATE SET username = COALESCE(excluded.username, users.username)""",
+            users
+        )
+
+    def iter_measurements(self, chat_id: int = None, batch_size: int = TRANSFER_BATCH_SIZE) -> Iterator[tuple]:
+        # Курсором через отдельное соединение только для чтения - память не зависит от объёма истории
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
             cursor = conn.execute(
-                    """SELECT u.user_id, u.username, m.weight, m.bmi, m.measurement_date
-                    FROM measurements m
-                    JOIN users u ON m.user_id = u.user_id AND m.chat_id = u.chat_id
-                    WHERE m.chat_id = ? AND m.measurement_date = (
-                    SELECT MAX(measurement_date)
-                    FROM measurements
-                    WHERE user_id = m.user_id AND chat_id = m.chat_id
-                    )
-                    ORDER BY m.bmi DESC""",
-                    (chat_id,)
-                    )
-            info(self.l10n.format_value("info-database-stats-gotten"))
-            return cursor.fetchall()
+                f"""SELECT m.chat_id, m.user_id, u.username, m.weight, m.height, m.bmi, m.measurement_date
+                FROM measurements m
+                LEFT JOIN users u ON u.user_id = m.user_id AND u.chat_id = m.chat_id
+                {"WHERE m.chat_id = ?" if chat_id is not None else ""}""",
+                (chat_id,) if chat_id is not None else ()
+            )
+            while rows := cursor.fetchmany(batch_size):
+                yield from rows
+        finally:
+            conn.close()
@@ -0,0 +1,464 @@
+import heapq
+import itertools
+import json
+import os
+import time
+from bisect import bisect_left, insort
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from logging import debug, warning
+from pathlib import Path
+from typing import Iterator, Optional
+
+from fluent.runtime import FluentLocalization
+
+from bot.database.rank_index import ChatRankIndex
+from bot.database.storage import RATING_CACHE_SIZE, TRANSFER_BATCH_SIZE, Storage, UserExistsError, UserNotFoundError
+from bot.database.user_cache import MISSING, USER_CACHE_SIZE
+from bot.handlers.trend import HISTORY_LIMIT, MOVING_AVERAGE, TREND_TOP
+from bot.locales.localization import LocaleRegistry
+from bot.nicknames.pool import NicknamePool
+
+# Записей журнала между снимками
+SNAPSHOT_EVERY = 10000
+
+JOURNAL_FILE = "journal.jsonl"
+SNAPSHOT_FILE = "snapshot.jsonl"
+
+# Записи журнала и снимка - массивы JSON, первым элементом вид изменения:
+# замер за день, имя пользователя, префикс и статус, язык чата
+MEASUREMENT, USER, PREFIX, LOCALE = "m", "u", "p", "l"
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class Journal:
+    """
+    Журнал изменений: по строке JSON на изменение, файл только дописывается.
+
+    Транзакция уходит одним write и сбрасывается в ОС, как при synchronous=NORMAL у SQLite;
+    с fsync=True - ещё и на диск. Строка, оборванная падением процесса, при чтении отрезается.
+    """
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = Path(path)
+        self.fsync = fsync
+        # Записей в файле с последнего reset
+        self.entries = 0
+        self._file = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def replay(self) -> Iterator[list]:
+        """Записи файла по порядку. Генератор нужно дочитать: в конце отрезается оборванный хвост."""
+        if not self.path.exists():
+            return
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("строка не дописана")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Порча посреди файла падением не объясняется - запускаться с ней нельзя
+                    if f.read(1):
+                        raise
+                    warning("Журнал %s: отброшена оборванная последняя запись", self.path)
+                    break
+                good += len(line)
+                self.entries += 1
+                yield entry
+        if good < self.path.stat().st_size:
+            os.truncate(self.path, good)
+
+    def open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, entries: list) -> None:
+        self._file.write("".join(_encode(entry) + "\n" for entry in entries))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.entries += len(entries)
+
+    def reset(self) -> None:
+        # Всё записанное уже в снимке - журнал начинается заново
+        self._file.seek(0)
+        self._file.truncate()
+        self.entries = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _History:
+    """Замеры пользователя: даты по возрастанию и (вес, рост, ИМТ) по дате."""
+
+    __slots__ = ("dates", "values")
+
+    def __init__(self):
+        self.dates = []
+        self.values = {}
+
+    def latest(self) -> tuple:
+        return self.values[self.dates[-1]]
+
+
+class MemoryDatabase(Storage):
+    """
+    Хранилище в памяти процесса: запросы - обращения к словарям и индексу рейтинга, без SQL.
+
+    Каждое изменение дописывается в журнал path/journal.jsonl, каждые snapshot_every записей
+    и при закрытии состояние целиком сохраняется в path/snapshot.jsonl, а журнал начинается заново.
+    При запуске читается снимок, затем журнал. Записи идемпотентны (замена, а не прибавка),
+    поэтому падение между снимком и очисткой журнала ничего не портит.
+    Все данные живут в памяти - движок для небольших установок, тестов и бенчмарков.
+    """
+
+    def __init__(self,
+                 l10n: FluentLocalization,
+                 path: str = "bot/database/data/memory",
+                 nicknames: NicknamePool = None,
+                 user_cache_size: int = USER_CACHE_SIZE,
+                 locales: LocaleRegistry = None,
+                 rating_cache_size: int = RATING_CACHE_SIZE,
+                 snapshot_every: int = SNAPSHOT_EVERY,
+                 fsync: bool = False
+                 ):
+        super().__init__(l10n, nicknames, user_cache_size, locales, rating_cache_size)
+        self.path = Path(path)
+        self.snapshot_every = snapshot_every
+        self._journal = Journal(self.path / JOURNAL_FILE, fsync)
+        # chat_id -> user_id -> _History
+        self._history = {}
+        # chat_id -> user_id -> (username, prefix, status, prefix_key, status_key)
+        self._users = {}
+        # chat_id -> дата -> [пользователей с замером, суммарный вес] для тренда чата
+        self._daily = {}
+        self._ranks = {}
+        # Записи журнала открытой транзакции
+        self._batch = None
+        self.init_db()
+
+    def init_db(self):
+        with self._lock:
+            if self._journal.is_open:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            start = time.perf_counter()
+            entries = 0
+            for entry in itertools.chain(Journal(self.path / SNAPSHOT_FILE).replay(), self._journal.replay()):
+                self._apply(entry)
+                entries += 1
+            self._journal.open()
+            self.log.info("info-database-replayed", {
+                "entries": entries, "ms": round((time.perf_counter() - start) * 1000)
+            })
+            self.log.info("info-database-created")
+
+    def _apply(self, entry: list) -> None:
+        kind, chat_id, *values = entry
+        if kind == MEASUREMENT:
+            user_id, measurement_date, weight, height, bmi = values
+            history = self._history.setdefault(chat_id, {}).get(user_id)
+            if history is None:
+                history = self._history[chat_id][user_id] = _History()
+            day = self._daily.setdefault(chat_id, {}).setdefault(measurement_date, [0, 0.0])
+            old = history.values.get(measurement_date)
+            if old is None:
+                insort(history.dates, measurement_date)
+                day[0] += 1
+                day[1] += float(weight)
+            else:
+                day[1] += weight - old[0]
+            history.values[measurement_date] = (float(weight), float(height), float(bmi))
+        elif kind == USER:
+            user_id, username = values
+            users = self._users.setdefault(chat_id, {})
+            row = users.get(user_id)
+            if row is None:
+                users[user_id] = (username, None, None, None, None)
+            elif username is not None:
+                users[user_id] = (username, *row[1:])
+        elif kind == PREFIX:
+            user_id, prefix, prefix_key, status, status_key = values
+            users = self._users.setdefault(chat_id, {})
+            row = users.get(user_id)
+            users[user_id] = (row[0] if row else None, prefix, status, prefix_key, status_key)
+        elif kind == LOCALE:
+            self.chat_locales[chat_id], = values
+
+    def _record(self, batch: list, entry: list) -> None:
+        batch.append(entry)
+        self._apply(entry)
+
+    @contextmanager
+    def get_connection(self):
+        # Транзакция - пачка записей журнала, она пишется в файл одним куском в конце внешнего блока.
+        # Изменения в памяти не откатываются, поэтому и при ошибке журнал получает всё, что применено:
+        # запись сначала всё проверяет и только потом меняет данные
+        with self._lock:
+            if self._batch is not None:
+                yield self._batch
+                return
+            self._batch = []
+            try:
+                yield self._batch
+            finally:
+                batch, self._batch = self._batch, None
+                if batch:
+                    self._journal.write(batch)
+                    if self._journal.entries >= self.snapshot_every:
+                        self.snapshot()
+
+    def _savepoint(self, batch: list):
+        # Откатывать нечего: ошибка записи случается до первого изменения
+        return nullcontext()
+
+    def _entries(self) -> Iterator[list]:
+        # Состояние целиком в виде записей журнала
+        for chat_id, histories in self._history.items():
+            for user_id, history in histories.items():
+                for measurement_date in history.dates:
+                    yield [MEASUREMENT, chat_id, user_id, measurement_date, *history.values[measurement_date]]
+        for chat_id, users in self._users.items():
+            for user_id, (username, prefix, status, prefix_key, status_key) in users.items():
+                yield [USER, chat_id, user_id, username]
+                if prefix_key or status_key:
+                    yield [PREFIX, chat_id, user_id, prefix, prefix_key, status, status_key]
+        for chat_id, locale in self.chat_locales.items():
+            if locale is not None:
+                yield [LOCALE, chat_id, locale]
+
+    def snapshot(self) -> int:
+        """
+        Сохраняет состояние в снимок и начинает журнал заново
+
+        :return: записей в снимке
+        """
+        with self._lock:
+            start = time.perf_counter()
+            path = self.path / SNAPSHOT_FILE
+            tmp = path.with_suffix(".tmp")
+            entries = 0
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in self._entries():
+                    f.write(_encode(entry) + "\n")
+                    entries += 1
+                f.flush()
+                os.fsync(f.fileno())
+            # Снимок подменяется целиком: до этой строки при запуске читается старый снимок и весь журнал
+            os.replace(tmp, path)
+            self._journal.reset()
+            self.log.info("info-database-snapshot", {
+                "entries": entries, "ms": round((time.perf_counter() - start) * 1000)
+            })
+            return entries
+
+    def close(self):
+        with self._lock:
+            if self._journal.is_open:
+                if self._journal.entries:
+                    self.snapshot()
+                self._journal.close()
+
+    def load_user_row(self, user_id: int, chat_id: int):
+        with self._lock:
+            row = self._users.get(chat_id, {}).get(user_id)
+            row = row[:3] if row else None
+            self.users.put(chat_id, user_id, row)
+        return row or MISSING
+
+    def _rank_index(self, conn: list, chat_id: int) -> ChatRankIndex:
+        # Индекс строится из последних замеров при первом обращении и дальше обновляется инкрементально
+        ranks = self._ranks.get(chat_id)
+        if ranks is None:
+            histories = self._history.get(chat_id, {})
+            ranks = ChatRankIndex((user_id, history.latest()[2]) for user_id, history in histories.items())
+            self._ranks[chat_id] = ranks
+        return ranks
+
+    def _invalidate_chat(self, chat_id: int):
+        self._ranks.pop(chat_id, None)
+
+    def _write_add(self,
+                   conn: list,
+                   user_id: int,
+                   username: str,
+                   height: float,
+                   weight: float,
+                   chat_id: int
+                   ) -> tuple:
+        bmi = weight / (height/100) ** 2
+        if user_id in self._users.get(chat_id, {}):
+            self.log.debug("info-database-user-exists")
+            raise UserExistsError(user_id, chat_id)
+
+        self._record(conn, [MEASUREMENT, chat_id, user_id, date.today().isoformat(), weight, height, bmi])
+        self.log.debug("info-database-data-added")
+        self._record(conn, [USER, chat_id, user_id, username])
+        self.users.invalidate(chat_id, (user_id,))
+        self.log.debug("info-database-user-added")
+
+        affected = self._place(conn, chat_id, user_id, self._history[chat_id][user_id].latest()[2])
+        return None, affected
+
+    def _write_update(self,
+                      conn: list,
+                      user_id: int,
+                      weight: float,
+                      chat_id: int,
+                      measurement_date: date = None
+                      ) -> tuple:
+        measurement_date = measurement_date or date.today()
+        debug("(БД) Пользователь %s обновляет вес: %s", user_id, weight)
+        history = self._history.get(chat_id, {}).get(user_id)
+        height = history.latest()[1] if history else None
+        if height is None:
+            raise UserNotFoundError(user_id, chat_id)
+
+        bmi = weight / (height/100) ** 2
+        # Как ON CONFLICT у SQLite: у замера за этот день меняются только вес и ИМТ
+        measurement_date = measurement_date.isoformat()
+        kept = history.values.get(measurement_date)
+        self._record(conn, [MEASUREMENT, chat_id, user_id, measurement_date, weight, kept[1] if kept else height, bmi])
+        debug("(БД) Пользователь %s обновил вес и BMI", user_id)
+
+        # Рейтинг идёт по последнему замеру - задним числом он мог и не измениться
+        affected = self._place(conn, chat_id, user_id, history.latest()[2])
+        self.log.debug("info-database-data-updated")
+        return None, affected
+
+    def _prefix_rows(self, conn: list, chat_id: int, user_ids: Optional[list]) -> list:
+        users = self._users.get(chat_id, {})
+        if user_ids is not None:
+            users = {user_id: users[user_id] for user_id in user_ids if user_id in users}
+        return [(user_id, row[1], row[3], row[4]) for user_id, row in users.items()]
+
+    def _save_prefixes(self, conn: list, changes: list) -> None:
+        for prefix, prefix_key, status, status_key, user_id, chat_id in changes:
+            self._record(conn, [PREFIX, chat_id, user_id, prefix, prefix_key, status, status_key])
+
+    def _rows(self, chat_id: int, ranks: Iterator, limit: int = None) -> list:
+        # Строки рейтинга в порядке ranks: у кого нет строки users, пропускаются, как при JOIN
+        users = self._users.get(chat_id, {})
+        histories = self._history.get(chat_id, {})
+        rows = []
+        for user_id, bmi in ranks:
+            if limit is not None and len(rows) >= limit:
+                break
+            row = users.get(user_id)
+            if row is None:
+                continue
+            history = histories[user_id]
+            username, prefix, status, prefix_key, status_key = row
+            rows.append((user_id, username, history.latest()[0], bmi, history.dates[-1],
+                         prefix, status, prefix_key, status_key))
+        return rows
+
+    def get_stats(self, chat_id: int):
+        with self.get_connection() as conn:
+            rows = self._rows(chat_id, iter(self._rank_index(conn, chat_id)))
+            self.log.debug("info-database-stats-gotten")
+            return [row[:7] for row in rows]
+
+    def _stats_rows(self, conn: list, chat_id: int, offset: int, limit: int) -> list:
+        return self._rows(chat_id, self._rank_index(conn, chat_id).iter_from(offset + 1), limit)
+
+    def _load_chat_locale(self, conn: list, chat_id: int) -> Optional[str]:
+        # Все выбранные языки уже прочитаны из журнала в chat_locales
+        return None
+
+    def _save_chat_locale(self, conn: list, chat_id: int, locale: Optional[str]) -> None:
+        self._record(conn, [LOCALE, chat_id, locale])
+
+    def get_chat_ids(self) -> list:
+        with self._lock:
+            return list(self._history)
+
+    def get_history(self, user_id: int, chat_id: int, limit: int = HISTORY_LIMIT):
+        with self._lock:
+            history = self._history.get(chat_id, {}).get(user_id)
+            if history is None:
+                return []
+            dates, values = history.dates, history.values
+            first = values[dates[0]][0]
+            rows = []
+            for i in range(len(dates) - 1, max(len(dates) - limit, 0) - 1, -1):
+                weight, _, bmi = values[dates[i]]
+                previous = values[dates[i - 1]] if i else None
+                window = [values[day][0] for day in dates[max(0, i - MOVING_AVERAGE + 1):i + 1]]
+                rows.append((
+                    dates[i], weight, bmi,
+                    weight - previous[0] if previous else None,
+                    bmi - previous[2] if previous else None,
+                    sum(window) / len(window),
+                    weight - first,
+                ))
+            return rows
+
+    def get_losers(self, chat_id: int, since: date, limit: int = TREND_TOP):
+        # Начальный вес - последний замер до понедельника недели since, а если его нет - первый после
+        week = (since - timedelta(days=since.weekday())).isoformat()
+        losers = []
+        with self._lock:
+            users = self._users.get(chat_id, {})
+            for user_id, history in self._history.get(chat_id, {}).items():
+                if user_id not in users:
+                    continue
+                i = bisect_left(history.dates, week)
+                if i == len(history.dates):
+                    continue
+                start = history.values[history.dates[i - 1 if i else i]][0]
+                lost = start - history.latest()[0]
+                if lost > 0:
+                    losers.append((users[user_id][0], lost))
+        return heapq.nlargest(limit, losers, key=lambda loser: loser[1])
+
+    def get_chat_trend(self, chat_id: int, today: date = None):
+        today = today or date.today()
+        since = (today - timedelta(days=2 * MOVING_AVERAGE)).isoformat()
+        boundary = (today - timedelta(days=MOVING_AVERAGE)).isoformat()
+        with self._lock:
+            days = sorted((day, tuple(totals)) for day, totals in self._daily.get(chat_id, {}).items() if day > since)
+
+        def average(end: str) -> float:
+            # Средний вес за MOVING_AVERAGE дней по end включительно, как окно RANGE по дням
+            start = (date.fromisoformat(end) - timedelta(days=MOVING_AVERAGE - 1)).isoformat()
+            users = total = 0
+            for day, (day_users, day_total) in days:
+                if start <= day <= end:
+                    users += day_users
+                    total += day_total
+            return total / users
+
+        current = next((day for day, _ in reversed(days) if day > boundary), None)
+        previous = next((day for day, _ in reversed(days) if day <= boundary), None)
+        return (average(current) if current else None,
+                average(previous) if previous else None)
+
+    def _import_chunk(self, conn: list, measurements: list, users: list) -> None:
+        for user_id, chat_id, weight, height, bmi, measurement_date in measurements:
+            self._record(conn, [MEASUREMENT, chat_id, user_id, measurement_date, weight, height, bmi])
+        for user_id, chat_id, username in users:
+            self._record(conn, [USER, chat_id, user_id, username])
+
+    def iter_measurements(self, chat_id: int = None, batch_size: int = TRANSFER_BATCH_SIZE) -> Iterator[tuple]:
+        # Блокировка берётся на пачку из batch_size пользователей, бот между пачками работает
+        with self._lock:
+            keys = [(curr_chat_id, user_id) for curr_chat_id, histories in self._history.items()
+                    if chat_id is None or curr_chat_id == chat_id for user_id in histories]
+        for start in range(0, len(keys), batch_size):
+            rows = []
+            with self._lock:
+                for curr_chat_id, user_id in keys[start:start + batch_size]:
+                    history = self._history[curr_chat_id][user_id]
+                    username = self._users.get(curr_chat_id, {}).get(user_id, (None,))[0]
+                    rows.extend((curr_chat_id, user_id, username, *history.values[measurement_date], measurement_date)
+                                for measurement_date in history.dates)
+            yield from rows
@@ -0,0 +1,54 @@
+import sqlite3
+from pathlib import Path
+
+MIGRATIONS_PATH = Path(__file__).parent / "migrations"
+
+
+def load_migrations(path: Path = MIGRATIONS_PATH) -> list:
+    """
+    Файлы миграций по возрастанию версии
+
+    :param path: каталог с файлами вида 0001_name.sql
+    :return: список пар (версия, путь)
+    """
+    migrations = [(int(file.name.split("_", 1)[0]), file) for file in path.glob("*.sql")]
+    return sorted(migrations)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        # Таблицы ещё нет - база новая или создана до появления миграций
+        conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY)")
+        return -1
+    return -1 if row[0] is None else row[0]
+
+
+def migrate(conn: sqlite3.Connection, path: Path = MIGRATIONS_PATH) -> list:
+    """
+    Применяет ещё не применённые миграции, каждую в своей транзакции
+
+    :param conn: соединение с базой
+    :param path: каталог с миграциями
+    :return: версии применённых миграций
+    """
+    version = current_version(conn)
+    conn.commit()
+    applied = []
+    for number, file in load_migrations(path):
+        if number <= version:
+            continue
+        script = file.read_text(encoding="utf-8")
+        try:
+            conn.executescript(
+                f"BEGIN;\n{script}\n"
+                f"INSERT INTO schema_version (version) VALUES ({number});\n"
+                "COMMIT;"
+            )
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(number)
+    return applied
@@ -0,0 +1,59 @@
+-- Последний замер каждого пользователя в чате, поддерживается триггерами
+CREATE TABLE latest_measurement (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    weight REAL,
+    height REAL,
+    bmi REAL,
+    measurement_date DATE,
+    PRIMARY KEY (chat_id, user_id)
+) WITHOUT ROWID;
+
+-- Рейтинг чата по убыванию ИМТ без обращения к самой таблице
+CREATE INDEX idx_latest_measurement_rating
+    ON latest_measurement (chat_id, bmi DESC, user_id, weight, measurement_date);
+
+-- Пользователи чата для соединения со статистикой
+CREATE INDEX idx_users_chat ON users (chat_id);
+
+CREATE TRIGGER measurements_latest_insert AFTER INSERT ON measurements
+BEGIN
+    INSERT INTO latest_measurement (chat_id, user_id, weight, height, bmi, measurement_date)
+    VALUES (NEW.chat_id, NEW.user_id, NEW.weight, NEW.height, NEW.bmi, NEW.measurement_date)
+    ON CONFLICT (chat_id, user_id) DO UPDATE SET
+        weight = excluded.weight,
+        height = excluded.height,
+        bmi = excluded.bmi,
+        measurement_date = excluded.measurement_date
+    WHERE excluded.measurement_date >= latest_measurement.measurement_date;
+END;
+
+CREATE TRIGGER measurements_latest_update AFTER UPDATE ON measurements
+BEGIN
+    INSERT INTO latest_measurement (chat_id, user_id, weight, height, bmi, measurement_date)
+    VALUES (NEW.chat_id, NEW.user_id, NEW.weight, NEW.height, NEW.bmi, NEW.measurement_date)
+    ON CONFLICT (chat_id, user_id) DO UPDATE SET
+        weight = excluded.weight,
+        height = excluded.height,
+        bmi = excluded.bmi,
+        measurement_date = excluded.measurement_date
+    WHERE excluded.measurement_date >= latest_measurement.measurement_date;
+END;
+
+CREATE TRIGGER measurements_latest_delete AFTER DELETE ON measurements
+BEGIN
+    DELETE FROM latest_measurement
+    WHERE chat_id = OLD.chat_id AND user_id = OLD.user_id AND measurement_date = OLD.measurement_date;
+
+    INSERT OR IGNORE INTO latest_measurement (chat_id, user_id, weight, height, bmi, measurement_date)
+    SELECT chat_id, user_id, weight, height, bmi, MAX(measurement_date)
+    FROM measurements
+    WHERE chat_id = OLD.chat_id AND user_id = OLD.user_id
+    GROUP BY chat_id, user_id;
+END;
+
+-- Заполняем по уже накопленной истории
+INSERT INTO latest_measurement (chat_id, user_id, weight, height, bmi, measurement_date)
+SELECT chat_id, user_id, weight, height, bmi, MAX(measurement_date)
+FROM measurements
+GROUP BY chat_id, user_id;
@@ -0,0 +1,3 @@
+-- Ключи локализации префикса и статуса, чтобы пересчёт мог сравнивать категории, а не случайный текст
+ALTER TABLE users ADD COLUMN prefix_key TEXT;
+ALTER TABLE users ADD COLUMN status_key TEXT;
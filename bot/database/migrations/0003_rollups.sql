@@ -0,0 +1,150 @@
+-- Замеры чата по дням: для выборок истории чата без полного просмотра таблицы
+CREATE INDEX idx_measurements_chat_date ON measurements (chat_id, measurement_date);
+
+-- Сводка чата за день: сколько человек взвесилось и их суммарный вес
+CREATE TABLE daily_chat_rollup (
+    chat_id INTEGER NOT NULL,
+    measurement_date DATE NOT NULL,
+    users INTEGER NOT NULL,
+    total_weight REAL NOT NULL,
+    total_bmi REAL NOT NULL,
+    PRIMARY KEY (chat_id, measurement_date)
+) WITHOUT ROWID;
+
+-- Сводка пользователя за неделю (week - понедельник): первый и последний вес недели
+CREATE TABLE weekly_user_rollup (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    week DATE NOT NULL,
+    days INTEGER NOT NULL,
+    first_weight REAL NOT NULL,
+    last_weight REAL NOT NULL,
+    min_weight REAL NOT NULL,
+    avg_bmi REAL NOT NULL,
+    PRIMARY KEY (chat_id, user_id, week)
+) WITHOUT ROWID;
+
+-- Сводки пересчитываются только для затронутого дня чата и недели пользователя:
+-- это не больше размера чата и семи строк, сколько бы истории ни накопилось
+
+CREATE TRIGGER measurements_rollup_insert AFTER INSERT ON measurements
+BEGIN
+    DELETE FROM daily_chat_rollup
+    WHERE chat_id = NEW.chat_id AND measurement_date = NEW.measurement_date;
+    INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+    SELECT chat_id, measurement_date, COUNT(*), SUM(weight), SUM(bmi)
+    FROM measurements
+    WHERE chat_id = NEW.chat_id AND measurement_date = NEW.measurement_date
+    GROUP BY chat_id, measurement_date;
+
+    DELETE FROM weekly_user_rollup
+    WHERE chat_id = NEW.chat_id AND user_id = NEW.user_id
+        AND week = date(NEW.measurement_date, 'weekday 0', '-6 days');
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    SELECT w.chat_id, w.user_id, w.week, COUNT(*),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date LIMIT 1),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date DESC LIMIT 1),
+        MIN(m.weight), AVG(m.bmi)
+    FROM (SELECT NEW.chat_id AS chat_id, NEW.user_id AS user_id,
+                 date(NEW.measurement_date, 'weekday 0', '-6 days') AS week) w
+    JOIN measurements m ON m.user_id = w.user_id AND m.chat_id = w.chat_id
+        AND m.measurement_date >= w.week AND m.measurement_date < date(w.week, '+7 days')
+    GROUP BY w.chat_id, w.user_id, w.week;
+END;
+
+CREATE TRIGGER measurements_rollup_delete AFTER DELETE ON measurements
+BEGIN
+    DELETE FROM daily_chat_rollup
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date;
+    INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+    SELECT chat_id, measurement_date, COUNT(*), SUM(weight), SUM(bmi)
+    FROM measurements
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date
+    GROUP BY chat_id, measurement_date;
+
+    DELETE FROM weekly_user_rollup
+    WHERE chat_id = OLD.chat_id AND user_id = OLD.user_id
+        AND week = date(OLD.measurement_date, 'weekday 0', '-6 days');
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    SELECT w.chat_id, w.user_id, w.week, COUNT(*),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date LIMIT 1),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date DESC LIMIT 1),
+        MIN(m.weight), AVG(m.bmi)
+    FROM (SELECT OLD.chat_id AS chat_id, OLD.user_id AS user_id,
+                 date(OLD.measurement_date, 'weekday 0', '-6 days') AS week) w
+    JOIN measurements m ON m.user_id = w.user_id AND m.chat_id = w.chat_id
+        AND m.measurement_date >= w.week AND m.measurement_date < date(w.week, '+7 days')
+    GROUP BY w.chat_id, w.user_id, w.week;
+END;
+
+-- Обновление замера - это удаление старой строки и вставка новой
+CREATE TRIGGER measurements_rollup_update AFTER UPDATE ON measurements
+BEGIN
+    DELETE FROM daily_chat_rollup
+    WHERE chat_id IN (OLD.chat_id, NEW.chat_id)
+        AND measurement_date IN (OLD.measurement_date, NEW.measurement_date);
+    INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+    SELECT chat_id, measurement_date, COUNT(*), SUM(weight), SUM(bmi)
+    FROM measurements
+    WHERE chat_id IN (OLD.chat_id, NEW.chat_id)
+        AND measurement_date IN (OLD.measurement_date, NEW.measurement_date)
+    GROUP BY chat_id, measurement_date;
+
+    DELETE FROM weekly_user_rollup
+    WHERE chat_id IN (OLD.chat_id, NEW.chat_id) AND user_id IN (OLD.user_id, NEW.user_id)
+        AND week IN (date(OLD.measurement_date, 'weekday 0', '-6 days'),
+                     date(NEW.measurement_date, 'weekday 0', '-6 days'));
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    SELECT w.chat_id, w.user_id, w.week, COUNT(*),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date LIMIT 1),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date DESC LIMIT 1),
+        MIN(m.weight), AVG(m.bmi)
+    FROM (SELECT c.chat_id, u.user_id, k.week
+          FROM (SELECT OLD.chat_id AS chat_id UNION SELECT NEW.chat_id) c,
+               (SELECT OLD.user_id AS user_id UNION SELECT NEW.user_id) u,
+               (SELECT date(OLD.measurement_date, 'weekday 0', '-6 days') AS week
+                UNION SELECT date(NEW.measurement_date, 'weekday 0', '-6 days')) k) w
+    JOIN measurements m ON m.user_id = w.user_id AND m.chat_id = w.chat_id
+        AND m.measurement_date >= w.week AND m.measurement_date < date(w.week, '+7 days')
+    GROUP BY w.chat_id, w.user_id, w.week;
+END;
+
+-- Заполняем по уже накопленной истории
+INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+SELECT chat_id, measurement_date, COUNT(*), SUM(weight), SUM(bmi)
+FROM measurements
+GROUP BY chat_id, measurement_date;
+
+INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+SELECT chat_id, user_id, week, COUNT(*),
+    MAX(CASE WHEN first_rank = 1 THEN weight END),
+    MAX(CASE WHEN last_rank = 1 THEN weight END),
+    MIN(weight), AVG(bmi)
+FROM (
+    SELECT chat_id, user_id, weight, bmi,
+        date(measurement_date, 'weekday 0', '-6 days') AS week,
+        ROW_NUMBER() OVER (PARTITION BY chat_id, user_id, date(measurement_date, 'weekday 0', '-6 days')
+                           ORDER BY measurement_date) AS first_rank,
+        ROW_NUMBER() OVER (PARTITION BY chat_id, user_id, date(measurement_date, 'weekday 0', '-6 days')
+                           ORDER BY measurement_date DESC) AS last_rank
+    FROM measurements
+)
+GROUP BY chat_id, user_id, week;
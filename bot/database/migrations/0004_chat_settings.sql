@@ -0,0 +1,5 @@
+-- Настройки чата, заданные вручную; NULL - брать по умолчанию
+CREATE TABLE chat_settings (
+    chat_id INTEGER PRIMARY KEY,
+    locale TEXT
+);
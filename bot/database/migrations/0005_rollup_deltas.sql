@@ -0,0 +1,106 @@
+-- Сводки обновляются приращением, а не пересчётом: запись замера больше не перечитывает
+-- весь день чата, и цена записи (и импорта) не растёт с размером чата.
+-- Неделя пользователя - не больше семи строк по первичному ключу measurements: её первый
+-- и последний вес при вставке ищутся по этому ключу, а удаление и изменение пересчитывают только её
+
+DROP TRIGGER measurements_rollup_insert;
+DROP TRIGGER measurements_rollup_delete;
+DROP TRIGGER measurements_rollup_update;
+
+CREATE TRIGGER measurements_rollup_insert AFTER INSERT ON measurements
+BEGIN
+    INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+    VALUES (NEW.chat_id, NEW.measurement_date, 1, NEW.weight, NEW.bmi)
+    ON CONFLICT (chat_id, measurement_date) DO UPDATE SET
+        users = users + 1,
+        total_weight = total_weight + excluded.total_weight,
+        total_bmi = total_bmi + excluded.total_bmi;
+
+    -- В SET справа - значения строки до обновления, поэтому среднее считается по прежнему days
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    VALUES (NEW.chat_id, NEW.user_id, date(NEW.measurement_date, 'weekday 0', '-6 days'),
+            1, NEW.weight, NEW.weight, NEW.weight, NEW.bmi)
+    ON CONFLICT (chat_id, user_id, week) DO UPDATE SET
+        days = days + 1,
+        first_weight = CASE WHEN EXISTS (
+                SELECT 1 FROM measurements
+                WHERE user_id = NEW.user_id AND chat_id = NEW.chat_id
+                    AND measurement_date >= week AND measurement_date < NEW.measurement_date
+            ) THEN first_weight ELSE excluded.first_weight END,
+        last_weight = CASE WHEN EXISTS (
+                SELECT 1 FROM measurements
+                WHERE user_id = NEW.user_id AND chat_id = NEW.chat_id
+                    AND measurement_date > NEW.measurement_date AND measurement_date < date(week, '+7 days')
+            ) THEN last_weight ELSE excluded.last_weight END,
+        min_weight = MIN(min_weight, excluded.min_weight),
+        avg_bmi = (avg_bmi * days + excluded.avg_bmi) / (days + 1);
+END;
+
+CREATE TRIGGER measurements_rollup_delete AFTER DELETE ON measurements
+BEGIN
+    UPDATE daily_chat_rollup
+    SET users = users - 1, total_weight = total_weight - OLD.weight, total_bmi = total_bmi - OLD.bmi
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date;
+    DELETE FROM daily_chat_rollup
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date AND users <= 0;
+
+    DELETE FROM weekly_user_rollup
+    WHERE chat_id = OLD.chat_id AND user_id = OLD.user_id
+        AND week = date(OLD.measurement_date, 'weekday 0', '-6 days');
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    SELECT w.chat_id, w.user_id, w.week, COUNT(*),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date LIMIT 1),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date DESC LIMIT 1),
+        MIN(m.weight), AVG(m.bmi)
+    FROM (SELECT OLD.chat_id AS chat_id, OLD.user_id AS user_id,
+                 date(OLD.measurement_date, 'weekday 0', '-6 days') AS week) w
+    JOIN measurements m ON m.user_id = w.user_id AND m.chat_id = w.chat_id
+        AND m.measurement_date >= w.week AND m.measurement_date < date(w.week, '+7 days')
+    GROUP BY w.chat_id, w.user_id, w.week;
+END;
+
+-- Обновление замера: старые значения вычитаются из своего дня, новые добавляются к своему
+CREATE TRIGGER measurements_rollup_update AFTER UPDATE ON measurements
+BEGIN
+    UPDATE daily_chat_rollup
+    SET users = users - 1, total_weight = total_weight - OLD.weight, total_bmi = total_bmi - OLD.bmi
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date;
+    INSERT INTO daily_chat_rollup (chat_id, measurement_date, users, total_weight, total_bmi)
+    VALUES (NEW.chat_id, NEW.measurement_date, 1, NEW.weight, NEW.bmi)
+    ON CONFLICT (chat_id, measurement_date) DO UPDATE SET
+        users = users + 1,
+        total_weight = total_weight + excluded.total_weight,
+        total_bmi = total_bmi + excluded.total_bmi;
+    DELETE FROM daily_chat_rollup
+    WHERE chat_id = OLD.chat_id AND measurement_date = OLD.measurement_date AND users <= 0;
+
+    DELETE FROM weekly_user_rollup
+    WHERE chat_id IN (OLD.chat_id, NEW.chat_id) AND user_id IN (OLD.user_id, NEW.user_id)
+        AND week IN (date(OLD.measurement_date, 'weekday 0', '-6 days'),
+                     date(NEW.measurement_date, 'weekday 0', '-6 days'));
+    INSERT INTO weekly_user_rollup (chat_id, user_id, week, days, first_weight, last_weight, min_weight, avg_bmi)
+    SELECT w.chat_id, w.user_id, w.week, COUNT(*),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date LIMIT 1),
+        (SELECT weight FROM measurements
+         WHERE user_id = w.user_id AND chat_id = w.chat_id
+            AND measurement_date >= w.week AND measurement_date < date(w.week, '+7 days')
+         ORDER BY measurement_date DESC LIMIT 1),
+        MIN(m.weight), AVG(m.bmi)
+    FROM (SELECT c.chat_id, u.user_id, k.week
+          FROM (SELECT OLD.chat_id AS chat_id UNION SELECT NEW.chat_id) c,
+               (SELECT OLD.user_id AS user_id UNION SELECT NEW.user_id) u,
+               (SELECT date(OLD.measurement_date, 'weekday 0', '-6 days') AS week
+                UNION SELECT date(NEW.measurement_date, 'weekday 0', '-6 days')) k) w
+    JOIN measurements m ON m.user_id = w.user_id AND m.chat_id = w.chat_id
+        AND m.measurement_date >= w.week AND m.measurement_date < date(w.week, '+7 days')
+    GROUP BY w.chat_id, w.user_id, w.week;
+END;
@@ -0,0 +1,173 @@
+import random
+from typing import Iterator, Iterable, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("key", "priority", "size", "left", "right")
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: _Node) -> None:
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node: Optional[_Node], key: tuple):
+    # Делит дерево на ключи < key и >= key
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _erase(node: Optional[_Node], key: tuple) -> Optional[_Node]:
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _erase(node.left, key)
+    else:
+        node.right = _erase(node.right, key)
+    _update(node)
+    return node
+
+
+class ChatRankIndex:
+    """
+    Порядковая статистика по текущему ИМТ пользователей одного чата.
+
+    Декартово дерево с размерами поддеревьев: позиция пользователя, первый
+    и последний в рейтинге находятся за O(log n). Позиция 1 - самый большой ИМТ.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, float]] = ()):
+        self._root = None
+        self._bmi = {}
+        for user_id, bmi in items:
+            self.upsert(user_id, bmi)
+
+    @staticmethod
+    def _key(user_id: int, bmi: float) -> tuple:
+        return (-bmi, user_id)
+
+    def __len__(self) -> int:
+        return len(self._bmi)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._bmi
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        # Обход по убыванию ИМТ: (user_id, bmi)
+        stack, node = [], self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key[1], -node.key[0]
+            node = node.right
+
+    def bmi(self, user_id: int) -> Optional[float]:
+        return self._bmi.get(user_id)
+
+    def upsert(self, user_id: int, bmi: float) -> None:
+        if user_id in self._bmi:
+            self.remove(user_id)
+        key = self._key(user_id, bmi)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key)), right)
+        self._bmi[user_id] = bmi
+
+    def remove(self, user_id: int) -> None:
+        bmi = self._bmi.pop(user_id, None)
+        if bmi is not None:
+            self._root = _erase(self._root, self._key(user_id, bmi))
+
+    def position(self, user_id: int) -> Optional[int]:
+        bmi = self._bmi.get(user_id)
+        if bmi is None:
+            return None
+        key = self._key(user_id, bmi)
+        node, before = self._root, 0
+        while node:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                before += _size(node.left) + 1
+                node = node.right
+            else:
+                return before + _size(node.left) + 1
+        return None
+
+    def at(self, position: int) -> Optional[Tuple[int, float]]:
+        # Пользователь на позиции position (с единицы)
+        if not 1 <= position <= len(self):
+            return None
+        node, k = self._root, position
+        while node:
+            left = _size(node.left)
+            if k <= left:
+                node = node.left
+            elif k == left + 1:
+                return node.key[1], -node.key[0]
+            else:
+                k -= left + 1
+                node = node.right
+        return None
+
+    def iter_from(self, position: int) -> Iterator[Tuple[int, float]]:
+        # Обход по убыванию ИМТ с позиции position (с единицы): спуск за O(log n), дальше по одному
+        stack, node, k = [], self._root, position
+        while node:
+            left = _size(node.left)
+            if k <= left:
+                stack.append(node)
+                node = node.left
+            elif k == left + 1:
+                stack.append(node)
+                break
+            else:
+                k -= left + 1
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield node.key[1], -node.key[0]
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+
+    def first(self) -> Optional[Tuple[int, float]]:
+        return self.at(1)
+
+    def last(self) -> Optional[Tuple[int, float]]:
+        return self.at(len(self))
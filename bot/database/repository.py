@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from typing import Any, Callable
+
+from bot.database.coalescer import WriteCoalescer
+from bot.database.storage import Storage
+from bot.database.transfer import export_file, import_file
+from bot.database.user_cache import MISSING
+
+
+class AsyncDatabase:
+    """
+    Асинхронный репозиторий поверх хранилища Storage.
+
+    Повторяет методы хранилища, но выполняет запросы в выделенном потоке БД,
+    чтобы блокирующий движок не останавливал цикл событий бота.
+    При flush_window > 0 записи замеров копятся по чатам и применяются пачками.
+    """
+
+    def __init__(self, database: Storage, max_workers: int = 1, flush_window: float = 0):
+        self.database = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._coalescer = None
+        if flush_window > 0:
+            self._coalescer = WriteCoalescer(self.apply_writes, flush_window)
+
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        # Контекст (поля лога текущего обновления) переносим в поток БД
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, partial(context.run, func, *args, **kwargs))
+
+    async def _user_row(self, user_id: int, chat_id: int):
+        # Попадание в кэш пользователей отвечается прямо в цикле событий, без перехода в поток БД
+        row = self.database.users.get(chat_id, user_id)
+        if row is None:
+            row = await self._run(self.database.load_user_row, user_id, chat_id)
+        return None if row is MISSING else row
+
+    async def user_exists(self, user_id: int, chat_id: int) -> bool:
+        return await self._user_row(user_id, chat_id) is not None
+
+    async def add_measurement(self,
+                              user_id: int,
+                              username: str,
+                              height: float,
+                              weight: float,
+                              chat_id: int
+                              ):
+        if self._coalescer:
+            return await self._coalescer.submit(
+                chat_id, "add", user_id=user_id, username=username, height=height, weight=weight
+            )
+        return await self._run(
+            self.database.add_measurement,
+            user_id=user_id,
+            username=username,
+            height=height,
+            weight=weight,
+            chat_id=chat_id,
+        )
+
+    async def update_weight(self,
+                            user_id: int,
+                            weight: float,
+                            chat_id: int,
+                            measurement_date: date = None
+                            ) -> None:
+        if self._coalescer:
+            return await self._coalescer.submit(
+                chat_id, "update", user_id=user_id, weight=weight, measurement_date=measurement_date
+            )
+        return await self._run(self.database.update_weight, user_id, weight, chat_id, measurement_date)
+
+    async def apply_writes(self, chat_id: int, writes: list) -> list:
+        return await self._run(self.database.apply_writes, chat_id, writes)
+
+    async def get_prefix(self, user_id: int, chat_id: int) -> str:
+        row = await self._user_row(user_id, chat_id)
+        return row[1] if row else None
+
+    async def get_status(self, user_id: int, chat_id: int) -> str:
+        row = await self._user_row(user_id, chat_id)
+        return row[2] if row else None
+
+    async def get_user(self, user_id: int, chat_id: int):
+        row = await self._user_row(user_id, chat_id)
+        return (row[0],) if row else None
+
+    async def get_stats(self, chat_id: int):
+        return await self._run(self.database.get_stats, chat_id)
+
+    async def get_stats_page(self, chat_id: int, offset: int, limit: int):
+        return await self._run(self.database.get_stats_page, chat_id, offset, limit)
+
+    async def get_rating(self, chat_id: int, page: int = 0, l10n=None):
+        return await self._run(self.database.get_rating, chat_id, page, l10n=l10n)
+
+    async def get_chat_locale(self, chat_id: int):
+        # Язык чата уже в памяти - отвечаем без перехода в поток БД
+        if chat_id in self.database.chat_locales:
+            return self.database.chat_locales[chat_id]
+        return await self._run(self.database.get_chat_locale, chat_id)
+
+    async def set_chat_locale(self, chat_id: int, locale) -> None:
+        await self._run(self.database.set_chat_locale, chat_id, locale)
+
+    async def get_chat_ids(self) -> list:
+        return await self._run(self.database.get_chat_ids)
+
+    async def get_digests(self, chat_ids: list) -> list:
+        return await self._run(self.database.get_digests, chat_ids)
+
+    async def get_history(self, user_id: int, chat_id: int):
+        return await self._run(self.database.get_history, user_id, chat_id)
+
+    async def get_losers(self, chat_id: int, since: date):
+        return await self._run(self.database.get_losers, chat_id, since)
+
+    async def get_chat_trend(self, chat_id: int):
+        return await self._run(self.database.get_chat_trend, chat_id)
+
+    async def import_file(self, path, chat_id: int = None) -> int:
+        # Импорт идёт отдельным потоком: транзакции пачек чередуются с обычными запросами бота
+        return await asyncio.to_thread(import_file, self.database, path, chat_id)
+
+    async def export_file(self, path, chat_id: int = None) -> int:
+        return await asyncio.to_thread(export_file, self.database, path, chat_id)
+
+    async def close(self) -> None:
+        """Сбрасывает буфер записи, останавливает поток БД и закрывает соединение."""
+        if self._coalescer:
+            await self._coalescer.close()
+        self._executor.shutdown(wait=True)
+        self.database.close()
@@ -0,0 +1,120 @@
+"""
+Раскладка базы по шардам для режима SHARDS > 1: каждый чат целиком переезжает в файл своего шарда.
+
+    python -m bot.database.reshard --shards 4
+    python -m bot.database.reshard --shards 8 --from-shards 4
+    python -m bot.database.reshard --shards 4 --engine memory --db bot/database/data/memory
+
+Исходные файлы не меняются; файлы шардов не должны существовать заранее
+и удаляются, если перенос прервался.
+"""
+import argparse
+import logging
+import shutil
+from pathlib import Path
+from typing import List
+
+from bot.database.storage import TRANSFER_BATCH_SIZE, Storage
+from bot.shards import shard_of, shard_path
+
+
+def move_chat(source: Storage, target: Storage, chat_id: int, batch_size: int = TRANSFER_BATCH_SIZE) -> int:
+    """
+    Копирует чат из source в target: замеры, префиксы с прозвищами и язык чата
+
+    :return: количество скопированных замеров
+    """
+    # Строки как есть: пределы /add и /update - для ввода пользователей, а не для уже записанного
+    rows, _ = target.copy_measurements(source.iter_measurements(chat_id, batch_size), batch_size)
+
+    # Загрузка раздала бы префиксы заново; переносим прежние, включая прозвища от нейросети
+    with source.get_connection() as conn:
+        prefixes = [row for row in source._prefix_rows(conn, chat_id, None) if row[2]]
+    if prefixes:
+        with target.get_connection() as conn:
+            target._save_prefixes(conn, [
+                (prefix, prefix_key, target.l10n.format_value(status_key), status_key, user_id, chat_id)
+                for user_id, prefix, prefix_key, status_key in prefixes
+            ])
+        target.users.invalidate(chat_id, [row[0] for row in prefixes])
+        target._rating_cache.pop(chat_id, None)
+
+    locale = source.get_chat_locale(chat_id)
+    if locale:
+        target.set_chat_locale(chat_id, locale)
+    return rows
+
+
+def remove_storage(path: str) -> None:
+    """Удаляет файл SQLite вместе с журналами WAL или папку хранилища memory."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    for file in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+        file.unlink(missing_ok=True)
+
+
+def reshard(sources: List[Storage], targets: List[Storage], batch_size: int = TRANSFER_BATCH_SIZE) -> tuple:
+    """
+    Раскладывает чаты всех sources по targets согласно shard_of
+
+    :return: (сколько чатов, сколько замеров перенесено)
+    """
+    chats = rows = 0
+    for source in sources:
+        for chat_id in source.get_chat_ids():
+            rows += move_chat(source, targets[shard_of(chat_id, len(targets))], chat_id, batch_size)
+            chats += 1
+    return chats, rows
+
+
+def main():
+    from bot.config import settings
+    from bot.factory import STORAGES, create_l10n, create_storage
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, required=True, help="на сколько шардов разложить")
+    parser.add_argument("--from-shards", type=int, default=1, help="текущее число шардов; 1 - один общий файл")
+    parser.add_argument("--engine", choices=STORAGES, default="sqlite", help="движок хранилища")
+    parser.add_argument("--db", help="файл базы SQLite или папка хранилища memory, по умолчанию как у бота")
+    parser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.shards < 2 or args.shards == args.from_shards:
+        parser.error("--shards должно быть больше 1 и отличаться от --from-shards")
+    path = args.db or (settings.memory_path if args.engine == "memory" else settings.db_path)
+    if args.from_shards > 1:
+        source_paths = [shard_path(path, shard, args.from_shards) for shard in range(args.from_shards)]
+    else:
+        source_paths = [path]
+    target_paths = [shard_path(path, shard, args.shards) for shard in range(args.shards)]
+    for source_path in source_paths:
+        if not Path(source_path).exists():
+            parser.error(f"нет исходного хранилища {source_path}")
+    for target_path in target_paths:
+        if Path(target_path).exists():
+            parser.error(f"шард {target_path} уже существует")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    l10n = create_l10n()
+    sources = [create_storage(args.engine, source_path, l10n) for source_path in source_paths]
+    targets = []
+    try:
+        targets += [create_storage(args.engine, target_path, l10n) for target_path in target_paths]
+        chats, rows = reshard(sources, targets, args.batch_size)
+    except BaseException:
+        # Недоделанные шарды удаляем: исходники не тронуты, и запуск можно просто повторить
+        for db in targets:
+            db.close()
+        for target_path in target_paths:
+            remove_storage(target_path)
+        logging.error("Перешардирование прервано, файлы шардов удалены")
+        raise
+    finally:
+        for db in sources + targets:
+            db.close()
+    logging.info("Перенесено чатов: %s, замеров: %s, шардов: %s", chats, rows, args.shards)
+
+
+if __name__ == "__main__":
+    main()
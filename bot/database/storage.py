@@ -0,0 +1,529 @@
+import itertools
+import threading
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import ContextManager, Iterable, Iterator, Optional
+
+from fluent.runtime import FluentLocalization
+
+from bot.database.rank_index import ChatRankIndex
+from bot.database.user_cache import MISSING, USER_CACHE_SIZE, UserCache
+from bot.handlers.prefix import HEIGHT_RANGE, WEIGHT_RANGE, get_prefix_category, get_prefix_key, get_key_category, get_bmi_status
+from bot.handlers.rating import DIGEST_TOP, RATING_PAGE_SIZE, render_rating
+from bot.handlers.trend import HISTORY_LIMIT, TREND_TOP
+from bot.locales.localization import L10nLogger, LocaleRegistry
+from bot.nicknames.pool import NicknamePool
+
+# Строк в одной транзакции при импорте и в одной выборке при экспорте
+TRANSFER_BATCH_SIZE = 1000
+
+# Чатов с готовым текстом страниц рейтинга (LRU)
+RATING_CACHE_SIZE = 1000
+
+# Суффикс ключа префикса, придуманного нейросетью: "fat-prefix-ai"
+AI_PREFIX = "ai"
+
+# Виды записей, которые можно применять пачкой через apply_writes
+WRITES = {
+    "add": "_write_add",
+    "update": "_write_update",
+}
+
+
+def parse_record(number: int, record: dict) -> tuple:
+    """
+    Проверяет строку импорта: те же пределы роста и веса, что у /add и /update, дата в ISO
+
+    :param number: номер строки в файле, для текста ошибки
+    :param record: строка файла
+    :return: ((user_id, chat_id, weight, height, bmi, measurement_date), username или None)
+    :raises ValueError: поле отсутствует, пустое или недопустимо
+    """
+    try:
+        if not isinstance(record, dict):
+            raise ValueError("ожидался объект с полями замера")
+        for field in ("chat_id", "user_id", "weight", "height"):
+            if record.get(field) in (None, ""):
+                raise ValueError(f"нет поля {field}")
+        chat_id, user_id = int(record["chat_id"]), int(record["user_id"])
+        weight, height = float(record["weight"]), float(record["height"])
+        if not WEIGHT_RANGE[0] <= weight <= WEIGHT_RANGE[1]:
+            raise ValueError(f"вес {weight} вне пределов {WEIGHT_RANGE[0]}-{WEIGHT_RANGE[1]}")
+        if not HEIGHT_RANGE[0] <= height <= HEIGHT_RANGE[1]:
+            raise ValueError(f"рост {height} вне пределов {HEIGHT_RANGE[0]}-{HEIGHT_RANGE[1]}")
+        bmi = record.get("bmi")
+        bmi = float(bmi) if bmi not in (None, "") else weight / (height/100) ** 2
+        if not bmi > 0:
+            raise ValueError(f"ИМТ {bmi} должен быть больше нуля")
+        measurement_date = record.get("measurement_date")
+        if measurement_date in (None, ""):
+            measurement_date = date.today().isoformat()
+        elif isinstance(measurement_date, str):
+            measurement_date = date.fromisoformat(measurement_date).isoformat()
+        else:
+            raise ValueError(f"дата {measurement_date!r} не строка ISO")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Строка {number}: {e}") from e
+    username = record.get("username")
+    return (user_id, chat_id, weight, height, bmi, measurement_date), str(username) if username else None
+
+
+class UserExistsError(Exception):
+    """Пользователь уже добавлен в этот чат."""
+
+
+class UserNotFoundError(Exception):
+    """Пользователя ещё нет в этом чате."""
+
+
+class Storage(ABC):
+    """
+    Хранилище замеров и пользователей - общий интерфейс движков.
+
+    Здесь всё, что от движка не зависит: кэш строк users, языки чатов, пересчёт
+    префиксов и статусов, текст и кэш страниц рейтинга, сводки, пачки записей и импорт.
+    Движок хранит данные и отвечает на запросы; "соединение" get_connection - это
+    его транзакция, базовый класс только передаёт её в методы движка.
+    """
+
+    def __init__(self,
+                 l10n: FluentLocalization,
+                 nicknames: NicknamePool = None,
+                 user_cache_size: int = USER_CACHE_SIZE,
+                 locales: LocaleRegistry = None,
+                 rating_cache_size: int = RATING_CACHE_SIZE
+                 ):
+        self.l10n = l10n
+        # Локализации для текстов, которые БД готовит сама (сводки по языку чата)
+        self.locales = locales
+        self.nicknames = nicknames
+        self.log = L10nLogger(l10n)
+        self._lock = threading.RLock()
+        # Готовые страницы рейтинга: chat_id -> (язык, страница, размер страницы) -> текст, давно не смотренные чаты вытесняются
+        self.rating_cache_size = rating_cache_size
+        self._rating_cache = OrderedDict()
+        # Строки users активных пользователей: проверки и префиксы без обращения к движку
+        self.users = UserCache(user_cache_size)
+        # Язык, выбранный в чате через /lang: chat_id -> локаль или None
+        self.chat_locales = {}
+        # Вызывается после каждого именованного запроса: query_hook(имя, секунды, строк)
+        self.query_hook = None
+
+    # Движок
+
+    @abstractmethod
+    def init_db(self) -> None:
+        """Готовит хранилище к работе: схема, загрузка данных."""
+
+    @abstractmethod
+    def get_connection(self) -> ContextManager:
+        """Транзакция движка: блок with применяется целиком, вложенные блоки входят во внешний."""
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    @abstractmethod
+    def load_user_row(self, user_id: int, chat_id: int):
+        """Читает строку users (username, prefix, status) в кэш мимо проверки кэша; MISSING, если пользователя нет."""
+
+    @abstractmethod
+    def _rank_index(self, conn, chat_id: int) -> ChatRankIndex:
+        ...
+
+    @abstractmethod
+    def _invalidate_chat(self, chat_id: int) -> None:
+        # Индекс рейтинга мог разойтись с данными - перестроить при следующем обращении
+        ...
+
+    @abstractmethod
+    def _savepoint(self, conn) -> ContextManager:
+        # Одна запись пачки: ошибка откатывает только её
+        ...
+
+    @abstractmethod
+    def _write_add(self, conn, user_id: int, username: str, height: float, weight: float, chat_id: int) -> tuple:
+        ...
+
+    @abstractmethod
+    def _write_update(self, conn, user_id: int, weight: float, chat_id: int, measurement_date: date = None) -> tuple:
+        ...
+
+    @abstractmethod
+    def _prefix_rows(self, conn, chat_id: int, user_ids: Optional[list]) -> list:
+        # Строки (user_id, prefix, prefix_key, status_key) пользователей чата, по умолчанию всех
+        ...
+
+    @abstractmethod
+    def _save_prefixes(self, conn, changes: list) -> None:
+        # Строки (prefix, prefix_key, status, status_key, user_id, chat_id)
+        ...
+
+    @abstractmethod
+    def get_stats(self, chat_id: int) -> list:
+        """Последний замер каждого пользователя: (user_id, username, weight, bmi, measurement_date, prefix, status) по убыванию ИМТ."""
+
+    @abstractmethod
+    def _stats_rows(self, conn, chat_id: int, offset: int, limit: int) -> list:
+        # Строки get_stats с позиции offset плюс prefix_key и status_key
+        ...
+
+    @abstractmethod
+    def _load_chat_locale(self, conn, chat_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _save_chat_locale(self, conn, chat_id: int, locale: Optional[str]) -> None:
+        ...
+
+    @abstractmethod
+    def get_chat_ids(self) -> list:
+        """Чаты, где есть хоть один замер."""
+
+    @abstractmethod
+    def get_history(self, user_id: int, chat_id: int, limit: int = HISTORY_LIMIT) -> list:
+        """
+        Последние замеры пользователя с изменениями и скользящим средним
+
+        :return: строки (дата, вес, ИМТ, изменение веса, изменение ИМТ, среднее за MOVING_AVERAGE замеров,
+            изменение веса с первого замера) от новых к старым
+        """
+
+    @abstractmethod
+    def get_losers(self, chat_id: int, since: date, limit: int = TREND_TOP) -> list:
+        """
+        Кто больше всех похудел с начала недели since: от последнего веса до этой недели
+        (или первого веса, если раньше замеров не было) до последнего веса
+
+        :return: строки (username, сброшенный вес) по убыванию, только похудевшие
+        """
+
+    @abstractmethod
+    def get_chat_trend(self, chat_id: int, today: date = None) -> tuple:
+        """
+        Средний вес чата за последние MOVING_AVERAGE дней и за такой же период до них
+
+        :return: (средний вес сейчас, средний вес периодом раньше), любое из значений может быть None
+        """
+
+    @abstractmethod
+    def _import_chunk(self, conn, measurements: list, users: list) -> None:
+        # measurements: (user_id, chat_id, weight, height, bmi, measurement_date) с заменой замера за день,
+        # users: (user_id, chat_id, username), пустое имя не затирает известное
+        ...
+
+    @abstractmethod
+    def iter_measurements(self, chat_id: int = None, batch_size: int = TRANSFER_BATCH_SIZE) -> Iterator[tuple]:
+        """
+        Все замеры (или замеры одного чата) пачками по batch_size, не задерживая бота на время выгрузки
+
+        :return: строки (chat_id, user_id, username, weight, height, bmi, measurement_date)
+        """
+
+    # Пользователи
+
+    def _user_row(self, user_id: int, chat_id: int):
+        # Строка users (username, prefix, status) через кэш; None, если пользователя нет
+        row = self.users.get(chat_id, user_id) or self.load_user_row(user_id, chat_id)
+        return None if row is MISSING else row
+
+    def user_exists(self, user_id: int, chat_id: int) -> bool:
+        return self._user_row(user_id, chat_id) is not None
+
+    def get_prefix(self, user_id: int, chat_id: int) -> str:
+        row = self._user_row(user_id, chat_id)
+        return row[1] if row else None
+
+    def get_status(self, user_id: int, chat_id: int) -> str:
+        row = self._user_row(user_id, chat_id)
+        return row[2] if row else None
+
+    def get_user(self, user_id: int, chat_id: int):
+        row = self._user_row(user_id, chat_id)
+        self.log.debug("info-database-user-found")
+        return (row[0],) if row else None
+
+    # Записи
+
+    def _place(self, conn, chat_id: int, user_id: int, bmi: float) -> set:
+        # Ставит пользователя в рейтинг и возвращает тех, чей префикс мог поменяться:
+        # его самого и прежних/новых первого и последнего
+        ranks = self._rank_index(conn, chat_id)
+        affected = {user_id}
+        for place in (ranks.first(), ranks.last()):
+            if place:
+                affected.add(place[0])
+        ranks.upsert(user_id, bmi)
+        affected.update((ranks.first()[0], ranks.last()[0]))
+        return affected
+
+    def apply_writes(self, chat_id: int, writes: list) -> list:
+        """
+        Применяет пачку записей одного чата в одной транзакции с одним пересчётом префиксов
+
+        :param chat_id: идентификатор чата
+        :param writes: пары (вид записи из WRITES, именованные аргументы)
+        :return: результат каждой записи по порядку; ошибка записи возвращается объектом исключения
+        """
+        results, affected, written = [], set(), False
+        try:
+            with self.get_connection() as conn:
+                for kind, kwargs in writes:
+                    # Каждая запись в своей точке сохранения: ошибка одной не откатывает соседей
+                    try:
+                        with self._savepoint(conn):
+                            result, touched = getattr(self, WRITES[kind])(conn, chat_id=chat_id, **kwargs)
+                    except (UserExistsError, UserNotFoundError) as e:
+                        # Отказ до любых изменений: индекс и страницы рейтинга по-прежнему верны
+                        result, touched = e, set()
+                    except Exception as e:
+                        self._invalidate_chat(chat_id)
+                        result, touched = e, set()
+                    else:
+                        written = True
+                    results.append(result)
+                    affected |= touched
+
+                # Пересчитываем префиксы и статусы только тех, кого задели записи
+                if affected:
+                    self.update_prefixes_and_statuses(conn, chat_id, affected)
+                # Под той же блокировкой, что и запись: чтение между записью и сбросом не закэширует старое
+                if written:
+                    self._rating_cache.pop(chat_id, None)
+        except Exception:
+            self._invalidate_chat(chat_id)
+            self._rating_cache.pop(chat_id, None)
+            raise
+        return results
+
+    def _apply_write(self, chat_id: int, kind: str, **kwargs):
+        result, = self.apply_writes(chat_id, [(kind, kwargs)])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def add_measurement(self,
+                        user_id: int,
+                        username: str,
+                        height: float,
+                        weight: float,
+                        chat_id: int
+                        ) -> None:
+        self._apply_write(chat_id, "add", user_id=user_id, username=username, height=height, weight=weight)
+
+    def update_weight(self,
+                      user_id: int,
+                      weight: float,
+                      chat_id: int,
+                      measurement_date: date = None
+                      ) -> None:
+        self._apply_write(chat_id, "update", user_id=user_id, weight=weight, measurement_date=measurement_date)
+
+    def update_prefixes_and_statuses(self, conn, chat_id: int, user_ids: set = None) -> int:
+        """
+        Пересчитывает префиксы и статусы пользователей чата одним чтением и одной пакетной записью
+
+        :param conn: открытая транзакция движка
+        :param chat_id: идентификатор чата
+        :param user_ids: кого пересчитать, по умолчанию весь чат
+        :return: количество изменённых строк
+        """
+        ranks = self._rank_index(conn, chat_id)
+        total = len(ranks)
+
+        if user_ids is None:
+            rows = self._prefix_rows(conn, chat_id, None)
+            positions = {curr_user_id: position for position, (curr_user_id, _) in enumerate(ranks, 1)}
+        else:
+            user_ids = list(user_ids)
+            rows = self._prefix_rows(conn, chat_id, user_ids)
+            positions = {curr_user_id: ranks.position(curr_user_id) for curr_user_id in user_ids}
+
+        changes = []
+        for curr_user_id, prefix, prefix_key, status_key in rows:
+            curr_bmi = ranks.bmi(curr_user_id)
+            if curr_bmi is None:
+                continue
+
+            # Префикс меняем только при смене категории, иначе случайный титул прыгал бы на каждом пересчёте
+            category = get_prefix_category(positions[curr_user_id], total, curr_bmi)
+            curr_status_key = get_bmi_status(curr_bmi)
+            if prefix_key and get_key_category(prefix_key) == category and status_key == curr_status_key:
+                continue
+            if not prefix_key or get_key_category(prefix_key) != category:
+                prefix_key, prefix = self._new_prefix(category)
+
+            changes.append((
+                prefix, prefix_key,
+                self.l10n.format_value(curr_status_key), curr_status_key,
+                curr_user_id, chat_id,
+            ))
+
+        if changes:
+            self._save_prefixes(conn, changes)
+            self.users.invalidate(chat_id, [change[4] for change in changes])
+        return len(changes)
+
+    def _new_prefix(self, category: str) -> tuple:
+        # Прозвище от нейросети, если пул успел его приготовить, иначе случайный ключ Fluent
+        nickname = self.nicknames.take(category) if self.nicknames else None
+        if nickname:
+            return f"{category}-prefix-{AI_PREFIX}", nickname
+        prefix_key = get_prefix_key(category)
+        return prefix_key, self.l10n.format_value(prefix_key)
+
+    def recompute_chat(self, chat_id: int) -> int:
+        # Полный пересчёт чата после массовых изменений в обход add/update
+        with self.get_connection() as conn:
+            self._invalidate_chat(chat_id)
+            self._rating_cache.pop(chat_id, None)
+            return self.update_prefixes_and_statuses(conn, chat_id)
+
+    def import_measurements(self, records: Iterable[dict], batch_size: int = TRANSFER_BATCH_SIZE) -> tuple:
+        """
+        Потоковая загрузка замеров: пачки по batch_size строк, каждая своей транзакцией,
+        префиксы и статусы пересчитываются один раз на чат в конце
+
+        :param records: словари с chat_id, user_id, weight, height и необязательными bmi, measurement_date, username
+        :param batch_size: строк в одной транзакции
+        :return: (сколько строк загружено, множество затронутых чатов)
+        :raises ValueError: строка без обязательного поля или с недопустимым значением;
+            пачки до неё уже загружены
+        """
+        parsed = (parse_record(number, record) for number, record in enumerate(records, 1))
+        return self._load_measurements(parsed, batch_size)
+
+    def copy_measurements(self, rows: Iterable[tuple], batch_size: int = TRANSFER_BATCH_SIZE) -> tuple:
+        """
+        Загрузка строк iter_measurements другого хранилища как есть, без проверок пользовательского ввода -
+        для перешардирования: данные уже записаны ботом и не должны отбрасываться
+
+        :param rows: строки (chat_id, user_id, username, weight, height, bmi, measurement_date)
+        :return: (сколько строк загружено, множество затронутых чатов)
+        """
+        measurements = (
+            ((user_id, chat_id, weight, height, bmi, measurement_date), username)
+            for chat_id, user_id, username, weight, height, bmi, measurement_date in rows
+        )
+        return self._load_measurements(measurements, batch_size)
+
+    def _load_measurements(self, measurements: Iterator[tuple], batch_size: int) -> tuple:
+        # Пары ((user_id, chat_id, weight, height, bmi, measurement_date), username) пачками по batch_size
+        total, chats = 0, set()
+        try:
+            while chunk := list(itertools.islice(measurements, batch_size)):
+                users = {}
+                for (user_id, chat_id, *_), username in chunk:
+                    users[user_id, chat_id] = (user_id, chat_id, username)
+                    chats.add(chat_id)
+
+                with self.get_connection() as conn:
+                    self._import_chunk(conn, [measurement for measurement, _ in chunk], list(users.values()))
+                    for user_id, chat_id in users:
+                        self.users.invalidate(chat_id, (user_id,))
+                total += len(chunk)
+        finally:
+            # Уже загруженные пачки пересчитываем, даже если файл оборвался на середине
+            for chat_id in chats:
+                self.recompute_chat(chat_id)
+        return total, chats
+
+    # Рейтинг
+
+    def _localize(self, l10n: FluentLocalization, rows: list) -> list:
+        # Префиксы и статусы хранятся текстом языка по умолчанию; для другого языка
+        # форматируем их заново по ключам, прозвища от нейросети остаются как есть
+        if l10n is None or l10n is self.l10n:
+            return [row[:7] for row in rows]
+        localized = []
+        for user_id, username, weight, bmi, measurement_date, prefix, status, prefix_key, status_key in rows:
+            if prefix_key and not prefix_key.endswith(f"-prefix-{AI_PREFIX}"):
+                prefix = l10n.format_value(prefix_key)
+            if status_key:
+                status = l10n.format_value(status_key)
+            localized.append((user_id, username, weight, bmi, measurement_date, prefix, status))
+        return localized
+
+    def get_stats_page(self, chat_id: int, offset: int, limit: int, l10n: FluentLocalization = None):
+        with self.get_connection() as conn:
+            rows = self._stats_rows(conn, chat_id, offset, limit)
+            self.log.debug("info-database-stats-gotten")
+            return self._localize(l10n, rows)
+
+    def get_rating(self,
+                   chat_id: int,
+                   page: int = 0,
+                   page_size: int = RATING_PAGE_SIZE,
+                   l10n: FluentLocalization = None
+                   ):
+        """
+        Страница рейтинга чата. Готовый текст страниц кэшируется по языкам до следующей записи в этот чат
+
+        :param chat_id: идентификатор чата
+        :param page: номер страницы с нуля, выходящий за границы прижимается к ним
+        :param page_size: пользователей на странице
+        :param l10n: язык текста, по умолчанию язык БД
+        :return: (текст, номер страницы, всего страниц) или None, если рейтинг пуст
+        """
+        with self.get_connection() as conn:
+            total = len(self._rank_index(conn, chat_id))
+            if not total:
+                return None
+            pages = -(-total // page_size)
+            page = min(max(page, 0), pages - 1)
+
+            l10n = l10n or self.l10n
+            key = (l10n.locales[0], page, page_size)
+            rendered = self._rating_pages(chat_id)
+            if key not in rendered:
+                rating = self.get_stats_page(chat_id, page * page_size, page_size, l10n)
+                rendered[key] = render_rating(l10n, rating, start=page * page_size + 1)
+            return rendered[key], page, pages
+
+    def _rating_pages(self, chat_id: int) -> dict:
+        # Кэш страниц чата с вытеснением давно не смотренных чатов; вызывается под блокировкой БД
+        pages = self._rating_cache.get(chat_id)
+        if pages is None:
+            pages = self._rating_cache[chat_id] = {}
+            while len(self._rating_cache) > self.rating_cache_size:
+                self._rating_cache.popitem(last=False)
+        else:
+            self._rating_cache.move_to_end(chat_id)
+        return pages
+
+    def get_digests(self, chat_ids: list, top: int = DIGEST_TOP) -> list:
+        """
+        Тексты еженедельной сводки для пачки чатов за одно обращение к потоку БД
+
+        :param chat_ids: чаты пачки
+        :param top: мест в сводке
+        :return: пары (chat_id, текст), чаты без замеров пропускаются
+        """
+        digests = []
+        with self.get_connection():
+            for chat_id in chat_ids:
+                l10n = self.locales.get(self.get_chat_locale(chat_id)) if self.locales else self.l10n
+                rating = self.get_stats_page(chat_id, 0, top, l10n)
+                if rating:
+                    digests.append((chat_id, render_rating(l10n, rating, header="digest-header")))
+        return digests
+
+    # Настройки чата
+
+    def get_chat_locale(self, chat_id: int) -> Optional[str]:
+        # Язык, выбранный в чате, или None; результат запоминается, включая отсутствие выбора
+        if chat_id not in self.chat_locales:
+            with self.get_connection() as conn:
+                self.chat_locales[chat_id] = self._load_chat_locale(conn, chat_id)
+        return self.chat_locales[chat_id]
+
+    def set_chat_locale(self, chat_id: int, locale: Optional[str]) -> None:
+        """
+        Закрепляет язык за чатом
+
+        :param locale: код локали или None, чтобы снова брать язык пользователя
+        """
+        with self.get_connection() as conn:
+            self._save_chat_locale(conn, chat_id, locale)
+            self.chat_locales[chat_id] = locale
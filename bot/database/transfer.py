@@ -0,0 +1,111 @@
+"""
+Импорт и экспорт замеров в CSV или JSONL.
+
+    python -m bot.database.transfer import backup.csv
+    python -m bot.database.transfer export backup.jsonl --chat-id -100123
+    python -m bot.database.transfer import backup.jsonl --engine memory --db bot/database/data/memory
+"""
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Iterator
+
+from bot.database.storage import TRANSFER_BATCH_SIZE, Storage
+
+FIELDS = ("chat_id", "user_id", "username", "weight", "height", "bmi", "measurement_date")
+
+
+def _format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix not in (".csv", ".jsonl"):
+        raise ValueError(f"Неизвестный формат файла: {path.name}, нужен .csv или .jsonl")
+    return suffix
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """Построчно читает замеры из файла, не загружая его целиком."""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if _format(path) == ".csv":
+            try:
+                yield from csv.DictReader(f)
+            except csv.Error as e:
+                raise ValueError(f"Не удалось разобрать CSV: {e}") from e
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError(f"Строка {number}: ожидался объект JSON")
+                    yield record
+
+
+def import_file(db: Storage, path: Path, chat_id: int = None, batch_size: int = TRANSFER_BATCH_SIZE) -> int:
+    """
+    Загружает замеры из файла в базу
+
+    :param chat_id: если задан, все строки попадают в этот чат (для импорта из самого чата)
+    :return: количество загруженных строк
+    """
+    records = read_records(path)
+    if chat_id is not None:
+        records = ({**record, "chat_id": chat_id} for record in records)
+    rows, _ = db.import_measurements(records, batch_size)
+    return rows
+
+
+def export_file(db: Storage, path: Path, chat_id: int = None, batch_size: int = TRANSFER_BATCH_SIZE) -> int:
+    """
+    Выгружает замеры в файл потоково
+
+    :param chat_id: только этот чат, по умолчанию все
+    :return: количество выгруженных строк
+    """
+    path = Path(path)
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if _format(path) == ".csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for row in db.iter_measurements(chat_id, batch_size):
+                writer.writerow(row)
+                rows += 1
+        else:
+            for row in db.iter_measurements(chat_id, batch_size):
+                f.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+                rows += 1
+    return rows
+
+
+def main():
+    from bot.factory import STORAGES, create_l10n, create_storage
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", type=Path, help="файл .csv или .jsonl")
+    parser.add_argument("--engine", choices=STORAGES, default="sqlite", help="движок хранилища")
+    parser.add_argument("--db", help="файл базы SQLite или папка хранилища memory, по умолчанию как у бота")
+    parser.add_argument("--chat-id", type=int, help="только этот чат")
+    parser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.db:
+        db = create_storage(args.engine, args.db, create_l10n())
+    else:
+        db = STORAGES[args.engine](create_l10n())
+    try:
+        if args.action == "import":
+            rows = import_file(db, args.path, args.chat_id, args.batch_size)
+            logging.info("Импортировано замеров: %s", rows)
+        else:
+            rows = export_file(db, args.path, args.chat_id, args.batch_size)
+            logging.info("Выгружено замеров: %s", rows)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
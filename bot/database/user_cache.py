@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+# Пользователей в кэше по умолчанию
+USER_CACHE_SIZE = 10000
+
+# Отметка "такого пользователя нет": отсутствие тоже кэшируется, /add новичков его проверяет
+MISSING = object()
+
+
+class UserCache:
+    """
+    LRU-кэш строк users по (chat_id, user_id): (username, prefix, status).
+
+    Кэш только читающий: любая запись в users должна вызвать invalidate, и следующее
+    чтение возьмёт строку из БД. Предполагается, что в базу пишет только этот процесс.
+    """
+
+    def __init__(self, size: int = USER_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Вызывается на каждое обращение: hook(попадание)
+        self.hook: Optional[Callable[[bool], None]] = None
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, chat_id: int, user_id: int):
+        """Строка из кэша, MISSING для известного отсутствия или None, если в кэше ничего нет."""
+        key = (chat_id, user_id)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+            else:
+                self._rows.move_to_end(key)
+                self.hits += 1
+        if self.hook:
+            self.hook(row is not None)
+        return row
+
+    def put(self, chat_id: int, user_id: int, row: Optional[Tuple]) -> None:
+        with self._lock:
+            self._rows[chat_id, user_id] = MISSING if row is None else row
+            self._rows.move_to_end((chat_id, user_id))
+            while len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, chat_id: int, user_ids) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._rows.pop((chat_id, user_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._rows),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta
+from logging import exception, info
+from typing import Optional
+
+from bot.database.repository import AsyncDatabase
+from bot.sender import SendQueue
+
+# Чатов в одной пачке рендеринга сводок
+DIGEST_BATCH = 100
+
+
+class DigestScheduler:
+    """
+    Еженедельная сводка рейтинга во все чаты.
+
+    Тексты готовятся пачками по batch_size чатов за одно обращение к БД, следующая пачка
+    рендерится, пока предыдущая уходит через SendQueue, так что в памяти не больше двух пачек.
+    """
+
+    def __init__(self,
+                 db: AsyncDatabase,
+                 queue: SendQueue,
+                 weekday: int = 6,
+                 hour: int = 20,
+                 batch_size: int = DIGEST_BATCH
+                 ):
+        """
+        :param weekday: день недели рассылки, 0 - понедельник
+        :param hour: час рассылки по местному времени
+        """
+        self.db = db
+        self.queue = queue
+        self.weekday = weekday
+        self.hour = hour
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def next_run(self, now: datetime) -> datetime:
+        run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        run += timedelta(days=(self.weekday - now.weekday()) % 7)
+        if run <= now:
+            run += timedelta(weeks=1)
+        return run
+
+    async def run_once(self) -> int:
+        """
+        Рассылает сводку во все чаты с замерами
+
+        :return: в сколько чатов сводка доставлена
+        """
+        chat_ids = await self.db.get_chat_ids()
+        info("Еженедельная сводка: чатов %s", len(chat_ids))
+        delivered, sending = 0, []
+        for start in range(0, len(chat_ids), self.batch_size):
+            digests = await self.db.get_digests(chat_ids[start:start + self.batch_size])
+            batch = [self.queue.send(chat_id, text) for chat_id, text in digests]
+            delivered += await self._delivered(sending)
+            sending = batch
+        delivered += await self._delivered(sending)
+        info("Еженедельная сводка доставлена в чатов: %s из %s", delivered, len(chat_ids))
+        return delivered
+
+    @staticmethod
+    async def _delivered(futures: list) -> int:
+        # Ошибки отдельных чатов (бота выгнали, чат удалён) уже залогированы очередью
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return sum(not isinstance(result, BaseException) for result in results)
+
+    async def _run(self) -> None:
+        while True:
+            run = self.next_run(datetime.now())
+            info("Следующая сводка: %s", run)
+            await asyncio.sleep((run - datetime.now()).total_seconds())
+            try:
+                await self.run_once()
+            except Exception:
+                # Сбой одной рассылки не отменяет следующие
+                exception("Еженедельная сводка не разослана")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
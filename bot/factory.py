@@ -0,0 +1,85 @@
+from pathlib import Path
+from aiogram import Dispatcher
+from .database.database import Database
+from .database.memory import MemoryDatabase
+from .database.storage import Storage
+from .handlers import setup_routers
+from .locales.localization import CachedLocalization, LocaleRegistry
+from .middlewares.l10n import L10nMiddleware
+from .middlewares.chat_lock import ChatLockManager, ChatLockMiddleware
+from .middlewares.db import DatabaseMiddleware
+from .middlewares.log_context import LogContextMiddleware
+from .middlewares.metrics import MetricsMiddleware
+
+LOCALES_PATH = Path(__file__).parent.joinpath("locales")
+
+DEFAULT_LOCALE = "ru"
+
+# Движки хранилища по имени из настроек
+STORAGES = {
+    "sqlite": Database,
+    "memory": MemoryDatabase,
+}
+
+
+def create_locales(default: str = DEFAULT_LOCALE) -> LocaleRegistry:
+    return LocaleRegistry(str(LOCALES_PATH), ["strings.ftl", "logging.ftl", "errors.ftl"], default)
+
+
+def create_l10n(locale: str = DEFAULT_LOCALE) -> CachedLocalization:
+    return create_locales(locale).get(locale)
+
+
+def create_storage(engine: str, path: str, l10n: CachedLocalization, **kwargs) -> Storage:
+    """
+    Хранилище по имени движка
+
+    :param engine: "sqlite" - файл базы SQLite, "memory" - данные в памяти с журналом
+    :param path: файл базы или папка журнала и снимков
+    :param kwargs: остальные параметры конструктора движка
+    """
+    return STORAGES[engine](l10n, path, **kwargs)
+
+
+def create_dispatcher(db,
+                      locales: LocaleRegistry,
+                      metrics: MetricsMiddleware = None,
+                      chat_locks: ChatLockManager = None,
+                      ) -> Dispatcher:
+    """
+    Диспетчер с роутерами и middleware бота - общий для polling, webhook и бенчмарков
+
+    :param db: репозиторий AsyncDatabase
+    :param locales: локализации по языкам
+    :param metrics: middleware метрик, если их нужно собирать
+    :param chat_locks: очередь команд по чатам; без неё обновления одного чата идут параллельно
+    """
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    
+    dp.update.middleware(LogContextMiddleware())
+    if metrics:
+        dp.update.middleware(metrics)
+        dp.message.middleware(metrics)
+        dp.callback_query.middleware(metrics)
+    if chat_locks is not None:
+        dp.update.middleware(ChatLockMiddleware(chat_locks))
+    dp.update.middleware(DatabaseMiddleware(db))
+    dp.update.middleware(L10nMiddleware(locales))
+    return dp
+
+
+def create_shard_dispatcher(pool) -> Dispatcher:
+    """
+    Диспетчер приёмника в режиме шардов: роутеры те же, чтобы совпадал allowed_updates,
+    но до них обновление не доходит - ShardMiddleware отдаёт его обработчику чата
+
+    :param pool: запущенный bot.shards.ShardPool
+    """
+    # Шарды с multiprocessing нужны только этому режиму - импортируем по требованию
+    from .middlewares.shard import ShardMiddleware
+
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    dp.update.middleware(ShardMiddleware(pool))
+    return dp
@@ -0,0 +1,45 @@
+import asyncio
+from logging import exception
+from typing import Any
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+
+class UpdateFeeder:
+    """
+    Фоновая обработка обновлений тем же Dispatcher, что и при polling.
+
+    Одновременно обрабатывается не больше max_concurrency обновлений: сверх этого
+    feed ждёт свободного места, и источник обновлений сам притормаживает.
+    """
+
+    def __init__(self,
+                 dp: Dispatcher,
+                 bot: Bot,
+                 max_concurrency: int = 100,
+                 **kwargs: Any
+                 ):
+        self.dp = dp
+        self.bot = bot
+        self.kwargs = kwargs
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+
+    async def feed(self, update: Update) -> None:
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update, **self.kwargs)
+        except Exception:
+            exception("Ошибка обработки обновления %s", update.update_id)
+        finally:
+            self._semaphore.release()
+
+    async def drain(self) -> None:
+        """Дожидается обработки уже принятых обновлений."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
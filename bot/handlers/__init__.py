@@ -4,9 +4,11 @@ from aiogram import Router
 def setup_routers() -> Router:
     from . import common
     from . import fat_commands
+    from . import transfer
     
     router = Router()
     router.include_router(common.router)
     router.include_router(fat_commands.router)
+    router.include_router(transfer.router)
     
     return router
\ No newline at end of file
@@ -1,10 +1,32 @@
-from aiogram import Router
-from aiogram.filters import Command
+from aiogram import Bot, Router
+from aiogram.enums import ChatMemberStatus, ChatType
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 from fluent.runtime import FluentLocalization
 
+from bot.database.repository import AsyncDatabase
+from bot.locales.localization import LocaleRegistry
+
 router = Router()
 
+ADMIN_STATUSES = (ChatMemberStatus.CREATOR, ChatMemberStatus.ADMINISTRATOR)
+
+# Аргумент /lang, который снимает язык чата
+LANG_RESET = "auto"
+
+
+async def is_admin(message: Message, bot: Bot) -> bool:
+    """
+    Может ли автор сообщения управлять настройками и данными чата
+
+    :param message: сообщение с командой
+    :param bot: бот для запроса прав участника
+    """
+    if message.chat.type == ChatType.PRIVATE:
+        return True
+    member = await bot.get_chat_member(message.chat.id, message.from_user.id)
+    return member.status in ADMIN_STATUSES
+
 
 @router.message(Command("start"))
 async def command_start(message: Message, l10n: FluentLocalization):
@@ -26,3 +48,40 @@ async def command_help(message: Message, l10n: FluentLocalization):
     :param l10n: объект локализации
     """
     await message.answer(l10n.format_value("help"))
+
+
+@router.message(Command("lang"))
+async def command_lang(message: Message,
+                       command: CommandObject,
+                       bot: Bot,
+                       l10n: FluentLocalization,
+                       locales: LocaleRegistry,
+                       db: AsyncDatabase
+                       ):
+    """
+    Язык бота в чате: без аргумента - текущий и доступные, с кодом - закрепить, auto - снять
+
+    :param message: сообщение от пользователя с командой /lang
+    :param command: команда с аргументом
+    """
+    available = ", ".join(sorted(locales.available))
+    if not command.args:
+        current = await db.get_chat_locale(message.chat.id) or LANG_RESET
+        await message.reply(l10n.format_value("lang-current", {"locale": current, "available": available}))
+        return
+
+    if not await is_admin(message, bot):
+        await message.reply(l10n.format_value("admin-only-error"))
+        return
+
+    locale = command.args.strip().lower()
+    if locale == LANG_RESET:
+        await db.set_chat_locale(message.chat.id, None)
+        await message.reply(locales.get(message.from_user.language_code).format_value("lang-reset"))
+        return
+    if locale not in locales.available:
+        await message.reply(l10n.format_value("lang-error", {"available": available}))
+        return
+
+    await db.set_chat_locale(message.chat.id, locale)
+    await message.reply(locales.get(locale).format_value("lang-set", {"locale": locale}))
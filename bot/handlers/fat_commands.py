@@ -1,109 +1,151 @@
 from aiogram import Router, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
-from bot.database.database import Database
-from bot.handlers.prefix import get_fat_prefix
-from logging import info, error
+from bot.database.storage import UserExistsError, UserNotFoundError
+from bot.database.repository import AsyncDatabase
+from bot.handlers.prefix import HEIGHT_RANGE, WEIGHT_RANGE, get_fat_prefix
+from bot.handlers.trend import render_history, render_trend, trend_periods
+from bot.locales.localization import L10nMessage
+from logging import debug, error
 
 router = Router()
 
 
 @router.message(Command("add"))
-async def add_measurement(message: types.Message, l10n: FluentLocalization, db: Database):
+async def add_measurement(message: types.Message, l10n: FluentLocalization, db: AsyncDatabase):
     
     args = message.text.split()
     
     if len(args) != 3:
-        error(l10n.format_value("error-add"))
+        error(L10nMessage(l10n, "error-add"))
         await message.reply(l10n.format_value("add-error"))
-        info(f"Пользователь {message.from_user.username} не прошел проверку на количество аргументов: {len(args)}")
+        debug("Пользователь %s не прошел проверку на количество аргументов: %s", message.from_user.username, len(args))
         return
     
     try:
         height = float(args[1])
         weight = float(args[2])
         
-        if not(30 <= weight <= 200) or not(100 <= height <= 250):
+        if not (WEIGHT_RANGE[0] <= weight <= WEIGHT_RANGE[1]) or not (HEIGHT_RANGE[0] <= height <= HEIGHT_RANGE[1]):
             raise ValueError
 
-        if db.user_exists(message.from_user.id, message.chat.id):
+        try:
+            await db.add_measurement(
+                user_id=message.from_user.id, 
+                username=message.from_user.username, 
+                height=height,
+                weight=weight,
+                chat_id=message.chat.id
+                )
+        except UserExistsError:
             await message.reply(l10n.format_value("user-already-exists"))
             return
-
-        message_response = db.add_measurement(
-            user_id=message.from_user.id, 
-            username=message.from_user.username, 
-            height=height,
-            weight=weight,
-            chat_id=message.chat.id
-            )
-        await message.answer(message_response)
+        await message.answer(l10n.format_value("add-success", {"height": height, "weight": weight}))
 
     except (IndexError, ValueError):
-        error(l10n.format_value("error-add"))
+        error(L10nMessage(l10n, "error-add"))
         await message.reply(l10n.format_value("add-error"))
 
 @router.message(Command("update"))
-async def update_measurement(message: types.Message, l10n: FluentLocalization, db: Database):
+async def update_measurement(message: types.Message, l10n: FluentLocalization, db: AsyncDatabase):
     
-    info(f"Пользователь {message.from_user.username} отправил команду /update с аргументами: {message.text}")
+    debug("Пользователь %s отправил команду /update с аргументами: %s", message.from_user.username, message.text)
     
     try:
         weight = float(message.text.split()[1])
 
-        if not (30 <= weight <= 300):
+        if not (WEIGHT_RANGE[0] <= weight <= WEIGHT_RANGE[1]):
             raise ValueError
         
-        info(f"Пользователь {message.from_user.username} прошел проверку на значения: {not (30 <= weight <= 300)}")
+        debug("Пользователь %s прошел проверку на значения: %s", message.from_user.username, weight)
         
-        user = db.get_user(message.from_user.id, message.chat.id)
-
-        info(f"Пользователь есть в базе данных user: {user}")
-
-        if not user:
-            error(l10n.format_value("error-user-not-found"))
+        try:
+            # Наличие пользователя проверяется в той же транзакции, что и запись
+            await db.update_weight(message.from_user.id, weight, message.chat.id)
+        except UserNotFoundError:
+            error(L10nMessage(l10n, "error-user-not-found"))
             await message.reply(l10n.format_value("no-user-error"))
-            info(f"Пользователь {message.from_user.username} не нашелся в базе данных")
+            debug("Пользователь %s не нашелся в базе данных", message.from_user.username)
             return
+        debug(L10nMessage(l10n, "info-update-success"))
         
-        db.update_weight(message.from_user.id, weight, message.chat.id)
-        info(l10n.format_value("info-update-success"))
-        
-        info(f"Пользователь {message.from_user.username} обновил вес: {weight}")
+        debug("Пользователь %s обновил вес: %s", message.from_user.username, weight)
         
         await message.answer(l10n.format_value("update-success", {"weight": weight}))
     except (IndexError, ValueError):
-        error(l10n.format_value("error-update"))
+        error(L10nMessage(l10n, "error-update"))
         await message.reply(l10n.format_value("update-error"))
-        info(f"Пользователь {message.from_user.username} не прошел проверку на значения: {not (30 <= weight <= 300)}")
+        debug("Пользователь %s не прошел проверку на значения: %s", message.from_user.username, message.text)
+
+class RatingPage(CallbackData, prefix="rating"):
+    page: int
+
+
+def rating_keyboard(page: int, pages: int):
+    """
+    Кнопки листания рейтинга, если страниц больше одной
+
+    :param page: текущая страница с нуля
+    :param pages: всего страниц
+    """
+    if pages <= 1:
+        return None
+    builder = InlineKeyboardBuilder()
+    builder.button(text="◀️", callback_data=RatingPage(page=(page - 1) % pages))
+    builder.button(text=f"{page + 1}/{pages}", callback_data=RatingPage(page=page))
+    builder.button(text="▶️", callback_data=RatingPage(page=(page + 1) % pages))
+    return builder.as_markup()
+
 
 @router.message(Command("rating"))
-async def show_stats(message: types.Message, l10n: FluentLocalization, db: Database):
-    rating = db.get_stats(message.chat.id)
+async def show_stats(message: types.Message, l10n: FluentLocalization, db: AsyncDatabase):
+    rating = await db.get_rating(message.chat.id, l10n=l10n)
     if not rating:
-        info(l10n.format_value("info-rating-empty"))
+        debug(L10nMessage(l10n, "info-rating-empty"))
         await message.answer(l10n.format_value("rating-empty"))
         return
-    
-    response = l10n.format_value("rating-header") + "\n\n"
-    
-    for i, (user_id,username, weight, bmi, date) in enumerate(rating, start=1):
-        
-        user = username or "Анонимус"
-        
-        curr_prefix = db.get_prefix(user_id, message.chat.id)
-        curr_status = db.get_status(user_id, message.chat.id)
-        
-        response += l10n.format_value("rating-item", {
-            "position": i,
-            "prefix": curr_prefix ,
-            "username": user,
-            "weight": weight,
-            "bmi": f"{bmi:.1f}",
-            "status": curr_status,
-            "date": date,
-        }) + "\n"
-        
-        
-    await message.answer(response)
-    info(l10n.format_value("info-rating-showen"))
+
+    text, page, pages = rating
+    await message.answer(text, reply_markup=rating_keyboard(page, pages))
+    debug(L10nMessage(l10n, "info-rating-showen"))
+
+
+@router.callback_query(RatingPage.filter())
+async def show_stats_page(callback: types.CallbackQuery, callback_data: RatingPage, l10n: FluentLocalization, db: AsyncDatabase):
+    rating = await db.get_rating(callback.message.chat.id, callback_data.page, l10n=l10n)
+    if not rating:
+        await callback.answer(l10n.format_value("rating-empty"))
+        return
+
+    text, page, pages = rating
+    try:
+        await callback.message.edit_text(text, reply_markup=rating_keyboard(page, pages))
+    except TelegramBadRequest as e:
+        # Нажали на текущую страницу - текст не изменился; остальные ошибки не глотаем молча
+        if "message is not modified" not in e.message:
+            error("Чат %s: не удалось показать страницу рейтинга %s: %s", callback.message.chat.id, page, e)
+    await callback.answer()
+
+
+@router.message(Command("history"))
+async def show_history(message: types.Message, l10n: FluentLocalization, db: AsyncDatabase):
+    history = await db.get_history(message.from_user.id, message.chat.id)
+    if not history:
+        await message.reply(l10n.format_value("history-empty"))
+        return
+    await message.reply(render_history(l10n, history))
+
+
+@router.message(Command("trend"))
+async def show_trend(message: types.Message, l10n: FluentLocalization, db: AsyncDatabase):
+    week, month = trend_periods()
+    average = await db.get_chat_trend(message.chat.id)
+    week_losers = await db.get_losers(message.chat.id, week)
+    month_losers = await db.get_losers(message.chat.id, month)
+    if average[0] is None and not month_losers:
+        await message.answer(l10n.format_value("trend-empty"))
+        return
+    await message.answer(render_trend(l10n, average, week_losers, month_losers))
@@ -1,34 +1,41 @@
 import random
 
-def get_fat_prefix(l10n, position: int, total: int, bmi: float) -> str:
-    fat_leader = ['mega', 'titan', 'god', 'boss', 'king', 'lord', 'master', 'supreme', 'emperor', 'chief']
-    skinny_leader = ['stick', 'ghost', 'air', 'zero', 'void', 'nothing', 'quantum', 'shadow', 'paper', 'dust']
-    
-    middle_attrs = ['norm', 'chad', 'sigma', 'based', 'boss', 'king', 'flex', 'alpha', 'giga', 'top']
-    fat_attrs = ['pig', 'blob', 'food', 'sofa', 'mass', 'burger', 'champ', 'ham', 'mayo', 'chunk']
-    skinny_attrs = ['stick', 'wind', 'bone', 'dry', 'zero', 'leaf', 'match', 'noodle', 'snake', 'dust']
-    
+# Допустимые рост и вес: их проверяют /add, /update и импорт замеров.
+# Одни пределы везде - иначе выгрузка бота не загружалась бы обратно
+WEIGHT_RANGE = (30, 300)
+HEIGHT_RANGE = (100, 250)
+
+PREFIX_ATTRS = {
+    "fat-leader": ['mega', 'titan', 'god', 'boss', 'king', 'lord', 'master', 'supreme', 'emperor', 'chief'],
+    "skinny-leader": ['stick', 'ghost', 'air', 'zero', 'void', 'nothing', 'quantum', 'shadow', 'paper', 'dust'],
+    "middle": ['norm', 'chad', 'sigma', 'based', 'boss', 'king', 'flex', 'alpha', 'giga', 'top'],
+    "fat": ['pig', 'blob', 'food', 'sofa', 'mass', 'burger', 'champ', 'ham', 'mayo', 'chunk'],
+    "skinny": ['stick', 'wind', 'bone', 'dry', 'zero', 'leaf', 'match', 'noodle', 'snake', 'dust'],
+}
+
+def get_prefix_category(position: int, total: int, bmi: float) -> str:
     if position == 1:
-        attr = random.choice(fat_leader)
-        key = f"fat-leader-prefix-{attr}"
-        return l10n.format_value(key)
+        return "fat-leader"
     elif position == total:
-        attr = random.choice(skinny_leader)
-        key = f"skinny-leader-prefix-{attr}"
-        return l10n.format_value(key)
-    else:
-        if bmi > 25:  # Избыточный вес
-            attr = random.choice(fat_attrs)
-            key = f"fat-prefix-{attr}"
-            return l10n.format_value(key)
-        elif bmi < 18.5:  # Недостаточный вес
-            attr = random.choice(skinny_attrs)
-            key = f"skinny-prefix-{attr}"
-            return l10n.format_value(key)
-        else:  # Нормальный вес
-            attr = random.choice(middle_attrs)
-            key = f"middle-prefix-{attr}"
-            return l10n.format_value(key)
+        return "skinny-leader"
+    elif bmi > 25:  # Избыточный вес
+        return "fat"
+    elif bmi < 18.5:  # Недостаточный вес
+        return "skinny"
+    else:  # Нормальный вес
+        return "middle"
+
+def get_prefix_key(category: str) -> str:
+    attr = random.choice(PREFIX_ATTRS[category])
+    return f"{category}-prefix-{attr}"
+
+def get_key_category(prefix_key: str) -> str:
+    # "fat-leader-prefix-mega" -> "fat-leader"
+    return prefix_key.rsplit("-prefix-", 1)[0]
+
+def get_fat_prefix(l10n, position: int, total: int, bmi: float) -> str:
+    key = get_prefix_key(get_prefix_category(position, total, bmi))
+    return l10n.format_value(key)
 
 def get_bmi_status(bmi: float) -> str:
     if bmi == 0.0:
@@ -46,4 +53,4 @@ def get_bmi_status(bmi: float) -> str:
     elif bmi <= 40.0:
         return "obesity-2"
     else:
-        return "obesity-3"
\ No newline at end of file
+        return "obesity-3"
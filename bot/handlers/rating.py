@@ -0,0 +1,65 @@
+import html
+
+from fluent.runtime import FluentLocalization
+
+# Пользователей на странице /rating
+RATING_PAGE_SIZE = 20
+
+# Мест в еженедельной сводке
+DIGEST_TOP = 10
+
+# Ограничение Telegram на длину текста сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+
+def render_rating(l10n: FluentLocalization, rating: list, start: int = 1, header: str = "rating-header") -> str:
+    """
+    Собирает текст рейтинга чата
+
+    Все строки rating помещаются в одно сообщение: каждой достаётся равная доля MAX_MESSAGE_LENGTH,
+    а слишком длинные прозвище и имя обрезаются. Так страница рейтинга всегда ровно page_size мест.
+
+    :param l10n: объект локализации
+    :param rating: строки get_stats, отсортированные по убыванию ИМТ
+    :param start: позиция первой строки в общем рейтинге
+    :param header: ключ заголовка
+    """
+    lines = [l10n.format_value(header), ""]
+    budget = (MAX_MESSAGE_LENGTH - sum(len(line) + 1 for line in lines)) // max(len(rating), 1) - 1
+
+    for i, (user_id, username, weight, bmi, date, prefix, status) in enumerate(rating, start=start):
+        values = {"position": i, "weight": weight, "bmi": f"{bmi:.1f}", "status": status, "date": date}
+        prefix, username = _cut(prefix or "", budget), _cut(username or l10n.format_value("anonymous"), budget)
+        # Сначала укорачиваем прозвище, потом имя; экранирование удлиняет текст, поэтому меряем готовую строку
+        prefix = _fit(prefix, lambda cut: len(_rating_item(l10n, values, cut, username)) <= budget)
+        username = _fit(username, lambda cut: len(_rating_item(l10n, values, prefix, cut)) <= budget)
+        line = _rating_item(l10n, values, prefix, username)
+        lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def _rating_item(l10n: FluentLocalization, values: dict, prefix: str, username: str) -> str:
+    # Сообщения уходят в разметке HTML, а прозвище от нейросети или имя - произвольный текст
+    return l10n.format_value("rating-item", {**values, "prefix": html.escape(prefix), "username": html.escape(username)})
+
+
+def _cut(text: str, length: int) -> str:
+    # Не длиннее length символов вместе с многоточием; длиннее строки всё равно не влезли бы,
+    # а Fluent не подставляет значения длиннее нескольких тысяч символов
+    length = max(length, 1)
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+def _fit(text: str, fits) -> str:
+    # Самая длинная обрезка text, с которой fits - двоичным поиском по длине
+    if fits(text):
+        return text
+    low, high = 1, len(text) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(_cut(text, middle)):
+            low = middle
+        else:
+            high = middle - 1
+    return _cut(text, low)
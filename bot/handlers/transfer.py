@@ -0,0 +1,63 @@
+import tempfile
+from logging import error, info
+from pathlib import Path
+
+from aiogram import Bot, Router, types
+from aiogram.filters import Command
+from fluent.runtime import FluentLocalization
+
+from bot.database.repository import AsyncDatabase
+from bot.handlers.common import is_admin
+
+router = Router()
+
+
+@router.message(Command("export"))
+async def export_measurements(message: types.Message, bot: Bot, l10n: FluentLocalization, db: AsyncDatabase):
+    """
+    Выгружает историю замеров чата файлом CSV
+
+    :param message: сообщение с командой /export
+    """
+    if not await is_admin(message, bot):
+        await message.reply(l10n.format_value("admin-only-error"))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"fatrate-{message.chat.id}.csv"
+        rows = await db.export_file(path, message.chat.id)
+        if not rows:
+            await message.reply(l10n.format_value("export-empty"))
+            return
+        await message.answer_document(types.FSInputFile(path))
+    info("Чат %s: выгружено замеров %s", message.chat.id, rows)
+
+
+@router.message(Command("import"))
+async def import_measurements(message: types.Message, bot: Bot, l10n: FluentLocalization, db: AsyncDatabase):
+    """
+    Загружает замеры в текущий чат из файла, приложенного к команде или к сообщению, на которое она отвечает
+
+    :param message: сообщение с командой /import
+    """
+    if not await is_admin(message, bot):
+        await message.reply(l10n.format_value("admin-only-error"))
+        return
+
+    document = message.document or (message.reply_to_message and message.reply_to_message.document)
+    if document is None:
+        await message.reply(l10n.format_value("import-error"))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / Path(document.file_name or "import.csv").name
+        await bot.download(document, destination=path)
+        try:
+            rows = await db.import_file(path, message.chat.id)
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            error("Чат %s: ошибка импорта %s: %s", message.chat.id, document.file_name, e)
+            await message.reply(l10n.format_value("import-error"))
+            return
+
+    info("Чат %s: импортировано замеров %s", message.chat.id, rows)
+    await message.answer(l10n.format_value("import-success", {"rows": rows}))
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+from fluent.runtime import FluentLocalization
+
+# Замеров в /history
+HISTORY_LIMIT = 10
+
+# Окно скользящего среднего: замеров для пользователя, дней для чата
+MOVING_AVERAGE = 7
+
+# Мест в списках самых похудевших
+TREND_TOP = 3
+
+# "Месяц" для /trend - четыре полные недели, чтобы считать по недельным сводкам
+MONTH_WEEKS = 4
+
+
+def _signed(value) -> str:
+    return "—" if value is None else f"{value:+.1f}"
+
+
+def render_history(l10n: FluentLocalization, history: list) -> str:
+    """
+    Собирает текст истории замеров пользователя
+
+    :param l10n: объект локализации
+    :param history: строки get_history от новых к старым
+    """
+    lines = [l10n.format_value("history-header"), ""]
+    for measurement_date, weight, bmi, weight_delta, bmi_delta, average, total in history:
+        lines.append(l10n.format_value("history-item", {
+            "date": measurement_date,
+            "weight": f"{weight:.1f}",
+            "weight_delta": _signed(weight_delta),
+            "bmi": f"{bmi:.1f}",
+            "bmi_delta": _signed(bmi_delta),
+            "average": f"{average:.1f}",
+        }))
+    # Изменение с первого замера есть в каждой строке, для итога берём самую свежую
+    lines.append("")
+    lines.append(l10n.format_value("history-total", {"total": _signed(history[0][6])}))
+    return "\n".join(lines)
+
+
+def render_losers(l10n: FluentLocalization, header: str, losers: list) -> list:
+    lines = [l10n.format_value(header)]
+    if not losers:
+        lines.append(l10n.format_value("trend-no-losers"))
+    for position, (username, lost) in enumerate(losers, start=1):
+        lines.append(l10n.format_value("trend-loser", {
+            "position": position,
+            "username": username or l10n.format_value("anonymous"),
+            "lost": f"{lost:.1f}",
+        }))
+    return lines
+
+
+def render_trend(l10n: FluentLocalization, average: tuple, week_losers: list, month_losers: list) -> str:
+    """
+    Собирает текст трендов чата
+
+    :param l10n: объект локализации
+    :param average: средний вес чата сейчас и периодом раньше из get_chat_trend
+    :param week_losers: самые похудевшие за неделю
+    :param month_losers: самые похудевшие за месяц
+    """
+    current, previous = average
+    lines = [l10n.format_value("trend-header"), ""]
+    if current is not None:
+        lines.append(l10n.format_value("trend-average", {
+            "days": MOVING_AVERAGE,
+            "average": f"{current:.1f}",
+            "delta": _signed(None if previous is None else current - previous),
+        }))
+        lines.append("")
+    lines += render_losers(l10n, "trend-week", week_losers)
+    lines.append("")
+    lines += render_losers(l10n, "trend-month", month_losers)
+    return "\n".join(lines)
+
+
+def trend_periods(today: date = None) -> tuple:
+    """Начало текущей недели и "месяца" для get_losers."""
+    today = today or date.today()
+    week = today - timedelta(days=today.weekday())
+    return week, week - timedelta(weeks=MONTH_WEEKS - 1)
@@ -0,0 +1,17 @@
+add-error = Command format:
+    /add height weight 
+    Example: /add 180 80
+
+no-user-error = Add your numbers with /add first, chunk
+
+update-error = Command format:
+    /update weight
+    Example: /update 79.5
+
+admin-only-error = This command is for chat admins only
+
+import-error = Couldn't read the file. Send a .csv or .jsonl with the columns:
+    user_id, username, weight, height, measurement_date
+    Example: /export produces a file in the right format
+
+lang-error = No such language. Available: { $available }
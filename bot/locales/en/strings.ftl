@@ -0,0 +1,159 @@
+intro = 
+    Hi! 👋 
+    I'm the bot that will tell you exactly how fat you are.
+
+help = 
+    I won't help you lose weight, I'm here to roast you.
+
+intro-description = 
+    Get started with the bot
+
+help-description =
+    How to use the bot
+
+add-description =
+    Add some fat
+
+update-description =
+    Update your fat
+
+rating-description =
+    Show the fatness leaderboard
+
+history-description =
+    My measurement history
+
+trend-description =
+    Who is losing weight the fastest
+
+lang-description =
+    Bot language in this chat
+
+export-description =
+    Export chat measurements to CSV
+
+import-description =
+    Import measurements from a CSV or JSONL file
+
+lang-current = Chat language: { $locale }. Available: { $available }
+    Change: /lang code, back to each user's language: /lang auto
+
+lang-set = From now on I speak English in this chat
+
+lang-reset = Chat language cleared, I reply in each user's language
+
+add-success = Saved your numbers:
+    Weight: { $weight } kg
+    Height: { $height } cm
+
+user-already-exists = You are already on the fat list
+
+update-success = Updated your weight: { $weight } kg
+
+rating-empty = 
+    The table is empty. Nobody managed to add a measurement yet. Too fat...
+
+rating-header = 
+    🏆 Fatness leaderboard:
+
+digest-header = 
+    📅 Weekly results. The chat's top chunks:
+
+history-header = 
+    📈 Your weigh-in history:
+
+history-item = { $date }: { $weight }kg ({ $weight_delta }), BMI { $bmi } ({ $bmi_delta }), average { $average }kg
+
+history-total = Since the first measurement: { $total } kg
+
+history-empty = No measurements yet. Start with /add
+
+trend-header = 
+    📉 Chat trends:
+
+trend-average = Average weight over { $days } days: { $average }kg ({ $delta } vs the previous period)
+
+trend-week = 🏃 Lost the most this week:
+
+trend-month = 🏆 Lost the most this month:
+
+trend-loser = { $position }. @{ $username }: -{ $lost }kg
+
+trend-no-losers = Nobody lost any weight. Chunks...
+
+trend-empty = No measurements yet, no trends to show
+
+import-success = Imported measurements: { $rows }
+
+export-empty = Nothing to export, this chat has no measurements
+
+anonymous = Anonymous
+
+rating-item = { $position } : { $prefix }@{ $username }: { $weight }kg, BMI { $bmi } ({ $date }) - { $status }
+
+fat-leader-prefix-mega = 🦏 GALACTIC MEGA-CHUNK
+fat-leader-prefix-titan = 🌍 PLANETARY MASS
+fat-leader-prefix-god = 👑 SUPREME GOD OF LARD
+fat-leader-prefix-boss = 🎪 RINGMASTER OF THE FAT CIRCUS
+fat-leader-prefix-king = 🏔 WALKING MOUNTAIN
+fat-leader-prefix-lord = 🌋 CHOLESTEROL VOLCANO
+fat-leader-prefix-master = 🐳 BLUE WHALE ON LAND
+fat-leader-prefix-supreme = 🦖 FAST FOOD REX
+fat-leader-prefix-emperor = 🎪 CIRCUS HIPPO
+fat-leader-prefix-chief = 🌭 DEVOURER OF WORLDS
+
+
+skinny-leader-prefix-stick = 📏 WALKING RULER
+skinny-leader-prefix-ghost = 👻 GHOST OF A SNACK
+skinny-leader-prefix-air = 💨 AIR ELEMENTAL
+skinny-leader-prefix-zero = 0️⃣ ZERO MASS
+skinny-leader-prefix-void = 🕳 REVERSE BLACK HOLE
+skinny-leader-prefix-nothing = ❌ ABSENCE OF MATTER
+skinny-leader-prefix-quantum = 🔬 QUANTUM VOID
+skinny-leader-prefix-shadow = 👤 HAMLET'S FATHER'S GHOST
+skinny-leader-prefix-paper = 📜 LIVING PARCHMENT
+skinny-leader-prefix-dust = 💭 SPECK IN THE WIND
+
+
+fat-prefix-pig = 🐷 PIGGUS MAXIMUS
+fat-prefix-blob = 🎪 BARREL BELLY
+fat-prefix-food = 🍔 FRIDGE RAIDER
+fat-prefix-sofa = 🛋 COUCH SAUSAGE
+fat-prefix-mass = ⚖️ OVERSIZED CARGO
+fat-prefix-burger = 🍟 DRIVE-THRU REGULAR
+fat-prefix-champ = 🏆 SOUP CHAMPION
+fat-prefix-ham = 🥓 HIS HAMNESS
+fat-prefix-mayo = 🥫 HEAD OF MAYO
+fat-prefix-chunk = 🦛 WELL-FED HIPPO
+
+
+skinny-prefix-stick = 📏 NOODLE IN A SPACESUIT
+skinny-prefix-wind = 💨 WALKING DRAFT
+skinny-prefix-bone = 🦴 WALKING RATTLE
+skinny-prefix-dry = 🌵 DRIED FISH
+skinny-prefix-zero = 0️⃣ NEGATIVE MASS
+skinny-prefix-leaf = 🍂 LEAF IN THE WIND
+skinny-prefix-match = 🔥 LIT MATCHSTICK
+skinny-prefix-noodle = 🍜 ENDLESS NOODLE
+skinny-prefix-snake = 🐍 FAINTING WORM
+skinny-prefix-dust = 💨 FLYING DUST
+
+middle-prefix-norm = 👑 REGULAR GUY
+middle-prefix-chad = 💪 PURE CHAD
+middle-prefix-sigma = 🐺 SIGMA MALE
+middle-prefix-based = 🗿 BASED
+middle-prefix-boss = 👔 GYM BOSS
+middle-prefix-king = 👑 PULL-UP KING
+middle-prefix-flex = 💪 FLEX MACHINE
+middle-prefix-alpha = 🦁 ALPHA MALE
+middle-prefix-giga = 🏆 GIGACHAD
+middle-prefix-top = 🔝 TOP TIER
+
+weight-not-specified = Weight not specified
+severe-underweight = 🔴 Severely underweight
+underweight = 🟡 Underweight
+normal-weight = 🟢 Normal weight
+overweight = 🟡 Overweight
+obesity-1 = 🔴 Obesity class I
+obesity-2 = 🔴 Obesity class II
+obesity-3 = ⚫️ Obesity class III
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from fluent.runtime import FluentLocalization, FluentResourceLoader
+from fluent.syntax import FluentParser
+
+
+class CachedLocalization(FluentLocalization):
+    """
+    FluentLocalization с кэшем сообщений без аргументов.
+
+    Статические строки (заголовки, статусы, префиксы, строки логов) форматируются
+    один раз на экземпляр, то есть на локаль; сообщения с аргументами - как обычно.
+
+    Бандлы собираются сразу, а не ленивым генератором FluentLocalization: форматируют
+    из нескольких потоков (цикл событий, поток БД, поток вывода логов), а генератор
+    из двух потоков одновременно падает с "generator already executing".
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache = {}
+        self._bundle_cache = list(self._bundle_it)
+
+    def _bundles(self):
+        return iter(self._bundle_cache)
+
+    def format_value(self, msg_id: str, args: Optional[Dict[str, Any]] = None) -> str:
+        if args:
+            return super().format_value(msg_id, args)
+        try:
+            return self._cache[msg_id]
+        except KeyError:
+            value = self._cache[msg_id] = super().format_value(msg_id)
+            return value
+
+
+class CachedResourceLoader(FluentResourceLoader):
+    """
+    FluentResourceLoader, который разбирает каждый .ftl один раз.
+
+    Локали с общим запасным языком делят его разобранные ресурсы, а не читают файлы заново.
+    """
+
+    def __init__(self, roots):
+        super().__init__(roots)
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def _parse(self, path: str):
+        with self._lock:
+            resource = self._parsed.get(path)
+            if resource is None:
+                with open(path, encoding="utf-8") as f:
+                    resource = self._parsed[path] = FluentParser().parse(f.read())
+            return resource
+
+    def resources(self, locale: str, resource_ids):
+        for root in self.roots:
+            resources = []
+            for resource_id in resource_ids:
+                path = self.localize_path(os.path.join(root, resource_id), locale)
+                if os.path.isfile(path):
+                    resources.append(self._parse(path))
+            if resources:
+                yield resources
+
+
+class LocaleRegistry:
+    """
+    Локализации по коду языка: каждая создаётся при первом запросе и дальше берётся из кэша.
+
+    Список локалей - это имена папок в path, их чтение не разбирает .ftl, поэтому число
+    локалей не влияет ни на запуск, ни на обработку сообщения. Недостающие строки берутся из default.
+
+    :param path: папка локалей, внутри по папке на язык
+    :param resource_ids: файлы .ftl каждой локали
+    :param default: язык по умолчанию
+    """
+
+    def __init__(self, path: str, resource_ids: Sequence[str], default: str = "ru"):
+        self.resource_ids = list(resource_ids)
+        self.default = default
+        self.available = frozenset(entry.name for entry in os.scandir(path) if entry.is_dir()
+                                   and not entry.name.startswith(("_", ".")))
+        self._loader = CachedResourceLoader(os.path.join(path, "{locale}"))
+        self._localizations = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, language_code: Optional[str]) -> str:
+        """Поддерживаемая локаль для кода языка Telegram ("en-US" -> "en") или язык по умолчанию."""
+        if language_code:
+            language_code = language_code.lower()
+            if language_code in self.available:
+                return language_code
+            language = language_code.split("-", 1)[0]
+            if language in self.available:
+                return language
+        return self.default
+
+    def get(self, locale: Optional[str] = None) -> CachedLocalization:
+        locale = self.resolve(locale)
+        l10n = self._localizations.get(locale)
+        if l10n is None:
+            with self._lock:
+                l10n = self._localizations.get(locale)
+                if l10n is None:
+                    chain = [locale] if locale == self.default else [locale, self.default]
+                    l10n = self._localizations[locale] = CachedLocalization(chain, self.resource_ids, self._loader)
+        return l10n
+
+
+class L10nMessage:
+    """Сообщение лога по ключу Fluent: форматируется только при выводе записи."""
+
+    __slots__ = ("l10n", "msg_id", "args")
+
+    def __init__(self, l10n: FluentLocalization, msg_id: str, args: Optional[Dict[str, Any]] = None):
+        self.l10n = l10n
+        self.msg_id = msg_id
+        self.args = args
+
+    def __str__(self) -> str:
+        return self.l10n.format_value(self.msg_id, self.args)
+
+
+class L10nLogger:
+    """
+    Логгер по ключам Fluent
+
+    :param l10n: объект локализации
+    :param logger: куда писать, по умолчанию корневой логгер
+    """
+
+    def __init__(self, l10n: FluentLocalization, logger: logging.Logger = None):
+        self.l10n = l10n
+        self.logger = logger or logging.getLogger()
+
+    def log(self, level: int, msg_id: str, args: Optional[Dict[str, Any]] = None) -> None:
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, L10nMessage(self.l10n, msg_id, args), stacklevel=3)
+
+    def debug(self, msg_id: str, args: Optional[Dict[str, Any]] = None) -> None:
+        self.log(logging.DEBUG, msg_id, args)
+
+    def info(self, msg_id: str, args: Optional[Dict[str, Any]] = None) -> None:
+        self.log(logging.INFO, msg_id, args)
+
+    def warning(self, msg_id: str, args: Optional[Dict[str, Any]] = None) -> None:
+        self.log(logging.WARNING, msg_id, args)
+
+    def error(self, msg_id: str, args: Optional[Dict[str, Any]] = None) -> None:
+        self.log(logging.ERROR, msg_id, args)
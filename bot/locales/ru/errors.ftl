@@ -8,3 +8,10 @@ update-error = Формат команды:
     /update вес
     Пример: /update 79.5
 
+admin-only-error = Эта команда только для админов чата
+
+import-error = Не смог прочитать файл. Нужен .csv или .jsonl с колонками:
+    user_id, username, weight, height, measurement_date
+    Пример: /export выгрузит файл в нужном формате
+
+lang-error = Такого языка нет. Доступные: { $available }
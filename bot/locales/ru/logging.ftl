@@ -12,4 +12,7 @@ info-rating-showen = Рейтинг показан
 
 error-add = Ошибка добавления данных
 error-update = Ошибка обновления данных
-error-user-not-found = Пользователь не найден
\ No newline at end of file
+error-user-not-found = Пользователь не найден
+info-database-migrated = Применены миграции схемы: { $versions }
+info-database-replayed = Данные загружены из снимка и журнала: записей { $entries } за { $ms } мс
+info-database-snapshot = Снимок данных сохранён: записей { $entries } за { $ms } мс
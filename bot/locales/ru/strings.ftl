@@ -20,6 +20,28 @@ update-description =
 rating-description =
     Показать рейтинг жирдяев
 
+history-description =
+    Моя история замеров
+
+trend-description =
+    Кто худеет быстрее всех
+
+lang-description =
+    Язык бота в чате
+
+export-description =
+    Выгрузить замеры чата в CSV
+
+import-description =
+    Загрузить замеры из файла CSV или JSONL
+
+lang-current = Язык чата: { $locale }. Доступные: { $available }
+    Сменить: /lang код, вернуть язык пользователя: /lang auto
+
+lang-set = Теперь в этом чате говорю по-русски
+
+lang-reset = Язык чата снят, отвечаю на языке каждого пользователя
+
 add-success = Записал твои параметры:
     Вес: { $weight } кг
     Рост: { $height } см
@@ -34,6 +56,39 @@ rating-empty =
 rating-header = 
     🏆 Рейтинг жиробасов:
 
+digest-header = 
+    📅 Итоги недели. Топ жиробасов чата:
+
+history-header = 
+    📈 Твоя история взвешиваний:
+
+history-item = { $date }: { $weight }кг ({ $weight_delta }), ИМТ { $bmi } ({ $bmi_delta }), среднее { $average }кг
+
+history-total = С первого замера: { $total } кг
+
+history-empty = Замеров пока нет. Начни с /add
+
+trend-header = 
+    📉 Тренды чата:
+
+trend-average = Средний вес за { $days } дн.: { $average }кг ({ $delta } к прошлому периоду)
+
+trend-week = 🏃 Больше всех сбросили за неделю:
+
+trend-month = 🏆 Больше всех сбросили за месяц:
+
+trend-loser = { $position }. @{ $username }: -{ $lost }кг
+
+trend-no-losers = Никто не похудел. Жиробасы...
+
+trend-empty = Замеров пока нет, трендить нечего
+
+import-success = Загрузил замеров: { $rows }
+
+export-empty = Выгружать нечего, замеров в чате нет
+
+anonymous = Анонимус
+
 rating-item = { $position } : { $prefix }@{ $username }: { $weight }кг, ИМТ { $bmi } ({ $date }) - { $status }
 
 fat-leader-prefix-mega = 🦏 МЕГА-ЖИРОБАС ГАЛАКТИКИ
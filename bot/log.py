@@ -0,0 +1,116 @@
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+
+# Поля текущего обновления (chat_id, user_id, command), которые попадают в каждую запись лога;
+# в режиме шардов ещё и номер обработчика - shard
+log_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+CONTEXT_FIELDS = ("shard", "chat_id", "user_id", "command", "duration_ms")
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+class ContextFilter(logging.Filter):
+    """Копирует контекст обновления в запись, пока она ещё в потоке, где её создали."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field, value in log_context.get().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю rate записей уровня level и ниже, остальные отбрасывает сразу.
+
+    :param rate: доля от 0 до 1; 1 - писать всё
+    :param level: самый высокий прореживаемый уровень
+    """
+
+    def __init__(self, rate: float, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON с полями контекста обновления."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования на стороне вызова.
+
+    Обычный QueueHandler собирает текст сообщения ещё в потоке цикла событий;
+    здесь запись уходит в очередь как есть, а текст (и ленивые L10nMessage) собирает поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = "INFO",
+                  fmt: str = "json",
+                  debug_sample_rate: float = 1.0,
+                  stream=None
+                  ) -> QueueListener:
+    """
+    Логи через очередь: в цикле событий запись только кладётся в очередь,
+    форматирование и вывод - в фоновом потоке
+
+    :param level: уровень корневого логгера
+    :param fmt: "json" - по строке JSON на запись, "text" - обычный текст
+    :param debug_sample_rate: доля записей DEBUG, которые доходят до вывода
+    :param stream: куда писать, по умолчанию stderr
+    :return: запущенный QueueListener, его нужно остановить через stop() при выходе
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    # Сначала прореживание, чтобы отброшенные записи не стоили ничего сверх проверки
+    if debug_sample_rate < 1:
+        handler.addFilter(SamplingFilter(debug_sample_rate))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # "Update id=... is handled" от aiogram повторяет нашу строку с duration_ms, но без контекста
+    logging.getLogger("aiogram.event").setLevel(max(logging.WARNING, root.level))
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def set_log_context(**fields) -> Token:
+    """Дополняет контекст текущей задачи; возвращает токен для сброса через log_context.reset."""
+    return log_context.set({**log_context.get(), **fields})
@@ -1,51 +1,224 @@
+# Первым делом: отсчёт запуска начинается до импорта aiogram
+from bot.startup import startup
 import asyncio
-import logging
-from pathlib import Path
+import signal
+from contextlib import asynccontextmanager, suppress
+from logging import exception, info
+from typing import Optional
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from fluent.runtime import FluentLocalization, FluentResourceLoader
-from bot.database.database import Database
+from bot.database.repository import AsyncDatabase
 from bot.commandsworker import set_bot_commands
-from .handlers import setup_routers
-from .middlewares.l10n import L10nMiddleware
-from .middlewares.db import DatabaseMiddleware
+from bot.nicknames.pool import NicknamePool
+from bot.nicknames.providers import create_provider
+from .factory import create_dispatcher, create_locales, create_shard_dispatcher, create_storage
+from .metrics import CacheMetrics, QueryMetrics, start_metrics_server
+from .middlewares.chat_lock import ChatLockManager
+from .middlewares.metrics import MetricsMiddleware
+from .digest import DigestScheduler
+from .log import set_log_context, setup_logging
+from .sender import SendQueue
 from .config import settings
 
-async def main():
-    
-    logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-        )
-    
-    locales_path = Path(__file__).parent.joinpath("locales")
-    l10n_loader = FluentResourceLoader(str(locales_path) + "/{locale}")
-    l10n = FluentLocalization(
-            ["ru"], 
-            ["strings.ftl", "logging.ftl", "errors.ftl"], 
-            l10n_loader
-        )
-    
-    bot = Bot(
+
+def storage_path(path: str, shard: Optional[int], shards: int) -> str:
+    # Файл базы или папка хранилища: общие или своего шарда
+    if shard is None:
+        return path
+    # Шарды с multiprocessing нужны только своему режиму - импортируем по требованию
+    from .shards import shard_path
+    return shard_path(path, shard, shards)
+
+
+def create_bot() -> Bot:
+    return Bot(
             token=settings.bot_token.get_secret_value(),
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
-    
-    dp = Dispatcher()
-    
-    router = setup_routers()
-    
-    
-    
-    dp.include_router(router)
-    
-    dp.update.middleware(DatabaseMiddleware(Database(l10n)))
-    dp.update.middleware(L10nMiddleware(l10n))
-
-    await set_bot_commands(bot, l10n)
-
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
-    
+
+
+@asynccontextmanager
+async def running_bot(shard: Optional[int] = None, shards: int = 1):
+    """
+    Бот со всеми службами: хранилище, прозвища, метрики, сводки; при выходе всё закрывается
+
+    :param shard: номер обработчика в режиме шардов - свой файл базы, порт метрик и доля лимита отправки
+    :param shards: сколько всего обработчиков
+    :return: (bot, dp, locales)
+    """
+    locales = create_locales()
+    l10n = locales.get()
+    startup.mark("locales")
+
+    bot = create_bot()
+
+    nicknames = None
+    if settings.nickname_provider:
+        nicknames = NicknamePool(
+            create_provider(settings.nickname_provider, settings.prompt),
+            size=settings.nickname_pool_size,
+            concurrency=settings.nickname_concurrency,
+            timeout=settings.nickname_timeout,
+        )
+        nicknames.start()
+
+    options = {"nicknames": nicknames, "user_cache_size": settings.user_cache_size, "locales": locales,
+               "rating_cache_size": settings.rating_cache_size}
+    if settings.storage == "memory":
+        database = create_storage("memory", storage_path(settings.memory_path, shard, shards), l10n,
+                                  snapshot_every=settings.memory_snapshot_every, **options)
+    else:
+        database = create_storage("sqlite", storage_path(settings.db_path, shard, shards), l10n, **options)
+    db = AsyncDatabase(database, flush_window=settings.db_flush_window_ms / 1000)
+    startup.mark("storage")
+
+    metrics, metrics_runner = None, None
+    if settings.metrics_port:
+        metrics = MetricsMiddleware()
+        database.query_hook = QueryMetrics()
+        database.users.hook = CacheMetrics("users")
+        metrics_runner = await start_metrics_server(host=settings.metrics_host, port=settings.metrics_port + (shard or 0))
+
+    chat_locks = None
+    if settings.chat_serialization and not settings.db_flush_window_ms:
+        chat_locks = ChatLockManager(settings.max_active_chats)
+
+    dp = create_dispatcher(db, locales, metrics, chat_locks)
+    startup.mark("dispatcher")
+
+    send_queue, digest = None, None
+    if settings.digest_enabled:
+        # Лимит Telegram - на бота, а не на процесс: обработчики делят его поровну
+        send_queue = SendQueue(bot, rate=settings.send_rate / shards, chat_rate=settings.send_chat_per_minute / 60)
+        send_queue.start()
+        digest = DigestScheduler(db, send_queue, weekday=settings.digest_weekday, hour=settings.digest_hour)
+        digest.start()
+
+    try:
+        yield bot, dp, locales
+    finally:
+        if digest:
+            await digest.stop()
+            await send_queue.stop()
+        await db.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        if nicknames:
+            await nicknames.stop()
+
+
+async def receive_updates(dp: Dispatcher, bot: Bot, stop: asyncio.Event = None, handle_as_tasks: bool = True) -> None:
+    """
+    Получает обновления long polling или webhook, по settings.mode, до сигнала или события stop
+
+    :param handle_as_tasks: для polling - обрабатывать обновления параллельно, а не по одному
+    """
+    stop = stop or asyncio.Event()
+    if settings.mode == "webhook":
+        # aiohttp.web нужен только webhook - импортируем по требованию
+        from .webhook import run_webhook
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        await run_webhook(
+            dp,
+            bot,
+            url=settings.webhook_url,
+            path=settings.webhook_path,
+            host=settings.webhook_host,
+            port=settings.webhook_port,
+            secret=settings.webhook_secret.get_secret_value() if settings.webhook_secret else None,
+            max_concurrency=settings.webhook_max_concurrency,
+            stop=stop,
+        )
+        await bot.session.close()
+    else:
+        async def stop_polling():
+            await stop.wait()
+            with suppress(RuntimeError):
+                await dp.stop_polling()
+
+        stopper = asyncio.create_task(stop_polling())
+        try:
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_as_tasks=handle_as_tasks)
+        finally:
+            stopper.cancel()
+
+
+async def update_commands(bot: Bot, locales) -> None:
+    # В фоне: первое обновление не ждёт setMyCommands, а сбой сети не роняет запуск
+    try:
+        if await set_bot_commands(bot, locales, settings.commands_hash_path):
+            info("Список команд бота отправлен")
+    except Exception:
+        exception("Не удалось отправить список команд бота")
+
+
+async def run_front(shards: int) -> None:
+    """Приёмник режима шардов: сам только получает обновления и раздаёт их обработчикам"""
+    from .shards import ShardPool
+
+    locales = create_locales()
+    bot = create_bot()
+    commands = asyncio.create_task(update_commands(bot, locales))
+
+    stop = asyncio.Event()
+    async with ShardPool(shards, run_worker) as pool:
+        startup.mark("shards")
+        startup.report()
+        watcher = asyncio.create_task(pool.watch(stop))
+        try:
+            # Пересылка - только запись в сокет; по одному, чтобы обновления чата уходили строго по порядку
+            await receive_updates(create_shard_dispatcher(pool), bot, stop, handle_as_tasks=False)
+        finally:
+            watcher.cancel()
+            commands.cancel()
+
+
+async def worker(shard: int, shards: int, path: str) -> None:
+    from .shards import serve_shard
+
+    startup.mark("imports")
+    log_listener = setup_logging(settings.log_level, settings.log_format, settings.log_debug_sample_rate)
+    set_log_context(shard=shard)
+    try:
+        async with running_bot(shard, shards) as (bot, dp, _):
+            startup.report()
+            stop = asyncio.Event()
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+            await serve_shard(dp, bot, path, settings.webhook_max_concurrency, stop)
+            await bot.session.close()
+    finally:
+        log_listener.stop()
+
+
+def run_worker(shard: int, shards: int, path: str) -> None:
+    # Точка входа процесса-обработчика, см. ShardPool
+    from .shards import ignore_interrupt
+
+    ignore_interrupt()
+    asyncio.run(worker(shard, shards, path))
+
+
+async def main():
+
+    startup.mark("imports")
+    log_listener = setup_logging(settings.log_level, settings.log_format, settings.log_debug_sample_rate)
+
+    try:
+        if settings.shards > 1:
+            await run_front(settings.shards)
+        else:
+            async with running_bot() as (bot, dp, locales):
+                commands = asyncio.create_task(update_commands(bot, locales))
+                startup.report()
+                try:
+                    await receive_updates(dp, bot)
+                finally:
+                    commands.cancel()
+    finally:
+        log_listener.stop()
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
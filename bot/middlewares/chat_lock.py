@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ChatLockManager:
+    """
+    Очередь команд по чатам.
+
+    Команды одного чата выполняются строго по очереди, команды разных чатов - параллельно,
+    но не больше max_chats чатов одновременно. Замок чата удаляется, как только
+    у него не остаётся ожидающих, поэтому память не растёт с числом чатов.
+    """
+
+    def __init__(self, max_chats: int = 256):
+        self._locks = {}
+        self._slots = asyncio.Semaphore(max_chats)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, chat_id: int):
+        entry = self._locks.get(chat_id)
+        if entry is None:
+            entry = self._locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Сначала очередь чата, потом общий слот: чат занимает не больше одного слота
+            async with entry[0], self._slots:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[chat_id]
+
+
+class ChatLockMiddleware(BaseMiddleware):
+    def __init__(self, manager: ChatLockManager):
+        self.manager = manager
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+        async with self.manager.hold(chat.id):
+            return await handler(event, data)
@@ -2,12 +2,20 @@ from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
-from fluent.runtime import FluentLocalization
+
+from bot.locales.localization import LocaleRegistry
 
 
 class L10nMiddleware(BaseMiddleware):
-    def __init__(self, l10n_object: FluentLocalization):
-        self.l10n_object = l10n_object
+    """
+    Подставляет в обработчик локализацию на языке чата.
+
+    Язык берётся из настройки чата (/lang), иначе из language_code пользователя,
+    иначе язык по умолчанию. Локализации создаются один раз на язык и берутся из кэша.
+    """
+
+    def __init__(self, locales: LocaleRegistry):
+        self.locales = locales
 
     async def __call__(
         self,
@@ -15,5 +23,14 @@ class L10nMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any]
     ) -> Any:
-        data["l10n"] = self.l10n_object
-        await handler(event, data)
\ No newline at end of file
+        locale = None
+        chat = data.get("event_chat")
+        db = data.get("db")
+        if chat is not None and db is not None:
+            locale = await db.get_chat_locale(chat.id)
+        if locale is None:
+            user = data.get("event_from_user")
+            locale = user.language_code if user else None
+        data["locales"] = self.locales
+        data["l10n"] = self.locales.get(locale)
+        return await handler(event, data)
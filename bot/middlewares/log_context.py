@@ -0,0 +1,42 @@
+import time
+from logging import info
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from bot.log import log_context, set_log_context
+
+
+def update_command(update: Update) -> str:
+    # "/add@fatrate_bot 180 80" -> "/add", для кнопок - префикс callback_data
+    if update.message and update.message.text and update.message.text.startswith("/"):
+        return update.message.text.split(maxsplit=1)[0].split("@", 1)[0]
+    if update.callback_query and update.callback_query.data:
+        return update.callback_query.data.split(":", 1)[0]
+    return update.event_type
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Кладёт chat_id, user_id и команду обновления в контекст логов
+    и пишет по одной строке на обновление с его длительностью.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat, user = data.get("event_chat"), data.get("event_from_user")
+        token = set_log_context(
+            chat_id=chat.id if chat else None,
+            user_id=user.id if user else None,
+            command=update_command(event) if isinstance(event, Update) else None,
+        )
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            info("Обновление обработано за %s мс", duration_ms, extra={"duration_ms": duration_ms})
+            log_context.reset(token)
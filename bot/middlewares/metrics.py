@@ -0,0 +1,48 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from bot.metrics import REGISTRY, Registry
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Счётчики и гистограммы задержки обновлений и хендлеров.
+
+    На dp.update считает обновления по типу, на наблюдателях событий
+    (dp.message, dp.callback_query) - время и ошибки конкретного хендлера.
+    """
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.updates = registry.counter(
+            "fatrate_updates_total", "Обновления по типу", ["type"])
+        self.update_duration = registry.histogram(
+            "fatrate_update_duration_seconds", "Полное время обработки обновления", ["type"])
+        self.handler_duration = registry.histogram(
+            "fatrate_handler_duration_seconds", "Время работы хендлера", ["handler"])
+        self.handler_errors = registry.counter(
+            "fatrate_handler_errors_total", "Исключения в хендлерах", ["handler"])
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            name, duration = event.event_type, self.update_duration
+            self.updates.inc(name)
+        else:
+            handler_object = data.get("handler")
+            name = handler_object.callback.__name__ if handler_object else type(event).__name__
+            duration = self.handler_duration
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            if duration is self.handler_duration:
+                self.handler_errors.inc(name)
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start, name)
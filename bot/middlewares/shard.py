@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.shards import ShardPool
+
+
+class ShardMiddleware(BaseMiddleware):
+    """
+    Приёмник в режиме шардов: обновление не обрабатывается здесь,
+    а уходит обработчику своего чата. Обновления без чата - по пользователю.
+    """
+
+    def __init__(self, pool: ShardPool):
+        self.pool = pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat, user = data.get("event_chat"), data.get("event_from_user")
+        await self.pool.send(chat.id if chat else user.id if user else 0, event)
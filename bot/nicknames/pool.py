@@ -0,0 +1,109 @@
+import asyncio
+from collections import deque
+from logging import warning
+from typing import Iterable, Optional
+
+from bot.handlers.prefix import PREFIX_ATTRS
+from bot.nicknames.providers import NicknameProvider
+
+
+# Предельная пауза между попытками пополнить пул, пока провайдер не отвечает, секунды
+MAX_BACKOFF = 300.0
+
+
+class NicknamePool:
+    """
+    Заранее сгенерированные прозвища по категориям префикса.
+
+    Фоновая задача держит в каждой категории до size прозвищ, обращаясь к провайдеру
+    не более чем concurrency запросами сразу и обрывая каждый через timeout секунд.
+    take не ждёт провайдера: пустая категория - это None, и вызывающий берёт ключ Fluent.
+    Если провайдер не дал ни одного прозвища, пауза до следующей попытки удваивается
+    до max_backoff секунд и сбрасывается к interval после первого успеха.
+    take безопасно вызывать из потока БД.
+    """
+
+    def __init__(self,
+                 provider: NicknameProvider,
+                 size: int = 5,
+                 concurrency: int = 2,
+                 timeout: float = 15.0,
+                 interval: float = 1.0,
+                 max_backoff: float = MAX_BACKOFF,
+                 categories: Iterable[str] = PREFIX_ATTRS,
+                 ):
+        self.provider = provider
+        self.size = size
+        self.timeout = timeout
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._pools = {category: deque() for category in categories}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight = {category: 0 for category in self._pools}
+        self._task = None
+
+    def take(self, category: str) -> Optional[str]:
+        try:
+            return self._pools[category].popleft()
+        except (KeyError, IndexError):
+            return None
+
+    def __len__(self) -> int:
+        return sum(len(pool) for pool in self._pools.values())
+
+    async def _generate(self, category: str) -> bool:
+        try:
+            async with self._semaphore:
+                nickname = await asyncio.wait_for(self.provider.generate(category), self.timeout)
+            if nickname:
+                self._pools[category].append(nickname)
+                return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            warning("Ошибка при получении прозвища нейросетью: %r", e)
+        finally:
+            self._in_flight[category] -= 1
+        return False
+
+    async def fill(self) -> tuple:
+        """
+        Запрашивает недостающие прозвища во всех категориях и дожидается ответов
+
+        :return: (сколько прозвищ получено, сколько запросов не удалось)
+        """
+        tasks = []
+        for category, pool in self._pools.items():
+            missing = self.size - len(pool) - self._in_flight[category]
+            for _ in range(max(missing, 0)):
+                self._in_flight[category] += 1
+                tasks.append(asyncio.create_task(self._generate(category)))
+        results = await asyncio.gather(*tasks)
+        generated = sum(results)
+        return generated, len(results) - generated
+
+    async def _run(self) -> None:
+        delay = self.interval
+        while True:
+            generated, failed = await self.fill()
+            if failed and not generated:
+                # Провайдер лежит: не долбим его полной пачкой запросов каждую секунду
+                delay = min(delay * 2, self.max_backoff)
+                warning("Прозвища: провайдер не ответил, следующая попытка через %s с", delay)
+            elif generated:
+                delay = self.interval
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.provider.close()
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+
+# Подсказка модели для каждой категории префикса из bot.handlers.prefix
+CATEGORY_HINTS = {
+    "fat-leader": "самому толстому в рейтинге",
+    "skinny-leader": "самому худому в рейтинге",
+    "fat": "человеку с избыточным весом",
+    "middle": "человеку с нормальным весом",
+    "skinny": "человеку с недостаточным весом",
+}
+
+
+class NicknameProvider(ABC):
+    """Источник прозвищ для пула: generate вызывается из фоновой задачи и может быть медленным."""
+
+    @abstractmethod
+    async def generate(self, category: str) -> str:
+        """Прозвище для категории префикса - обычный текст, экранирование HTML - при выводе."""
+
+    async def close(self) -> None:
+        pass
+
+
+class StubProvider(NicknameProvider):
+    """
+    Локальный провайдер без сети - для тестов и разработки
+
+    :param delay: искусственная задержка ответа, секунды
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self._counter = itertools.count(1)
+
+    async def generate(self, category: str) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return f"🤖 {CATEGORY_HINTS[category].upper()} №{next(self._counter)}"
+
+
+class G4FProvider(NicknameProvider):
+    """
+    Прозвища от нейросети через g4f
+
+    :param prompt: базовый запрос из настроек
+    :param model: модель g4f
+    """
+
+    def __init__(self, prompt: str, model: str = "gpt-3.5-turbo"):
+        # g4f тяжёлый и нужен только этому провайдеру - импортируем по требованию
+        import g4f
+
+        self._g4f = g4f
+        self.prompt = prompt
+        self.model = model
+
+    async def generate(self, category: str) -> str:
+        response = await self._g4f.ChatCompletion.create_async(
+            model=self.model,
+            messages=[{
+                "role": "user",
+                "content": f"{self.prompt} Прозвище для того, кто {CATEGORY_HINTS[category]}. "
+                           "Ответь только прозвищем.",
+            }],
+            max_tokens=50,
+        )
+        return response.strip().strip('"«»')
+
+
+def create_provider(name: str, prompt: str) -> NicknameProvider:
+    """
+    Провайдер по имени из настроек
+
+    :param name: "stub" или "g4f"
+    :param prompt: базовый запрос для нейросети
+    """
+    if name == "stub":
+        return StubProvider()
+    if name == "g4f":
+        return G4FProvider(prompt)
+    raise ValueError(f"Неизвестный провайдер прозвищ: {name}")
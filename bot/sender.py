@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from logging import exception, info, warning
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+# Ограничения Telegram: около 30 сообщений в секунду на бота и 20 в минуту в одну группу.
+# Берём с запасом, чтобы не упираться в 429
+GLOBAL_RATE = 25
+CHAT_RATE = 20 / 60
+CHAT_BURST = 3
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity про запас.
+    Время передаётся снаружи, чтобы одной корзиной мог пользоваться цикл отправки без блокировок.
+    """
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = now
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        # Через сколько секунд появится токен
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+    def pause(self, seconds: float, now: float) -> None:
+        # Следующий токен не раньше чем через seconds - так выполняется retry_after
+        self._refill(now)
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self.capacity
+
+
+class _Message:
+    __slots__ = ("text", "kwargs", "future", "attempts")
+
+    def __init__(self, text: str, kwargs: dict, future: asyncio.Future):
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class SendQueue:
+    """
+    Очередь исходящих сообщений с ограничением скорости.
+
+    Общая корзина токенов держит скорость всего бота, корзины чатов - скорость в каждый чат.
+    Сообщения одного чата уходят по порядку и по одному, разные чаты отправляются параллельно,
+    не больше max_in_flight запросов сразу. На 429 очередь ждёт retry_after и повторяет сообщение.
+    """
+
+    def __init__(self,
+                 bot: Bot,
+                 rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE,
+                 chat_burst: float = CHAT_BURST,
+                 max_in_flight: int = 16,
+                 max_retries: int = 3
+                 ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.retries = 0
+        self._global = TokenBucket(rate, rate, 0)
+        self._buckets = {}
+        self._pending = {}
+        # Чаты, у которых есть очередь или сообщение в пути, и куча (время готовности, порядок, чат)
+        self._scheduled = set()
+        self._ready = []
+        self._order = itertools.count()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._unfinished = 0
+        self._delivering = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._global = TokenBucket(self._global.rate, self._global.capacity, asyncio.get_running_loop().time())
+            self._task = asyncio.create_task(self._run())
+
+    def send(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь
+
+        :param chat_id: чат получателя
+        :param text: текст сообщения
+        :param kwargs: остальные параметры send_message
+        :return: future с отправленным Message или с ошибкой Telegram
+        """
+        loop = asyncio.get_running_loop()
+        message = _Message(text, kwargs, loop.create_future())
+        self._pending.setdefault(chat_id, deque()).append(message)
+        self._unfinished += 1
+        self._idle.clear()
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._schedule(chat_id, loop.time())
+        return message.future
+
+    def _schedule(self, chat_id: int, at: float) -> None:
+        heapq.heappush(self._ready, (at, next(self._order), chat_id))
+        self._wakeup.set()
+
+    def _bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    async def _sleep(self, seconds: float) -> None:
+        # Спим до срока, но просыпаемся раньше, если в очередь встал новый чат
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._ready:
+                # Корзины простаивающих чатов больше не нужны, как только наполнились
+                now = loop.time()
+                self._buckets = {
+                    chat_id: bucket for chat_id, bucket in self._buckets.items()
+                    if chat_id in self._scheduled or not bucket.full(now)
+                }
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            ready_at, _, chat_id = self._ready[0]
+            wait = max(ready_at - now, self._global.delay(now))
+            if wait > 0:
+                await self._sleep(wait)
+                continue
+
+            heapq.heappop(self._ready)
+            bucket = self._bucket(chat_id, now)
+            wait = bucket.delay(now)
+            if wait > 0:
+                self._schedule(chat_id, now + wait)
+                continue
+
+            await self._slots.acquire()
+            now = loop.time()
+            self._global.take(now)
+            bucket.take(now)
+            # Ссылка на задачу, пока она не завершится: иначе её может собрать сборщик мусора
+            task = asyncio.create_task(self._deliver(chat_id, self._pending[chat_id].popleft()))
+            self._delivering.add(task)
+            task.add_done_callback(self._delivering.discard)
+
+    async def _deliver(self, chat_id: int, message: _Message) -> None:
+        loop = asyncio.get_running_loop()
+        retry_after = 0
+        try:
+            result = await self.bot.send_message(chat_id, message.text, **message.kwargs)
+        except TelegramRetryAfter as e:
+            message.attempts += 1
+            self.retries += 1
+            if message.attempts > self.max_retries:
+                self._finish(message, exception=e)
+            else:
+                # Флуд-контроль бьёт по всему боту: тормозим и общую корзину, и корзину чата
+                retry_after = e.retry_after
+                now = loop.time()
+                self._global.pause(retry_after, now)
+                self._bucket(chat_id, now).pause(retry_after, now)
+                self._pending.setdefault(chat_id, deque()).appendleft(message)
+                warning("Чат %s: флуд-контроль, повтор через %s с", chat_id, retry_after)
+        except TelegramAPIError as e:
+            warning("Чат %s: сообщение не отправлено: %s", chat_id, e)
+            self._finish(message, exception=e)
+        except Exception as e:
+            # Ошибку получит тот, кто ждёт future; задачу доставки никто не ждёт
+            exception("Чат %s: сообщение не отправлено", chat_id)
+            self._finish(message, exception=e)
+        else:
+            self._finish(message, result=result)
+        finally:
+            self._slots.release()
+            if self._pending.get(chat_id):
+                self._schedule(chat_id, loop.time() + retry_after)
+            else:
+                self._pending.pop(chat_id, None)
+                self._scheduled.discard(chat_id)
+
+    def _finish(self, message: _Message, result=None, exception: Exception = None) -> None:
+        if not message.future.done():
+            if exception is not None:
+                message.future.set_exception(exception)
+            else:
+                message.future.set_result(result)
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._idle.set()
+
+    async def join(self) -> None:
+        """Ждёт, пока уйдут все поставленные сообщения."""
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        """Останавливает цикл отправки. Неотправленные сообщения отменяются - дождаться их можно через join()."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        dropped = 0
+        for messages in self._pending.values():
+            for message in messages:
+                message.future.cancel()
+                self._finish(message)
+                dropped += 1
+        self._pending.clear()
+        self._ready.clear()
+        if dropped:
+            info("Отменено неотправленных сообщений: %s", dropped)
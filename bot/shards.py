@@ -0,0 +1,199 @@
+"""
+Режим шардов: приёмник (polling или webhook) раздаёт обновления процессам-обработчикам по chat_id.
+
+Все обновления одного чата уходят одному обработчику и одним соединением, поэтому
+их порядок сохраняется, а данные чата целиком лежат в файле базы этого обработчика.
+Обработчики связаны с приёмником Unix-сокетами: по строке JSON на обновление.
+"""
+import asyncio
+import multiprocessing
+import shutil
+import signal
+import tempfile
+import time
+import zlib
+from logging import error, exception, info
+from pathlib import Path
+from typing import Callable, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from pydantic import ValidationError
+
+from bot.feeder import UpdateFeeder
+
+# Предел длины строки обновления в сокете
+LINE_LIMIT = 2 ** 22
+
+# Сколько ждать, пока обработчик откроет сокет: импорт, локали и открытие базы
+START_TIMEOUT = 60.0
+
+# Сколько ждать выхода обработчика после закрытия соединения, прежде чем завершить его сигналом
+STOP_TIMEOUT = 30.0
+
+
+def shard_of(chat_id: int, shards: int) -> int:
+    # crc32, а не hash(): номер шарда не должен зависеть от процесса и версии Python
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+def shard_path(path: str, shard: int, shards: int) -> str:
+    """
+    Файл базы или папка хранилища одного шарда
+
+    "data/fatrate.db" -> "data/fatrate.shard0of4.db"; число шардов в имени не даёт
+    перепутать файлы разных раскладок при перешардировании.
+    """
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.shard{shard}of{shards}{path.suffix}"))
+
+
+def socket_path(directory: str, shard: int) -> str:
+    return str(Path(directory) / f"shard{shard}.sock")
+
+
+class ShardPool:
+    """
+    Процессы-обработчики и соединения с ними на стороне приёмника.
+
+    Обработчик запускается как target(shard, shards, socket) в новом процессе (spawn:
+    у приёмника уже работают цикл событий и поток логов) и должен слушать socket
+    через serve_shard. При закрытии пула соединения закрываются, обработчики
+    дорабатывают принятое и выходят сами.
+    """
+
+    def __init__(self,
+                 shards: int,
+                 target: Callable[[int, int, str], None],
+                 start_timeout: float = START_TIMEOUT
+                 ):
+        self.shards = shards
+        self.target = target
+        self.start_timeout = start_timeout
+        self.processes = []
+        self._writers = []
+        self._directory = None
+
+    async def start(self) -> None:
+        self._directory = tempfile.mkdtemp(prefix="fatrate-")
+        context = multiprocessing.get_context("spawn")
+        for shard in range(self.shards):
+            process = context.Process(
+                target=self.target,
+                args=(shard, self.shards, socket_path(self._directory, shard)),
+                name=f"fatrate-shard{shard}",
+            )
+            process.start()
+            self.processes.append(process)
+        start = time.perf_counter()
+        for shard in range(self.shards):
+            self._writers.append(await self._connect(shard))
+        info("Шарды: запущено обработчиков %s за %.1f с", self.shards, time.perf_counter() - start)
+
+    async def _connect(self, shard: int) -> asyncio.StreamWriter:
+        path, process = socket_path(self._directory, shard), self.processes[shard]
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+                return writer
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not process.is_alive():
+                    raise RuntimeError(f"Обработчик {shard} завершился при запуске с кодом {process.exitcode}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Обработчик {shard} не открыл сокет за {self.start_timeout} с")
+                await asyncio.sleep(0.05)
+
+    async def send(self, chat_id: int, update: Update) -> None:
+        writer = self._writers[shard_of(chat_id, self.shards)]
+        writer.write(update.model_dump_json(exclude_unset=True).encode() + b"\n")
+        await writer.drain()
+
+    async def watch(self, stop: asyncio.Event, interval: float = 1.0) -> None:
+        """Ставит stop, как только какой-нибудь обработчик завершился сам: без него часть чатов не обслуживается."""
+        while not stop.is_set():
+            for shard, process in enumerate(self.processes):
+                if not process.is_alive():
+                    error("Шарды: обработчик %s завершился с кодом %s", shard, process.exitcode)
+                    stop.set()
+                    return
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        for writer in self._writers:
+            writer.close()
+        for writer in self._writers:
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+        for shard, process in enumerate(self.processes):
+            if shard >= len(self._writers):
+                # Запуск прерван до соединения: обработчику нечего дорабатывать
+                process.terminate()
+            await asyncio.to_thread(process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                error("Шарды: обработчик %s не завершился за %s с, останавливаем", shard, STOP_TIMEOUT)
+                process.terminate()
+                await asyncio.to_thread(process.join)
+        if self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+        info("Шарды: обработчики остановлены")
+
+    async def __aenter__(self) -> "ShardPool":
+        try:
+            await self.start()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+async def serve_shard(dp: Dispatcher,
+                      bot: Bot,
+                      path: str,
+                      max_concurrency: int = 100,
+                      stop: Optional[asyncio.Event] = None
+                      ) -> None:
+    """
+    Сторона обработчика: принимает обновления приёмника и обрабатывает их через dp
+
+    Работает, пока приёмник не закроет соединение или не придёт событие stop;
+    перед выходом дорабатывает уже принятые обновления.
+
+    :param path: Unix-сокет, который слушает обработчик
+    :param stop: событие остановки, например по SIGTERM
+    """
+    feeder = UpdateFeeder(dp, bot, max_concurrency)
+    stop = stop or asyncio.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    update = Update.model_validate_json(line, context={"bot": bot})
+                except ValidationError:
+                    exception("Шарды: не удалось разобрать обновление")
+                    continue
+                await feeder.feed(update)
+        finally:
+            writer.close()
+            stop.set()
+
+    await dp.emit_startup(bot=bot)
+    server = await asyncio.start_unix_server(handle, path, limit=LINE_LIMIT)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await feeder.drain()
+        await dp.emit_shutdown(bot=bot)
+
+
+def ignore_interrupt() -> None:
+    # Ctrl+C получает вся группа процессов; обработчик выходит по закрытию соединения приёмником,
+    # иначе он бросил бы обновления, которые приёмник ещё успевает отправить
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
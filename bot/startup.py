@@ -0,0 +1,44 @@
+"""
+Замер запуска процесса: время этапов от импорта bot.main до готовности принимать обновления.
+
+Модуль импортируется в bot.main первым, раньше aiogram, поэтому первый этап - imports -
+включает импорт aiogram, Fluent и роутеров.
+"""
+import time
+from logging import info
+
+from bot.metrics import REGISTRY, Registry
+
+
+class StartupTimer:
+    """Этапы запуска по порядку: mark(этап) закрывает этап, начатый предыдущим mark."""
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage: str) -> float:
+        """
+        :return: длительность этапа, секунды
+        """
+        now = time.perf_counter()
+        self.stages[stage] = now - self.last
+        self.last = now
+        return self.stages[stage]
+
+    @property
+    def total(self) -> float:
+        return self.last - self.started
+
+    def report(self, registry: Registry = REGISTRY) -> None:
+        """Пишет этапы одной строкой лога и в метрику fatrate_startup_seconds."""
+        gauge = registry.gauge("fatrate_startup_seconds", "Длительность этапов запуска процесса", ["stage"])
+        for stage, seconds in self.stages.items():
+            gauge.set(seconds, stage)
+        total_ms = round(self.total * 1000, 3)
+        info("Запуск за %s мс: %s", total_ms,
+             ", ".join(f"{stage} {seconds * 1000:.0f} мс" for stage, seconds in self.stages.items()),
+             extra={"duration_ms": total_ms})
+
+
+startup = StartupTimer()
@@ -0,0 +1,104 @@
+import asyncio
+import hmac
+import secrets
+from logging import info, warning
+from typing import Any, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from pydantic import ValidationError
+
+from bot.feeder import UpdateFeeder
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer(UpdateFeeder):
+    """
+    Приём обновлений от Telegram по webhook.
+
+    Обновление подтверждается сразу после разбора, а обрабатывается в фоне;
+    пока заняты все max_concurrency мест, запрос ждёт, и Telegram сам придержит следующие.
+    Запросы без секрета secret в заголовке SECRET_HEADER отклоняются.
+    """
+
+    def __init__(self,
+                 dp: Dispatcher,
+                 bot: Bot,
+                 path: str = "/webhook",
+                 secret: Optional[str] = None,
+                 max_concurrency: int = 100,
+                 **kwargs: Any
+                 ):
+        if not secret:
+            raise ValueError("Webhook без секрета принимал бы поддельные обновления от кого угодно")
+        super().__init__(dp, bot, max_concurrency, **kwargs)
+        self.path = path
+        self.secret = secret
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            warning("Webhook: запрос с неверным секретом от %s", request.remote)
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+
+        await self.feed(update)
+        return web.Response()
+
+
+async def run_webhook(dp: Dispatcher,
+                      bot: Bot,
+                      url: str,
+                      path: str = "/webhook",
+                      host: str = "0.0.0.0",
+                      port: int = 8000,
+                      secret: Optional[str] = None,
+                      max_concurrency: int = 100,
+                      stop: Optional[asyncio.Event] = None,
+                      ) -> None:
+    """
+    Запускает webhook-сервер и работает до события stop
+
+    :param url: внешний адрес, на который Telegram будет слать обновления (без path)
+    :param secret: секрет в заголовке запросов Telegram; если не задан, а url задан, создаётся случайный
+    :param stop: событие остановки; по умолчанию ждём отмены задачи
+    """
+    if not secret:
+        if not url:
+            # Webhook зарегистрирован снаружи - его секрет взять неоткуда
+            raise ValueError("Для webhook без WEBHOOK_URL нужен WEBHOOK_SECRET, с которым он зарегистрирован")
+        # Секрет нужен только между set_webhook и этим процессом - хватает случайного на каждый запуск
+        secret = secrets.token_urlsafe(32)
+        info("Webhook: WEBHOOK_SECRET не задан, для set_webhook создан случайный секрет")
+    server = WebhookServer(dp, bot, path, secret, max_concurrency)
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    await dp.emit_startup(bot=bot)
+    if url:
+        await bot.set_webhook(
+            url.rstrip("/") + path,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    info("Webhook: слушаем %s:%s%s", host, port, path)
+
+    try:
+        await (stop or asyncio.Event()).wait()
+    finally:
+        # Сначала перестаём принимать запросы, потом дорабатываем принятые
+        await runner.cleanup()
+        await server.drain()
+        await dp.emit_shutdown(bot=bot)
+        info("Webhook: сервер остановлен")
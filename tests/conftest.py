@@ -0,0 +1,16 @@
+import pytest
+
+from bot.factory import STORAGES, create_l10n, create_storage
+
+
+@pytest.fixture(scope="session")
+def l10n():
+    return create_l10n()
+
+
+@pytest.fixture(params=sorted(STORAGES))
+def storage(request, tmp_path, l10n):
+    """Пустое хранилище каждого движка во временной папке."""
+    db = create_storage(request.param, str(tmp_path / request.param), l10n)
+    yield db
+    db.close()
@@ -0,0 +1,15 @@
+import pytest
+
+from bot.commandsworker import bot_commands
+from bot.factory import create_locales
+
+LOCALES = create_locales()
+
+
+@pytest.mark.parametrize("locale", sorted(LOCALES.available))
+def test_commands_described_in_every_locale(locale):
+    commands = {command.command: command.description for command in bot_commands(LOCALES.get(locale))}
+    assert {"export", "import"} <= set(commands)
+    for command, description in commands.items():
+        # Без перевода Fluent вернул бы сам ключ
+        assert description and not description.endswith("-description"), command
@@ -0,0 +1,85 @@
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from bot.database.database import Database
+from bot.database.storage import UserExistsError, UserNotFoundError
+
+CHAT_ID = -100
+
+
+@pytest.fixture
+def database(tmp_path, l10n):
+    db = Database(l10n, str(tmp_path / "fatrate.db"))
+    yield db
+    db.close()
+
+
+def saved_locale(db: Database):
+    with db.get_connection() as conn:
+        return db._load_chat_locale(conn, CHAT_ID)
+
+
+def test_nested_block_joins_outer_transaction(database):
+    with database.get_connection() as conn:
+        database.set_chat_locale(CHAT_ID, "en")
+        # Внутренний блок не коммитит внешнюю транзакцию
+        assert conn.in_transaction
+    assert saved_locale(database) == "en"
+
+
+def test_outer_error_rolls_back_nested_write(database):
+    with pytest.raises(RuntimeError):
+        with database.get_connection():
+            database.set_chat_locale(CHAT_ID, "en")
+            raise RuntimeError
+    assert saved_locale(database) is None
+
+    # Блоки после отката снова коммитятся сами
+    database.set_chat_locale(CHAT_ID, "ru")
+    assert saved_locale(database) == "ru"
+
+
+def test_nested_reads_in_rating_and_digests(database):
+    database.add_measurement(1, "tolstyak", 180, 90, CHAT_ID)
+    text, page, pages = database.get_rating(CHAT_ID)
+    assert "tolstyak" in text and (page, pages) == (0, 1)
+    assert [chat_id for chat_id, _ in database.get_digests([CHAT_ID])] == [CHAT_ID]
+
+
+@pytest.fixture
+def far_timezone(monkeypatch):
+    # Часовой пояс, где местная дата сейчас отличается от даты по UTC
+    zone = "Pacific/Kiritimati" if datetime.now(timezone.utc).hour >= 12 else "Etc/GMT+12"
+    monkeypatch.setenv("TZ", zone)
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_add_and_update_use_local_date(far_timezone, storage):
+    storage.add_measurement(1, "tolstyak", 180, 90, CHAT_ID)
+    storage.update_weight(1, 85, CHAT_ID)
+    rows = list(storage.iter_measurements(CHAT_ID))
+    # /update в тот же день заменяет замер /add, а не добавляет второй
+    assert [(row[3], row[6]) for row in rows] == [(85, date.today().isoformat())]
+
+
+def test_rejected_writes_keep_rating_cache(storage):
+    storage.add_measurement(1, "tolstyak", 180, 90, CHAT_ID)
+    storage.get_rating(CHAT_ID)
+    cached = dict(storage._rating_cache[CHAT_ID])
+
+    with pytest.raises(UserExistsError):
+        storage.add_measurement(1, "tolstyak", 180, 95, CHAT_ID)
+    with pytest.raises(UserNotFoundError):
+        storage.update_weight(2, 80, CHAT_ID)
+    assert storage._rating_cache[CHAT_ID] == cached
+    # Индекс рейтинга тоже не сброшен - следующий /rating не перечитывает чат
+    assert CHAT_ID in storage._ranks
+
+    storage.update_weight(1, 85, CHAT_ID)
+    assert CHAT_ID not in storage._rating_cache
+    assert "85" in storage.get_rating(CHAT_ID)[0]
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime
+
+from bot.digest import DigestScheduler
+from bot.sender import SendQueue
+
+
+class FailingDatabase:
+    """Первая выборка чатов падает, следующие возвращают пустой список."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_chat_ids(self):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("database is locked")
+        return []
+
+
+def test_scheduler_survives_failed_run():
+    async def run():
+        db = FailingDatabase()
+        digest = DigestScheduler(db, queue=None)
+        digest.next_run = lambda now: datetime.now()
+        digest.start()
+
+        async def runs():
+            while db.calls < 3:
+                await asyncio.sleep(0)
+
+        await asyncio.wait_for(runs(), 5)
+        # Остановка не пробрасывает ошибку первой рассылки
+        await digest.stop()
+        return db.calls
+
+    assert asyncio.run(run()) >= 3
+
+
+class BrokenBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        raise RuntimeError("connection reset")
+
+
+def test_unexpected_send_error_goes_to_future():
+    async def run():
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        queue = SendQueue(BrokenBot())
+        queue.start()
+        future = queue.send(1, "text")
+        await asyncio.wait([future])
+        await queue.join()
+        await queue.stop()
+        return future, unhandled
+
+    future, unhandled = asyncio.run(run())
+    assert isinstance(future.exception(), RuntimeError)
+    assert unhandled == []
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from bot.handlers.rating import render_rating
+from bot.nicknames.pool import NicknamePool
+from bot.nicknames.providers import NicknameProvider
+
+
+class DownProvider(NicknameProvider):
+    """Провайдер, который не отвечает, пока up не станет True."""
+
+    def __init__(self):
+        self.calls = 0
+        self.up = False
+
+    async def generate(self, category: str) -> str:
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError("provider is down")
+        return "Пончик"
+
+
+def test_provider_must_implement_generate():
+    with pytest.raises(TypeError):
+        NicknameProvider()
+
+
+def test_pool_backs_off_while_provider_is_down():
+    async def run():
+        provider = DownProvider()
+        pool = NicknamePool(provider, size=1, interval=0.01, max_backoff=0.08, categories=["fat"])
+        pool.start()
+        await asyncio.sleep(0.5)
+        failed_calls = provider.calls
+
+        provider.up = True
+        await asyncio.sleep(0.2)
+        await pool.stop()
+        return failed_calls, pool.take("fat")
+
+    failed_calls, nickname = asyncio.run(run())
+    # Без паузы было бы около 50 попыток; с удвоением до 0.08 с - не больше десятка
+    assert failed_calls <= 10
+    assert nickname == "Пончик"
+
+
+def test_rating_escapes_nicknames(l10n):
+    rating = [(1, "tolstyak", 90.0, 27.8, "2024-01-05", "<b>Пончик & Ко", "Избыточный вес")]
+    text = render_rating(l10n, rating)
+    assert "&lt;b&gt;Пончик &amp; Ко" in text
+    assert "<b>" not in text
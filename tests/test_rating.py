@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from bot.factory import create_storage
+from bot.handlers.rating import MAX_MESSAGE_LENGTH, RATING_PAGE_SIZE, render_rating
+
+CHAT_ID = -100
+USERS = 60
+
+
+class LongNicknames:
+    """Пул прозвищ, где каждое прозвище - почти строка сообщения."""
+
+    def take(self, category: str) -> str:
+        return "Очень длинное прозвище от нейросети " * 7
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, tmp_path, l10n):
+    db = create_storage(request.param, str(tmp_path / request.param), l10n, nicknames=LongNicknames())
+    for user_id in range(1, USERS + 1):
+        db.add_measurement(user_id, f"user{user_id}", 180, 60 + user_id, CHAT_ID)
+    yield db
+    db.close()
+
+
+def test_long_nicknames_do_not_drop_rows(storage):
+    seen = []
+    for page in range(USERS // RATING_PAGE_SIZE):
+        text, current, pages = storage.get_rating(CHAT_ID, page)
+        assert (current, pages) == (page, USERS // RATING_PAGE_SIZE)
+        assert len(text) <= MAX_MESSAGE_LENGTH
+        users = [int(user_id) for user_id in re.findall(r"@user(\d+):", text)]
+        # Страница - ровно page_size мест: длинные прозвища обрезаны, а не перенесены
+        assert len(users) == RATING_PAGE_SIZE
+        seen += users
+
+    assert sorted(seen) == list(range(1, USERS + 1))
+    assert "…" in text
+
+
+def test_long_escaped_nickname_fits(l10n):
+    rating = [(user_id, "x" * 32, 90.0, 27.8, "2024-01-05", "<&>" * 500, "Избыточный вес")
+              for user_id in range(RATING_PAGE_SIZE)]
+    text = render_rating(l10n, rating)
+    assert len(text) <= MAX_MESSAGE_LENGTH
+    assert text.count("&lt;&amp;&gt;") > RATING_PAGE_SIZE
+
+
+def test_last_page_clamped(storage):
+    text, page, pages = storage.get_rating(CHAT_ID, 10 ** 6)
+    assert page == pages - 1
+    assert "@user1:" in text
+
+
+def test_rating_cache_is_bounded(tmp_path, l10n):
+    db = create_storage("memory", str(tmp_path / "memory"), l10n, rating_cache_size=3)
+    try:
+        for chat_id in range(1, 6):
+            db.add_measurement(1, "tolstyak", 180, 90, chat_id)
+            db.get_rating(chat_id)
+        assert list(db._rating_cache) == [3, 4, 5]
+
+        # Просмотренный чат становится самым свежим и вытесняется последним
+        db.get_rating(3)
+        db.add_measurement(1, "tolstyak", 180, 90, 6)
+        db.get_rating(6)
+        assert list(db._rating_cache) == [5, 3, 6]
+    finally:
+        db.close()
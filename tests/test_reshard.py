@@ -0,0 +1,45 @@
+import sys
+
+import pytest
+
+from bot.database import reshard
+from bot.factory import STORAGES, create_storage
+from bot.shards import shard_of
+
+SHARDS = 2
+
+
+def test_reshard_copies_rows_verbatim(storage, tmp_path, l10n):
+    # Строка вне пределов ввода пользователя: перешардирование переносит её как есть
+    storage.copy_measurements([(-100, 1, "tolstyak", 350.0, 180.0, 108.0, "2024-01-05")])
+    storage.add_measurement(2, "hudoy", 180, 60, -200)
+    storage.update_weight(2, 250, -200)
+
+    engine = next(name for name, engine in STORAGES.items() if type(storage) is engine)
+    targets = [create_storage(engine, str(tmp_path / f"shard{i}"), l10n) for i in range(SHARDS)]
+    try:
+        assert reshard.reshard([storage], targets) == (2, 2)
+        for chat_id, weight in ((-100, 350.0), (-200, 250.0)):
+            target = targets[shard_of(chat_id, SHARDS)]
+            assert [row[3] for row in target.iter_measurements(chat_id)] == [weight]
+    finally:
+        for target in targets:
+            target.close()
+
+
+def test_failed_reshard_removes_shards(tmp_path, l10n, monkeypatch):
+    path = str(tmp_path / "fatrate.db")
+    source = create_storage("sqlite", path, l10n)
+    source.add_measurement(1, "tolstyak", 180, 90, -100)
+    source.close()
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setenv("BOT_TOKEN", "42:TEST")
+    monkeypatch.setattr(reshard, "move_chat", broken)
+    monkeypatch.setattr(sys, "argv", ["reshard", "--shards", str(SHARDS), "--db", path])
+    with pytest.raises(RuntimeError):
+        reshard.main()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fatrate.db"]
@@ -0,0 +1,71 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from bot.database.database import Database
+
+# Сводки с нуля - те же запросы, что заполняют их в миграции 0003
+DAILY = """SELECT chat_id, measurement_date, COUNT(*), SUM(weight), SUM(bmi)
+FROM measurements GROUP BY chat_id, measurement_date ORDER BY 1, 2"""
+
+WEEKLY = """SELECT chat_id, user_id, week, COUNT(*),
+    MAX(CASE WHEN first_rank = 1 THEN weight END),
+    MAX(CASE WHEN last_rank = 1 THEN weight END),
+    MIN(weight), AVG(bmi)
+FROM (
+    SELECT chat_id, user_id, weight, bmi,
+        date(measurement_date, 'weekday 0', '-6 days') AS week,
+        ROW_NUMBER() OVER (PARTITION BY chat_id, user_id, date(measurement_date, 'weekday 0', '-6 days')
+                           ORDER BY measurement_date) AS first_rank,
+        ROW_NUMBER() OVER (PARTITION BY chat_id, user_id, date(measurement_date, 'weekday 0', '-6 days')
+                           ORDER BY measurement_date DESC) AS last_rank
+    FROM measurements
+)
+GROUP BY chat_id, user_id, week ORDER BY 1, 2, 3"""
+
+
+def rows(conn, sql):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+            for row in conn.execute(sql).fetchall()]
+
+
+@pytest.fixture
+def database(tmp_path, l10n):
+    db = Database(l10n, str(tmp_path / "fatrate.db"))
+    yield db
+    db.close()
+
+
+def test_rollups_match_full_recount(database):
+    random.seed(1)
+    start = date(2024, 1, 1)
+    with database.get_connection() as conn:
+        for _ in range(2000):
+            user_id, chat_id = random.randint(1, 6), random.choice((-1, -2))
+            day = (start + timedelta(days=random.randint(0, 20))).isoformat()
+            weight = float(random.randint(50, 150))
+            action = random.random()
+            if action < 0.6:
+                conn.execute(
+                    """INSERT INTO measurements (user_id, chat_id, weight, height, bmi, measurement_date)
+                    VALUES (?, ?, ?, 180, ?, ?)
+                    ON CONFLICT (user_id, chat_id, measurement_date)
+                    DO UPDATE SET weight = excluded.weight, bmi = excluded.bmi""",
+                    (user_id, chat_id, weight, weight / 3.24, day)
+                )
+            elif action < 0.8:
+                other = (start + timedelta(days=random.randint(0, 20))).isoformat()
+                conn.execute(
+                    """UPDATE OR IGNORE measurements SET measurement_date = ?, weight = ?
+                    WHERE user_id = ? AND chat_id = ? AND measurement_date = ?""",
+                    (other, weight, user_id, chat_id, day)
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM measurements WHERE user_id = ? AND chat_id = ? AND measurement_date = ?",
+                    (user_id, chat_id, day)
+                )
+
+        assert rows(conn, "SELECT * FROM daily_chat_rollup ORDER BY 1, 2") == rows(conn, DAILY)
+        assert rows(conn, "SELECT * FROM weekly_user_rollup ORDER BY 1, 2, 3") == rows(conn, WEEKLY)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from bot.database.transfer import export_file, import_file
+from bot.factory import create_storage
+
+CHAT_ID = -100
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    return path
+
+
+def record(**fields):
+    return {"chat_id": CHAT_ID, "user_id": 1, "username": "tolstyak", "weight": 90, "height": 180,
+            "measurement_date": "2024-01-05", **fields}
+
+
+def test_import_valid(storage, tmp_path):
+    path = write_jsonl(tmp_path / "ok.jsonl", [record(), record(user_id=2, username="", measurement_date=None)])
+    assert import_file(storage, path) == 2
+    assert {row[1] for row in storage.iter_measurements(CHAT_ID)} == {1, 2}
+
+
+@pytest.mark.parametrize("bad, message", [
+    ({"weight": None}, "weight"),
+    ({"height": None}, "height"),
+    ({"user_id": "abc"}, "Строка 2"),
+    ({"weight": "много"}, "Строка 2"),
+    ({"height": 0}, "рост"),
+    ({"weight": 500}, "вес"),
+    ({"height": 20}, "рост"),
+    ({"bmi": -1}, "ИМТ"),
+    ({"measurement_date": "05.01.2024"}, "Строка 2"),
+    ({"measurement_date": 20240105}, "дата"),
+])
+def test_import_rejects_bad_row(storage, tmp_path, bad, message):
+    path = write_jsonl(tmp_path / "bad.jsonl", [record(), record(**{"user_id": 2, **bad})])
+    with pytest.raises(ValueError, match=message):
+        import_file(storage, path)
+
+
+def test_import_rejects_missing_field(storage, tmp_path):
+    broken = record()
+    del broken["height"]
+    path = write_jsonl(tmp_path / "bad.jsonl", [broken])
+    with pytest.raises(ValueError, match="Строка 1: нет поля height"):
+        import_file(storage, path)
+
+
+def test_import_rejects_short_csv_row(storage, tmp_path):
+    path = tmp_path / "short.csv"
+    path.write_text("chat_id,user_id,username,weight,height\n-100,1,tolstyak,90,180\n-100,2,hudoy\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Строка 2: нет поля weight"):
+        import_file(storage, path)
+
+
+def test_import_rejects_non_object_line(storage, tmp_path):
+    path = tmp_path / "list.jsonl"
+    path.write_text("[1, 2, 3]\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Строка 1"):
+        import_file(storage, path, chat_id=CHAT_ID)
+
+
+def test_export_imports_back(storage, tmp_path, l10n):
+    storage.add_measurement(1, "tolstyak", 180, 190, CHAT_ID)
+    storage.update_weight(1, 250, CHAT_ID)
+    path = tmp_path / "backup.csv"
+    assert export_file(storage, path) == 1
+
+    copy = create_storage("memory", str(tmp_path / "copy"), l10n)
+    try:
+        assert import_file(copy, path) == 1
+        assert [row[3] for row in copy.iter_measurements(CHAT_ID)] == [250.0]
+    finally:
+        copy.close()
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from aiogram import Dispatcher
+from aiohttp.test_utils import make_mocked_request
+
+from bot.webhook import SECRET_HEADER, WebhookServer, run_webhook
+
+
+class FakeBot:
+    def __init__(self):
+        self.webhooks = []
+
+    async def set_webhook(self, url, secret_token=None, **kwargs):
+        self.webhooks.append((url, secret_token))
+
+
+def test_server_requires_secret():
+    with pytest.raises(ValueError):
+        WebhookServer(Dispatcher(), FakeBot(), secret="")
+
+
+@pytest.mark.parametrize("headers", [{}, {SECRET_HEADER: "wrong"}])
+def test_request_without_secret_rejected(headers):
+    async def run():
+        server = WebhookServer(Dispatcher(), FakeBot(), secret="right")
+        return await server.handle(make_mocked_request("POST", "/webhook", headers=headers))
+
+    assert asyncio.run(run()).status == 401
+
+
+def test_run_webhook_without_secret_and_url_fails():
+    with pytest.raises(ValueError):
+        asyncio.run(run_webhook(Dispatcher(), FakeBot(), url="", port=0))
+
+
+def test_run_webhook_generates_secret():
+    async def run():
+        bot, stop = FakeBot(), asyncio.Event()
+        stop.set()
+        await run_webhook(Dispatcher(), bot, url="https://example.org", host="127.0.0.1", port=0, stop=stop)
+        return bot.webhooks
+
+    (url, secret), = asyncio.run(run())
+    assert url == "https://example.org/webhook"
+    assert len(secret) >= 32